@@ -0,0 +1,364 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Inputs and stubs for benchmarks: generated settings files, patroni REST
+# stub and psycopg2 fake which answers pg_settings queries from memory.
+
+import json
+import random
+import socket
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# real settings which are usually present in user config
+KNOWN_SETTINGS = [
+    ("work_mem", "4MB", "kB", "integer", "user"),
+    ("maintenance_work_mem", "64MB", "kB", "integer", "user"),
+    ("effective_cache_size", "4GB", "8kB", "integer", "user"),
+    ("random_page_cost", "1.1", None, "real", "user"),
+    ("log_min_duration_statement", "1s", "ms", "integer", "superuser"),
+    ("checkpoint_completion_target", "0.9", None, "real", "sighup"),
+    ("autovacuum_naptime", "1min", "s", "integer", "sighup"),
+    ("synchronous_commit", "on", None, "enum", "user"),
+    ("log_line_prefix", "%t [%p]: ", None, "string", "sighup"),
+    ("track_io_timing", "off", None, "bool", "superuser"),
+]
+
+
+def generate_settings(size):
+    """
+    Returns ordered list of (name, value, unit, vartype, context) with size entries,
+    custom placeholders bench.param_N are used after known settings.
+    """
+    result = list(KNOWN_SETTINGS[:size])
+    for i in range(size - len(result)):
+        result.append(("bench.param_{}".format(i), "value_{}".format(i), None, "string", "user"))
+    return result
+
+
+def write_settings_file(path, settings, changed=False):
+    with open(path, "w") as f:
+        f.write("# generated by benchmarks\n")
+        for name, value, _, _, _ in settings:
+            if changed and name.startswith("bench."):
+                value += "_new"
+            elif changed and name == "work_mem":
+                value = "8MB"
+            f.write("{} = {}\n".format(name, value))
+
+
+# (name, unit, vartype) of settings used for generated value pairs
+PAIR_SETTINGS = {
+    "memory": ("work_mem", "kB", "integer"),
+    "blocks": ("effective_cache_size", "8kB", "integer"),
+    "time": ("log_min_duration_statement", "ms", "integer"),
+    "seconds": ("autovacuum_naptime", "s", "integer"),
+    "real": ("random_page_cost", None, "real"),
+    "real_time": ("vacuum_cost_delay", "ms", "real"),
+    "bool": ("track_io_timing", None, "bool"),
+    "enum": ("synchronous_commit", None, "enum"),
+    "list": ("shared_preload_libraries", None, "string"),
+    "string": ("log_line_prefix", None, "string"),
+}
+BOOL_SPELLINGS = {
+    True: ("on", "ON", "true", "True", "yes", "1", "t", "tr", "y", "ye"),
+    False: ("off", "OFF", "of", "false", "FALSE", "no", "0", "f", "fa", "n"),
+}
+ENUM_SPELLINGS = {
+    "on": ("on", "ON", "true", "yes", "1"),
+    "off": ("off", "Off", "false", "no", "0"),
+    "local": ("local", "LOCAL"),
+    "remote_write": ("remote_write", "Remote_Write"),
+    "remote_apply": ("remote_apply", "REMOTE_APPLY"),
+}
+LIBRARIES = ("pg_stat_statements", "auto_explain", "pg_prewarm", "pg_cron", "timescaledb")
+
+
+def quote(value):
+    return "'{}'".format(value.replace("'", "''"))
+
+
+def integer_spellings(number):
+    return ["{}".format(number), " {} ".format(number), hex(number), "0{:o}".format(number)]
+
+
+def unit_spellings(amount, units, base):
+    """
+    :param amount: value in bytes or microseconds, multiple of base
+    :return: spellings of amount with every unit which represents it exactly
+    """
+    result = integer_spellings(amount // base)
+    for suffix, multiplier in units.items():
+        if amount % multiplier == 0:
+            result.append("{}{}".format(amount // multiplier, suffix))
+            result.append("{} {}".format(amount // multiplier, suffix))
+        elif amount * 4 % multiplier == 0:
+            result.append("{}{}".format(amount / multiplier, suffix))
+    return result
+
+
+def real_spellings(mantissa, exponent, unit=None):
+    """
+    :return: spellings of mantissa * 10 ** -exponent
+    """
+    result = ["{:.{}f}".format(mantissa / 10.0 ** exponent, exponent), "{}e-{}".format(mantissa, exponent),
+              "{}E{}".format(mantissa * 10, -exponent - 1), "{}0e-{}".format(mantissa, exponent + 1)]
+    if unit == "ms" and exponent <= 3:
+        result.append("{}us".format(mantissa * 10 ** (3 - exponent)))
+    return result
+
+
+def list_spelling(rng, items):
+    form = rng.randint(0, 3)
+    if form == 0:
+        return ",".join(items)
+    if form == 1:
+        return quote(", ".join(items))
+    if form == 2:
+        return ", ".join('"{}"'.format(item) for item in items)
+    return quote(",".join(items))
+
+
+def generate_value_pairs(count, seed=0):
+    """
+    Generates pairs of spellings of setting values with known equality:
+    units, boolean aliases, enums, lists, quotes, exponents, hex and octal.
+    :return: list of (name, value, other value, unit, vartype, equal)
+    """
+    from settings_diff import MEMORY_UNITS, TIME_UNITS
+    rng = random.Random(seed)
+    kinds = sorted(PAIR_SETTINGS)
+    result = []
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        name, unit, vartype = PAIR_SETTINGS[kind]
+        equal = rng.random() < 0.5
+        if kind in ("memory", "blocks", "time", "seconds"):
+            units = MEMORY_UNITS if kind in ("memory", "blocks") else TIME_UNITS
+            base = {"memory": 1024, "blocks": 8192, "time": 1000, "seconds": 1000 ** 2}[kind]
+            amount = base * rng.choice((rng.randint(1, 64), rng.randint(1, 4096) * rng.choice((1, 60, 1024))))
+            other = amount if equal else amount + base * rng.choice((1, -1 if amount > base else 1))
+            value, other = rng.choice(unit_spellings(amount, units, base)), \
+                rng.choice(unit_spellings(other, units, base))
+        elif kind in ("real", "real_time"):
+            mantissa, exponent = rng.randint(1, 10 ** 6), rng.randint(0, 4)
+            other = mantissa if equal else mantissa + 1
+            value, other = rng.choice(real_spellings(mantissa, exponent, unit)), \
+                rng.choice(real_spellings(other, exponent, unit))
+        elif kind == "bool":
+            state = rng.random() < 0.5
+            value = rng.choice(BOOL_SPELLINGS[state])
+            other = rng.choice(BOOL_SPELLINGS[state if equal else not state])
+        elif kind == "enum":
+            names = sorted(ENUM_SPELLINGS)
+            state = rng.choice(names)
+            other_state = state if equal else rng.choice([n for n in names if n != state])
+            value, other = rng.choice(ENUM_SPELLINGS[state]), rng.choice(ENUM_SPELLINGS[other_state])
+        elif kind == "list":
+            items = rng.sample(LIBRARIES, rng.randint(1, 3))
+            other_items = items if equal else (items[::-1] if len(items) > 1 else items + ["pg_cron_x"])
+            value, other = list_spelling(rng, items), list_spelling(rng, other_items)
+        else:
+            text = "%m [%p] {}'s ".format(rng.randint(0, 10 ** 6))
+            other_text = text if equal else text.strip()
+            # current_setting() returns string values without quotes
+            value, other = quote(text), rng.choice((quote(other_text), other_text))
+        if rng.random() < 0.3 and kind not in ("list", "string"):
+            value = quote(value.strip())
+        result.append((name, value, other, unit, vartype, equal))
+    return result
+
+
+class Counters(object):
+    connections = 0
+    spawns = 0
+
+
+class FakeDb(object):
+    """
+    pg_settings state shared by fake connections and patroni stub.
+    """
+
+    def __init__(self, settings):
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.reset(settings)
+
+    def reset(self, settings):
+        with self.lock:
+            self.rows = dict((name, [value, unit, vartype, context]) for name, value, unit, vartype, context
+                             in settings)
+
+    def apply(self, parameters):
+        with self.lock:
+            for name, value in list(parameters.items()):
+                if name in self.rows:
+                    self.rows[name][0] = str(value)
+
+
+def install_fake_psycopg2(db):
+    """
+    Registers psycopg2 module which answers queries of utils_db from db.
+    """
+    module = types.ModuleType("psycopg2")
+
+    class OperationalError(Exception):
+        pass
+
+    class Cursor(object):
+
+        def __init__(self):
+            self.result = []
+            self.closed = False
+
+        def execute(self, query, params=None):
+            params = params or {}
+            with db.lock:
+                if "any(%(names)s)" in query:
+                    self.result = [(name, row[0], row[0], row[1], row[2], row[3], False)
+                                   for name, row in list(db.rows.items()) if name in params["names"]]
+                else:
+                    self.result = []
+
+        def fetchall(self):
+            return self.result
+
+        def fetchone(self):
+            return self.result[0] if self.result else None
+
+        def close(self):
+            self.closed = True
+
+    class Connection(object):
+
+        def __init__(self):
+            self.closed = 0
+            self.autocommit = False
+
+        def cursor(self):
+            return Cursor()
+
+        def close(self):
+            self.closed = 1
+
+    def connect(*args, **kwargs):
+        Counters.connections += 1
+        return Connection()
+
+    module.OperationalError = OperationalError
+    module.Error = Exception
+    module.connect = connect
+    sys.modules["psycopg2"] = module
+    return module
+
+
+def count_real_connections():
+    import psycopg2
+    connect = psycopg2.connect
+
+    def counting_connect(*args, **kwargs):
+        Counters.connections += 1
+        return connect(*args, **kwargs)
+    psycopg2.connect = counting_connect
+
+
+def count_spawns():
+    import subprocess
+    init = subprocess.Popen.__init__
+
+    def counting_init(self, *args, **kwargs):
+        Counters.spawns += 1
+        init(self, *args, **kwargs)
+    subprocess.Popen.__init__ = counting_init
+
+
+class StubPatroni(object):
+    """
+    Patroni REST API stub: /config, PATCH /config, /cluster and /patroni
+    of members which all point to the stub. Members read DCS right after
+    patch, dcs_last_seen grows with every read. api_url of members, failure
+    of PATCH, members which never read DCS and pending restart flag can be
+    configured.
+    """
+
+    def __init__(self, db, members=3):
+        self.db = db
+        self.members = members
+        self.parameters = {}
+        self.dcs_last_seen = int(time.time()) - 10
+        # "{url}" and "{index}" are substituted, members point to the stub by default
+        self.api_url = "{url}/patroni"
+        self.patch_status = 200
+        self.apply_patch = True
+        self.pending_restart = False
+        self.patches = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                # headers and body are written separately, avoid delayed ack stalls
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def reply(self, data, status=200):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/config":
+                    self.reply({"postgresql": {"parameters": stub.parameters}})
+                elif self.path == "/cluster":
+                    self.reply({"members": [{"name": "member-{}".format(i), "role": "replica",
+                                             "api_url": stub.api_url.format(url=stub.url, index=i)}
+                                            for i in range(stub.members)]})
+                else:
+                    self.reply({"state": "running", "pending_restart": stub.pending_restart,
+                                "dcs_last_seen": stub.dcs_last_seen})
+
+            def do_PATCH(self):
+                data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if stub.patch_status != 200:
+                    self.reply({"error": "patch is rejected"}, stub.patch_status)
+                    return
+                parameters = data.get("postgresql", {}).get("parameters", {})
+                stub.parameters.update(parameters)
+                stub.patches += 1
+                if stub.apply_patch:
+                    stub.db.apply(parameters)
+                    # members read DCS right after patch, every read is reported later than previous
+                    stub.dcs_last_seen = max(int(time.time()), stub.dcs_last_seen + 1)
+                self.reply({"postgresql": {"parameters": stub.parameters}})
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self, settings):
+        self.parameters = dict((name, value) for name, value, _, _, _ in settings)
+
+    def shutdown(self):
+        self.server.shutdown()
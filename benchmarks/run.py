@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Benchmarks of settings hot paths.
+# Every case runs in separate interpreter, so peak RSS and import costs are
+# measured per case. Results are compared with baseline.json, regression is
+# reported if median time grows more than --tolerance or if more processes
+# are spawned or more DB connections are opened than in baseline.
+#
+# python3 benchmarks/run.py
+# python3 benchmarks/run.py --case propagate --sizes 1000
+# python3 benchmarks/run.py --save-baseline
+# python3 benchmarks/run.py --dsn "host=localhost user=postgres"
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCH_DIR), "scripts")
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+SIZES = (10, 100, 1000)
+CASES = ("read_property_file_cold", "read_property_file_warm", "populate_patroni_config",
+         "prepare_settings", "propagate", "settings_diff")
+# absolute difference which is never reported as regression, timer noise
+MIN_REGRESSION_SECONDS = 0.002
+
+PATRONI_TEMPLATE = """scope: bench
+restapi:
+  listen: 0.0.0.0:8008
+bootstrap:
+  dcs:
+    postgresql:
+      parameters:
+        max_connections: 200
+postgresql:
+  parameters:
+    unix_socket_directories: /var/run/postgresql
+"""
+
+
+def setup_case(case, size, work_dir, dsn):
+    """
+    Prepares inputs of case in current process.
+    :return: function which runs single iteration
+    """
+    import fixtures
+    settings = fixtures.generate_settings(size)
+    settings_file = os.path.join(work_dir, "settings.conf")
+    fixtures.write_settings_file(settings_file, settings, changed=case == "propagate")
+
+    if case.startswith("read_property_file"):
+        import utils
+        cache_dir = os.environ["PROPERTY_CACHE_DIR"]
+
+        def run():
+            if case.endswith("cold"):
+                shutil.rmtree(cache_dir, ignore_errors=True)
+            utils.read_property_file(settings_file)
+        return run
+
+    if case == "populate_patroni_config":
+        import populate_patroni_config
+        patroni_conf = os.path.join(work_dir, "pg_node.yml")
+
+        def run():
+            with open(patroni_conf, "w") as f:
+                f.write(PATRONI_TEMPLATE)
+            populate_patroni_config.populate_patroni_config(patroni_conf, settings_file)
+        return run
+
+    if case == "prepare_settings":
+        import prepare_settings_file
+        prepare_settings_file.PG_USER_CONF = settings_file
+        prepare_settings_file.RUN_PROPAGATE_SCRIPT = "true"
+        target = os.path.join(work_dir, "pg_conf_active.conf")
+
+        def run():
+            sys.argv = ["prepare_settings_file.py", target]
+            prepare_settings_file.main()
+        return run
+
+    if case == "propagate":
+        db = fixtures.FakeDb(settings)
+        if dsn:
+            fixtures.count_real_connections()
+        else:
+            fixtures.install_fake_psycopg2(db)
+        stub = fixtures.StubPatroni(db)
+        patroni_conf = os.path.join(work_dir, "pg_node.yml")
+        with open(patroni_conf, "w") as f:
+            f.write("restapi:\n  listen: {}\n".format(stub.url[len("http://"):]))
+        import patroni_client
+        patroni_client.PATRONI_CONF = patroni_conf
+        import utils_db
+        if dsn:
+            utils_db.CONN_STRING = dsn
+        import propagate_settings_file
+
+        def run():
+            db.reset(settings)
+            stub.reset(settings)
+            if propagate_settings_file.propagate_settings(settings_file) is False:
+                raise RuntimeError("Propagation failed")
+        return run
+
+    if case == "settings_diff":
+        import settings_diff
+        # 10 generated value pairs per settings entry, checked against known equality
+        pairs = fixtures.generate_value_pairs(size * 10)
+        snapshot = dict((name, {"value": other, "unit": unit, "vartype": vartype})
+                        for name, _, other, unit, vartype, _ in pairs)
+        properties = dict((name, value) for name, value, _, _, _, _ in pairs)
+
+        def run():
+            wrong = [p for p in pairs if settings_diff.is_values_diff(*p[:5]) is p[5]]
+            if wrong:
+                raise RuntimeError("Wrong diff of {} pairs, first {}".format(len(wrong), wrong[0]))
+            settings_diff.diff_settings(properties, snapshot)
+        return run
+
+    raise ValueError("Unknown case {}".format(case))
+
+
+def run_child(case, size, iterations, dsn):
+    """
+    Runs case in current interpreter and prints result as json.
+    """
+    work_dir = tempfile.mkdtemp(prefix="pgskipper-bench-")
+    os.environ["PROPERTY_CACHE_DIR"] = os.path.join(work_dir, "property_cache")
+    os.environ["METRICS_DIR"] = os.path.join(work_dir, "metrics")
+    os.environ.setdefault("LOG_LEVEL", "info")
+    os.environ.setdefault("CHANGE_SETTINGS_RETRIES", "5")
+    os.environ.setdefault("CHANGE_SETTINGS_INTERVAL", "1")
+    os.environ.setdefault("CHANGE_SETTINGS_APPLY_TIMEOUT", "5")
+    sys.path[:0] = [BENCH_DIR, SCRIPTS_DIR]
+    import logging
+    logging.disable(logging.WARNING)
+    import resource
+    import fixtures
+    fixtures.count_spawns()
+    try:
+        run = setup_case(case, size, work_dir, dsn)
+        spawns, connections = fixtures.Counters.spawns, fixtures.Counters.connections
+        times = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+            if i == 0:
+                # as in fresh process, later iterations reuse connections
+                spawns = fixtures.Counters.spawns - spawns
+                connections = fixtures.Counters.connections - connections
+        result = {
+            "median": statistics.median(times),
+            "min": min(times),
+            "spawns": spawns,
+            "connections": connections,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(json.dumps(result))
+
+
+def run_case(case, size, iterations, dsn):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--case", case,
+           "--sizes", str(size), "--iterations", str(iterations)]
+    if dsn:
+        cmd += ["--dsn", dsn]
+    output = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """
+    :return: list of regression descriptions
+    """
+    regressions = []
+    for key, result in sorted(results.items()):
+        base = baseline.get(key)
+        if not base:
+            continue
+        if result["median"] > base["median"] * (1 + tolerance) and \
+                result["median"] - base["median"] > MIN_REGRESSION_SECONDS:
+            regressions.append("{}: median {:.4f}s, baseline {:.4f}s".format(key, result["median"], base["median"]))
+        for metric in ("spawns", "connections"):
+            if result[metric] > base[metric]:
+                regressions.append("{}: {} {}, baseline {}".format(key, metric, result[metric], base[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of settings hot paths")
+    parser.add_argument("--case", action="append", choices=CASES,
+                        help="case to run, all cases by default")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in SIZES),
+                        help="comma separated numbers of entries in settings file")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative growth of median time")
+    parser.add_argument("--dsn", default=None,
+                        help="use local PostgreSQL instead of psycopg2 fake")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store results as new baseline")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    if args.child:
+        run_child(args.case[0], sizes[0], args.iterations, args.dsn)
+        return
+
+    results = {}
+    print("{:<40} {:>10} {:>10} {:>7} {:>7} {:>10}".format(
+        "case", "median,s", "min,s", "spawns", "db conn", "rss,KiB"))
+    for case in args.case or CASES:
+        for size in sizes:
+            key = "{}[{}]".format(case, size)
+            results[key] = result = run_case(case, size, args.iterations, args.dsn)
+            print("{:<40} {:>10.4f} {:>10.4f} {:>7} {:>7} {:>10}".format(
+                key, result["median"], result["min"], result["spawns"], result["connections"],
+                result["peak_rss_kb"]))
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(BASELINE):
+            with open(BASELINE) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(BASELINE, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("Baseline is saved to {}".format(BASELINE))
+        return
+
+    if not os.path.exists(BASELINE):
+        print("No baseline to compare with, run with --save-baseline")
+        return
+    with open(BASELINE) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for regression in regressions:
+        print("REGRESSION {}".format(regression))
+    if regressions:
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Verification of memory tuning formulas with pgbench.
+# For every PG_RESOURCES_LIMIT_MEM x PG_MAX_CONNECTIONS pair parameters are
+# produced by the same prepare -> populate pipeline which is used in the
+# container, applied to temporary cluster started with unix socket only,
+# and pgbench tpcb-like and select-only profiles are run. TPS and latency
+# percentiles are reported per configuration, results can be compared with
+# previous run to catch regressions of formulas.
+# Must be started by non-root user, PostgreSQL binaries are taken from
+# PG_BIN_DIR or PATH.
+#
+# python3 benchmarks/tuning.py --memory 512Mi,2Gi --connections 50,200
+# python3 benchmarks/tuning.py --profile oltp --duration 60 --output oltp.json
+# python3 benchmarks/tuning.py --compare oltp.json
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCH_DIR), "scripts")
+PG_BIN_DIR = os.getenv("PG_BIN_DIR", "")
+
+PROFILES = {
+    "tpcb": [],
+    "select-only": ["-S"],
+}
+PERCENTILES = (50, 90, 95, 99)
+
+PATRONI_TEMPLATE = """scope: tuning
+bootstrap:
+  dcs:
+    postgresql:
+      parameters: {}
+postgresql:
+  parameters: {}
+"""
+
+tps_pattern = re.compile(r"^tps = ([0-9.]+) \(without initial connection time\)", re.MULTILINE)
+
+
+def pg_bin(name):
+    return os.path.join(PG_BIN_DIR, name) if PG_BIN_DIR else name
+
+
+def tuned_parameters(memory, connections, profile, work_dir):
+    """
+    Runs prepare and populate commands in clean environment.
+    :return: bootstrap parameters from patroni config
+    :rtype: dict
+    """
+    import yaml
+    env = dict((key, value) for key, value in os.environ.items() if not key.startswith("PG_CONF_"))
+    env.update({
+        "PG_RESOURCES_LIMIT_MEM": memory,
+        "PG_MAX_CONNECTIONS": str(connections),
+        "PG_CONF_MAX_CONNECTIONS": str(connections),
+        "PG_TUNING_PROFILE": profile,
+        # user config and required extensions of the image are not used
+        "RUN_PROPAGATE_SCRIPT": "false",
+        "PROPERTY_CACHE_DIR": os.path.join(work_dir, "property_cache"),
+        "METRICS_DIR": os.path.join(work_dir, "metrics"),
+    })
+    settings_file = os.path.join(work_dir, "pg_conf_active.conf")
+    patroni_conf = os.path.join(work_dir, "pg_node.yml")
+    with open(patroni_conf, "w") as f:
+        f.write(PATRONI_TEMPLATE)
+    pgskipper = os.path.join(SCRIPTS_DIR, "pgskipper.py")
+    for command in (["prepare", settings_file], ["populate", patroni_conf, settings_file]):
+        subprocess.run([sys.executable, pgskipper] + command, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with open(patroni_conf) as f:
+        return yaml.safe_load(f)["bootstrap"]["dcs"]["postgresql"]["parameters"]
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return "on" if value else "off"
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+class Cluster(object):
+    """
+    Temporary cluster which listens only on unix socket in work_dir.
+    """
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        self.data_dir = os.path.join(work_dir, "data")
+        self.conf_file = os.path.join(self.data_dir, "tuning.conf")
+        self.running = False
+
+    def init(self):
+        subprocess.run([pg_bin("initdb"), "-D", self.data_dir, "-U", "postgres", "-A", "trust",
+                        "--no-sync"], check=True, stdout=subprocess.DEVNULL)
+        with open(os.path.join(self.data_dir, "postgresql.conf"), "a") as f:
+            f.write("\nlisten_addresses = ''\nunix_socket_directories = '{}'\ninclude 'tuning.conf'\n"
+                    .format(self.work_dir))
+
+    def configure(self, parameters):
+        with open(self.conf_file, "w") as f:
+            for name, value in sorted(parameters.items()):
+                f.write("{} = {}\n".format(name, format_value(value)))
+
+    def start(self):
+        subprocess.run([pg_bin("pg_ctl"), "-D", self.data_dir, "-w", "-l",
+                        os.path.join(self.work_dir, "postgresql.log"), "start"],
+                       check=True, stdout=subprocess.DEVNULL)
+        self.running = True
+
+    def stop(self):
+        if self.running:
+            subprocess.run([pg_bin("pg_ctl"), "-D", self.data_dir, "-w", "-m", "fast", "stop"],
+                           stdout=subprocess.DEVNULL)
+            self.running = False
+
+    def pgbench(self, args, **kwargs):
+        return subprocess.run([pg_bin("pgbench"), "-h", self.work_dir, "-U", "postgres"] + args + ["postgres"],
+                              check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              universal_newlines=True, **kwargs)
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(round(p / 100.0 * (len(values) - 1))), len(values) - 1)]
+
+
+def read_latencies(log_dir):
+    """
+    Reads per-transaction logs of pgbench, third column is latency in microseconds.
+    :return: latencies in milliseconds
+    """
+    result = []
+    for name in os.listdir(log_dir):
+        with open(os.path.join(log_dir, name)) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3:
+                    result.append(int(parts[2]) / 1000.0)
+    return result
+
+
+def run_profile(cluster, profile, clients, duration, sampling_rate):
+    log_dir = tempfile.mkdtemp(prefix="pgbench-log-", dir=cluster.work_dir)
+    try:
+        output = cluster.pgbench(PROFILES[profile] + [
+            "-c", str(clients), "-j", str(min(clients, os.cpu_count() or 1)),
+            "-T", str(duration), "-l", "--sampling-rate", str(sampling_rate),
+            "--log-prefix", os.path.join(log_dir, "pgbench")]).stdout
+        match = tps_pattern.search(output)
+        latencies = read_latencies(log_dir)
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+    result = {"tps": float(match.group(1)) if match else None, "transactions": len(latencies)}
+    for p in PERCENTILES:
+        value = percentile(latencies, p)
+        result["p{}_ms".format(p)] = round(value, 3) if value is not None else None
+    return result
+
+
+def run_matrix(args):
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="pgskipper-tuning-")
+    cluster = Cluster(work_dir)
+    try:
+        cluster.init()
+        initialized = False
+        for memory in args.memory.split(","):
+            for connections in [int(c) for c in args.connections.split(",")]:
+                key = "{}/{}".format(memory, connections)
+                parameters = tuned_parameters(memory, connections, args.profile, work_dir)
+                cluster.configure(parameters)
+                cluster.start()
+                try:
+                    if not initialized:
+                        cluster.pgbench(["-i", "-q", "-s", str(args.scale)])
+                        initialized = True
+                    clients = min(args.clients, connections - 3)
+                    results[key] = {"parameters": parameters, "clients": clients}
+                    for profile in PROFILES:
+                        results[key][profile] = result = run_profile(cluster, profile, clients, args.duration,
+                                                                     args.sampling_rate)
+                        print("{:<20} {:<12} {:>10} {:>9} {:>9} {:>9}".format(
+                            key, profile, result["tps"], result["p50_ms"], result["p95_ms"], result["p99_ms"]))
+                        sys.stdout.flush()
+                finally:
+                    cluster.stop()
+    finally:
+        cluster.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, previous, tolerance):
+    """
+    :return: list of configurations where TPS dropped more than tolerance
+    """
+    regressions = []
+    for key, result in sorted(results.items()):
+        for profile in PROFILES:
+            base = previous.get(key, {}).get(profile, {}).get("tps")
+            tps = result[profile]["tps"]
+            if base and tps is not None and tps < base * (1 - tolerance):
+                regressions.append("{} {}: tps {}, previous {}".format(key, profile, tps, base))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verification of memory tuning formulas with pgbench")
+    parser.add_argument("--memory", default="256Mi,1Gi,4Gi",
+                        help="comma separated PG_RESOURCES_LIMIT_MEM values")
+    parser.add_argument("--connections", default="50,200",
+                        help="comma separated PG_MAX_CONNECTIONS values")
+    parser.add_argument("--profile", default="legacy", help="PG_TUNING_PROFILE")
+    parser.add_argument("--scale", type=int, default=50, help="pgbench scale factor")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=int, default=30, help="seconds per pgbench run")
+    parser.add_argument("--sampling-rate", type=float, default=0.1,
+                        help="part of transactions logged for latency percentiles")
+    parser.add_argument("--output", default=None, help="save results to json file")
+    parser.add_argument("--compare", default=None, help="json file of previous run")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed relative drop of TPS")
+    args = parser.parse_args()
+    if os.geteuid() == 0:
+        sys.exit("initdb cannot be run by root, start harness as another user")
+
+    print("{:<20} {:<12} {:>10} {:>9} {:>9} {:>9}".format("mem/conn", "profile", "tps", "p50,ms", "p95,ms", "p99,ms"))
+    results = run_matrix(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION {}".format(regression))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,11 @@ f="${2}"
 
 set +x
 
+# resident archiver uploads segments in parallel over keep-alive connections
+if [[ -S "${WAL_ARCHIVER_SOCKET:-/patroni/wal_archiver.sock}" ]]; then
+    exec python3 /wal_archiver.py push "$p" "$f"
+fi
+
 export `cat /proc/1/environ  | tr '\0' '\n' | grep PG_ROOT_PASSWORD`
 
 sha256sum -b "$p" | cut -d " " -f1 | xargs -I {} echo sha256={} | \
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Prepares configuration files before patroni start in single process:
+# envsubst of patroni template, parameters merge, bootstrap section population
+# and update of memory settings in postgresql.base.conf.
+#
+# python3 /boot.py --root-dir /var/lib/pgsql/data/postgresql_node1
+
+import argparse
+import logging
+import os
+import re
+import time
+
+from utils import setup_logging, write_file_atomically
+from prepare_settings_file import get_parameters, format_settings
+from populate_patroni_config import to_bootstrap_parameters, merge_bootstrap_parameters, \
+    dump_patroni_config, get_yaml
+
+logger = logging.getLogger(__name__)
+
+PATRONI_TEMPLATE = "/patroni/pg_template.yaml"
+PATRONI_CONF = "/patroni/pg_node.yml"
+INITIAL_CONF = "/patroni/pg_conf_initial.conf"
+BASE_CONF_SETTINGS = ("shared_buffers", "effective_cache_size", "work_mem", "maintenance_work_mem")
+
+env_pattern = re.compile(r"\$(?:([A-Za-z_][A-Za-z0-9_]*)|\{([A-Za-z_][A-Za-z0-9_]*)\})")
+
+
+def substitute_env(template):
+    """
+    Replaces $VAR and ${VAR} with values from environment, same as envsubst does.
+    Unset variables are replaced with empty string.
+    """
+    return env_pattern.sub(lambda m: os.getenv(m.group(1) or m.group(2), ""), template)
+
+
+def set_property(lines, name, value):
+    """
+    Sets property in postgresql config lines, same as set_property from start.sh:
+    all lines with (commented) property are replaced, property is appended if absent.
+    """
+    pattern = re.compile(r"^#*{}[ ]*=".format(re.escape(name)))
+    found = False
+    result = []
+    for line in lines:
+        if pattern.match(line):
+            line = "{} = {}\n".format(name, value)
+            found = True
+        result.append(line)
+    if not found:
+        if result and not result[-1].endswith("\n"):
+            result[-1] += "\n"
+        result.append("{} = '{}'\n".format(name, value))
+    return result
+
+
+class Stages(object):
+
+    def __init__(self):
+        self.timings = []
+
+    def run(self, name, func, *args):
+        start = time.time()
+        result = func(*args)
+        self.timings.append((name, time.time() - start))
+        logger.info("Stage {} finished in {:.3f}s".format(name, self.timings[-1][1]))
+        return result
+
+
+def render_patroni_config(template_file):
+    yaml, loader, _ = get_yaml()
+    with open(template_file) as f:
+        return yaml.load(substitute_env(f.read()), Loader=loader)
+
+
+def update_base_conf(base_conf, params):
+    with open(base_conf) as f:
+        lines = f.readlines()
+    for name in BASE_CONF_SETTINGS:
+        if name in params:
+            logger.info("Setting from config file: {} = {}".format(name, params[name]))
+            lines = set_property(lines, name, params[name])
+    write_file_atomically(base_conf, "".join(lines))
+
+
+def boot(root_dir, template_file=PATRONI_TEMPLATE, patroni_conf_file=PATRONI_CONF,
+         initial_conf_file=INITIAL_CONF):
+    stages = Stages()
+    patroni_conf = stages.run("render", render_patroni_config, template_file)
+    params = stages.run("prepare", get_parameters)
+    stages.run("write-initial", write_file_atomically, initial_conf_file, format_settings(params))
+    stages.run("populate", merge_bootstrap_parameters, patroni_conf, to_bootstrap_parameters(params))
+    stages.run("write-patroni", write_file_atomically, patroni_conf_file, dump_patroni_config(patroni_conf))
+    base_conf = os.path.join(root_dir, "postgresql.base.conf")
+    if os.path.isfile(base_conf):
+        stages.run("base-conf", update_base_conf, base_conf, params)
+    logger.info("Boot configuration is prepared in {:.3f}s"
+                .format(sum(t for _, t in stages.timings)))
+
+
+if __name__ == '__main__':
+    setup_logging()
+    parser = argparse.ArgumentParser(description='Prepare configuration before patroni start')
+    parser.add_argument('--root-dir', dest='root_dir', required=True,
+                        help='postgresql data directory')
+    args = parser.parse_args()
+
+    boot(args.root_dir)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Dispatches patroni callbacks without blocking patroni callback executor.
+# Each event gets sequence number in state file, handler is started in
+# background after debounce window and is skipped if newer event for the
+# same role came or role was changed meanwhile. Only one handler runs at
+# a time, result of each event is recorded to events log. Events passed to
+# settings reconciler are recorded by reconciler when reconciliation ends.
+
+import fcntl
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import metrics
+from utils import setup_logging, write_file_atomically
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = os.getenv("CALLBACK_STATE_DIR", "/patroni")
+STATE_FILE = os.path.join(STATE_DIR, "callback_state.json")
+STATE_LOCK = os.path.join(STATE_DIR, "callback_state.lock")
+RUN_LOCK = os.path.join(STATE_DIR, "callback_run.lock")
+EVENTS_LOG = os.path.join(STATE_DIR, "callback_events.log")
+EVENTS_LOG_MAX_SIZE = 1024 * 1024
+DEBOUNCE = float(os.getenv("CALLBACK_DEBOUNCE", 3))
+TIMEOUT = int(os.getenv("CALLBACK_TIMEOUT", 600))
+
+
+class FileLock(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.f = None
+
+    def __enter__(self):
+        self.f = open(self.path, "a")
+        fcntl.flock(self.f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        fcntl.flock(self.f, fcntl.LOCK_UN)
+        self.f.close()
+
+
+def load_state():
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {"seq": 0, "roles": {}, "last_role": None}
+
+
+def save_state(state):
+    write_file_atomically(STATE_FILE, json.dumps(state))
+
+
+def record_event(event, status, **kwargs):
+    record = dict(event, status=status, time=time.strftime("%Y-%m-%dT%H:%M:%S"), **kwargs)
+    metrics.inc("callback_events_total", role=event["role"], status=status)
+    if "duration" in kwargs:
+        metrics.observe("callback_duration_seconds", kwargs["duration"], role=event["role"], status=status)
+    logger.info("Callback event {}".format(record))
+    with FileLock(STATE_LOCK):
+        if os.path.exists(EVENTS_LOG) and os.path.getsize(EVENTS_LOG) > EVENTS_LOG_MAX_SIZE:
+            with open(EVENTS_LOG) as f:
+                lines = f.readlines()
+            with open(EVENTS_LOG, "w") as f:
+                f.writelines(lines[len(lines) // 2:])
+        with open(EVENTS_LOG, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def register_event(action, role, cluster):
+    with FileLock(STATE_LOCK):
+        state = load_state()
+        state["seq"] += 1
+        state["roles"][role] = state["seq"]
+        state["last_role"] = role
+        save_state(state)
+    return {"seq": state["seq"], "action": action, "role": role, "cluster": cluster}
+
+
+def is_latest(event):
+    with FileLock(STATE_LOCK):
+        state = load_state()
+    return state["roles"].get(event["role"]) == event["seq"] and \
+        state["last_role"] == event["role"]
+
+
+def dispatch(action, role, cluster):
+    """
+    Registers event and starts its handler in background.
+    Master events are passed to settings reconciler if it is running.
+    """
+    event = register_event(action, role, cluster)
+    record_event(event, "received")
+    if role == "master":
+        from settings_reconciler import notify
+        if notify(action, role, cluster, seq=event["seq"]):
+            record_event(event, "passed to reconciler")
+            return
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), json.dumps(event)],
+                     start_new_session=True, close_fds=True)
+
+
+def run_command(command, timeout=TIMEOUT):
+    """
+    Runs command in its own process group, the whole group is killed on
+    timeout, so children of shell script do not outlive it.
+    """
+    process = subprocess.Popen(command, start_new_session=True)
+    try:
+        code = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+        raise
+    if code != 0:
+        raise subprocess.CalledProcessError(code, command)
+
+
+def handle(event):
+    if event["role"] == "master":
+        run_command(["/propagate_settings.sh"])
+    elif event["role"] == "replica":
+        from setup_endpoint_callback import drain_connections
+        drain_connections()
+
+
+def run(event):
+    time.sleep(DEBOUNCE)
+    if not is_latest(event):
+        record_event(event, "superseded")
+        return
+    with FileLock(RUN_LOCK):
+        # another handler could run for long time, check again
+        if not is_latest(event):
+            record_event(event, "superseded")
+            return
+        start = time.time()
+        try:
+            handle(event)
+            record_event(event, "done", duration=round(time.time() - start, 3))
+        except subprocess.TimeoutExpired:
+            record_event(event, "timeout", duration=round(time.time() - start, 3))
+        except Exception as e:
+            logger.exception("Callback handler failed")
+            record_event(event, "failed", duration=round(time.time() - start, 3), error=str(e))
+
+
+if __name__ == '__main__':
+    setup_logging()
+    if len(sys.argv) != 2:
+        sys.exit("Usage: {0} event".format(sys.argv[0]))
+    run(json.loads(sys.argv[1]))
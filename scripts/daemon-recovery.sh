@@ -55,8 +55,5 @@ done
 cd /var/lib/pgsql/data/postgresql_${POD_IDENTITY}
 
 
-if [[ -z "${restore_version}" ]] ; then
-    curl -u postgres:"${PG_ROOT_PASSWORD}" postgres-backup-daemon:8081/get | tar -xzf -
-else
-    curl -u postgres:"${PG_ROOT_PASSWORD}"  postgres-backup-daemon:8081/get?id=${restore_version} | tar -xzf -
-fi
\ No newline at end of file
+# streams archive with resume support, run it again to continue interrupted restore
+python3 /restore_backup.py --restore-version "${restore_version}" --target-dir .
\ No newline at end of file
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Fix permissions on the given directory to allow group read/write of
+# regular files and execute of directories, owner is set to postgres:0.
+# Tree is walked once, entries which already have required owner and mode
+# are not changed, directories are processed by pool of threads.
+# Entries which cannot be fixed are logged and counted in the summary, exit
+# code is 1 only if the root cannot be processed or --strict is passed.
+#
+# python3 /fix_permission.py /var/lib/pgsql
+# python3 /fix_permission.py --strict /var/lib/pgsql
+
+import logging
+import os
+import pwd
+import stat
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+OWNER = "postgres"
+GROUP_ID = 0
+WORKERS = int(os.getenv("FIX_PERMISSIONS_WORKERS", min(8, (os.cpu_count() or 1) * 2)))
+
+
+class PermissionFixer(object):
+
+    def __init__(self, uid, gid=GROUP_ID, workers=WORKERS):
+        self.uid = uid
+        self.gid = gid
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.done = threading.Event()
+        self.stats = {"scanned": 0, "owner_changed": 0, "mode_changed": 0, "errors": 0}
+
+    def count(self, **kwargs):
+        with self.lock:
+            for key, value in list(kwargs.items()):
+                self.stats[key] += value
+
+    def fix(self, path, st):
+        """
+        Sets owner and group permissions for single entry.
+        :return: (owner changed, mode changed)
+        """
+        owner_changed = mode_changed = 0
+        if st.st_uid != self.uid or st.st_gid != self.gid:
+            os.lchown(path, self.uid, self.gid)
+            owner_changed = 1
+        # permissions of symlinks are not used, chmod would change target
+        if not stat.S_ISLNK(st.st_mode):
+            mode = stat.S_IMODE(st.st_mode) | stat.S_IRGRP | stat.S_IWGRP
+            if stat.S_ISDIR(st.st_mode):
+                mode |= stat.S_IXGRP
+            if mode != stat.S_IMODE(st.st_mode):
+                os.chmod(path, mode)
+                mode_changed = 1
+        return owner_changed, mode_changed
+
+    def process_dir(self, path):
+        scanned = owner_changed = mode_changed = errors = 0
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    scanned += 1
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError as e:
+                        logger.error("Cannot read status of {}: {}".format(entry.path, e))
+                        errors += 1
+                        continue
+                    try:
+                        owner, mode = self.fix(entry.path, st)
+                        owner_changed += owner
+                        mode_changed += mode
+                    except OSError as e:
+                        logger.error("Cannot fix permissions of {}: {}".format(entry.path, e))
+                        errors += 1
+                    # content of directory is fixed even if directory itself cannot be fixed
+                    if stat.S_ISDIR(st.st_mode):
+                        self.submit(entry.path)
+        except OSError as e:
+            logger.error("Cannot read directory {}: {}".format(path, e))
+            errors += 1
+        self.count(scanned=scanned, owner_changed=owner_changed,
+                   mode_changed=mode_changed, errors=errors)
+
+    def submit(self, path):
+        with self.lock:
+            self.pending += 1
+        self.pool.submit(self.run_task, path)
+
+    def run_task(self, path):
+        try:
+            self.process_dir(path)
+        finally:
+            with self.lock:
+                self.pending -= 1
+                if self.pending == 0:
+                    self.done.set()
+
+    def run(self, root):
+        st = os.lstat(root)
+        owner, mode = self.fix(root, st)
+        self.count(scanned=1, owner_changed=owner, mode_changed=mode)
+        if stat.S_ISDIR(st.st_mode):
+            self.submit(root)
+            self.done.wait()
+        self.pool.shutdown()
+        return self.stats
+
+
+def main():
+    import argparse
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Fix permissions of directory for postgres user and group 0")
+    parser.add_argument("path")
+    parser.add_argument("--strict", action="store_true",
+                        help="exit with code 1 if some entry cannot be fixed")
+    args = parser.parse_args()
+    start = time.time()
+    try:
+        stats = PermissionFixer(pwd.getpwnam(OWNER).pw_uid, GROUP_ID).run(args.path)
+    except OSError as e:
+        sys.exit("Cannot fix permissions of {}: {}".format(args.path, e))
+    summary = "Permissions of {} are fixed in {:.3f}s: scanned {}, owner changed {}, mode changed {}, errors {}" \
+        .format(args.path, time.time() - start, stats["scanned"], stats["owner_changed"],
+                stats["mode_changed"], stats["errors"])
+    if stats["errors"]:
+        logger.warning(summary)
+        if args.strict:
+            sys.exit(1)
+    else:
+        logger.info(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,11 @@
 
 # Fix permissions on the given directory to allow group read/write of
 # regular files and execute of directories.
+# Single pass python implementation is used when it is available.
+if command -v python3 > /dev/null 2>&1 && [ -f /fix_permission.py ]; then
+    exec python3 /fix_permission.py "$1"
+fi
+
 find "$1" -exec chown postgres {} \;
 find "$1" -exec chgrp 0 {} \;
 find "$1" -exec chmod g+rw {} \;
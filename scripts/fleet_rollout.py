@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Rollout of settings file to many patroni clusters.
+# /config of every cluster is compared with settings concurrently, only
+# clusters which differ are patched. Patches are sent in waves: canary wave
+# first, every next wave is --growth times larger, rollout is stopped if
+# some cluster of the wave failed or did not converge. Cluster converges
+# when every member reports dcs_last_seen later than before patch (both
+# values are taken from clock of the member). Parameters which require
+# restart according to local catalog are expected to be pending restart,
+# but running value of the cluster can already be equal to the new one,
+# so member which read DCS once more without them is converged with
+# warning. At most --parallel clusters are processed at once. Per-cluster
+# timing report is printed at the end.
+# api_url of members is usually pod ip which is not reachable from outside
+# of kubernetes, --member-url rewrites it, {name}, {endpoint} and {api_url}
+# are substituted.
+#
+# python3 /fleet_rollout.py settings.conf http://pg-a:8008 http://pg-b:8008
+# python3 /fleet_rollout.py --member-url "http://{name}.pg-patroni:8008/patroni" settings.conf http://pg-a:8008
+# python3 /fleet_rollout.py --endpoints-file clusters.txt --canary 2 --parallel 50 settings.conf
+# python3 /fleet_rollout.py --dry-run --endpoints-file clusters.txt settings.conf
+
+import asyncio
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+IN_SYNC = "in sync"
+DIFFERS = "differs"
+CONVERGED = "converged"
+NOT_CONVERGED = "not converged"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class ClusterRollout(object):
+    """
+    State and timings of single cluster.
+    """
+
+    def __init__(self, endpoint, client):
+        self.endpoint = endpoint
+        self.client = client
+        self.status = None
+        self.changes = {}
+        self.error = None
+        self.members = {}
+        self.timings = {}
+
+    def report(self):
+        return {
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "changed": sorted(self.changes),
+            "error": self.error,
+            "members": self.members,
+            "timings": dict((key, round(value, 3)) for key, value in self.timings.items()),
+        }
+
+
+class FleetRollout(object):
+
+    def __init__(self, properties, endpoints, parallel=20, canary=1, growth=4,
+                 apply_timeout=60, dry_run=False, member_url=None, restart_params=()):
+        from patroni_client import PatroniClient
+        from propagate_settings_file import to_patch_value
+        self.patch_values = dict((key, to_patch_value(key, value)) for key, value in properties.items())
+        self.clusters = [ClusterRollout(endpoint, PatroniClient(endpoint.rstrip("/")))
+                         for endpoint in endpoints]
+        self.parallel = parallel
+        self.canary = canary
+        self.growth = growth
+        self.apply_timeout = apply_timeout
+        self.dry_run = dry_run
+        self.member_url = member_url
+        self.restart_params = set(restart_params)
+        self.executor = ThreadPoolExecutor(max_workers=parallel * 4)
+        self.semaphore = None
+
+    async def call(self, function, *args):
+        return await asyncio.get_event_loop().run_in_executor(self.executor, function, *args)
+
+    async def diff(self, cluster):
+        from propagate_settings_file import get_dcs_parameters
+        from settings_diff import diff_dcs_settings
+        async with self.semaphore:
+            start = time.time()
+            try:
+                dcs_parameters = await self.call(get_dcs_parameters, cluster.client)
+                cluster.changes = diff_dcs_settings(self.patch_values, dcs_parameters)
+                cluster.status = DIFFERS if cluster.changes else IN_SYNC
+            except Exception as e:
+                cluster.status, cluster.error = FAILED, "cannot read config: {}".format(e)
+            cluster.timings["diff"] = time.time() - start
+
+    def rewrite_members(self, cluster, members):
+        """
+        Replaces api_url of members by --member-url template.
+        """
+        if not self.member_url:
+            return members
+        return [dict(member, api_url=self.member_url.format(
+            name=member.get("name"), endpoint=cluster.endpoint.rstrip("/"), api_url=member.get("api_url")))
+            for member in members]
+
+    async def apply(self, cluster):
+        from propagate_settings_file import fill_reference_times, get_reference_times, wait_member_applied, \
+            wait_restart_pending
+        async with self.semaphore:
+            start = time.time()
+            try:
+                members = self.rewrite_members(cluster, (await self.call(cluster.client.cluster)).get("members", []))
+                references = await self.call(get_reference_times, cluster.client, members)
+                patch_start = time.time()
+                patch_data = json.dumps({"postgresql": {"parameters": cluster.changes}})
+                r = await self.call(lambda: cluster.client.patch("/config", data=patch_data))
+                cluster.timings["patch"] = time.time() - patch_start
+                if not r.ok:
+                    raise Exception("PATCH /config returned {} {}".format(r.status_code, r.text))
+                references = fill_reference_times(references, members, r)
+                results = await asyncio.gather(*[
+                    self.call(wait_member_applied, cluster.client, member, references[member["name"]],
+                              patch_start, self.apply_timeout)
+                    for member in members])
+                restart_expected = sorted(name for name in cluster.changes if name in self.restart_params)
+                applied = [member for member, (_, seconds, _) in zip(members, results) if seconds is not None]
+                not_pending = await asyncio.gather(*[
+                    self.call(wait_restart_pending, cluster.client, member, self.apply_timeout, restart_expected)
+                    for member in (applied if restart_expected else [])])
+            except Exception as e:
+                cluster.status, cluster.error = FAILED, str(e)
+                metrics.inc("fleet_rollout_failures_total")
+                return
+            finally:
+                cluster.timings["total"] = time.time() - start
+            cluster.members = dict((name, {"seconds": seconds, "pending_restart": pending_restart})
+                                   for name, seconds, pending_restart in results)
+            for member, names in zip(applied, not_pending):
+                cluster.members[member["name"]]["pending_restart"] = len(names) < len(restart_expected)
+                if names:
+                    cluster.members[member["name"]]["restart_not_pending"] = names
+                    logger.warning("Member {} of {} does not report pending restart for {}, "
+                                   "running values are probably equal to new ones"
+                                   .format(member["name"], cluster.endpoint, names))
+            converged = all(seconds is not None for _, seconds, _ in results)
+            cluster.status = CONVERGED if converged else NOT_CONVERGED
+            if converged and results:
+                cluster.timings["converge"] = max(seconds for _, seconds, _ in results)
+            metrics.observe("fleet_cluster_rollout_seconds", cluster.timings["total"], status=cluster.status)
+
+    def waves(self, clusters):
+        """
+        Splits clusters into waves: canary, then growing by growth factor.
+        """
+        result, size, i = [], max(self.canary, 1), 0
+        while i < len(clusters):
+            result.append(clusters[i:i + size])
+            i += size
+            size *= self.growth
+        return result
+
+    async def run(self):
+        self.semaphore = asyncio.Semaphore(self.parallel)
+        start = time.time()
+        await asyncio.gather(*[self.diff(cluster) for cluster in self.clusters])
+        logger.info("Configs of {} clusters are compared in {:.3f}s".format(len(self.clusters), time.time() - start))
+        differ = [cluster for cluster in self.clusters if cluster.status == DIFFERS]
+        if self.dry_run or not differ:
+            return
+        waves = self.waves(differ)
+        for number, wave in enumerate(waves, 1):
+            wave_start = time.time()
+            logger.info("Wave {} of {}: {} clusters".format(number, len(waves), len(wave)))
+            await asyncio.gather(*[self.apply(cluster) for cluster in wave])
+            failed = [cluster.endpoint for cluster in wave if cluster.status != CONVERGED]
+            logger.info("Wave {} is finished in {:.3f}s".format(number, time.time() - wave_start))
+            if failed:
+                logger.error("Rollout is stopped, clusters failed or did not converge: {}".format(failed))
+                for cluster in differ:
+                    if cluster.status == DIFFERS:
+                        cluster.status = SKIPPED
+                return
+
+    def execute(self):
+        """
+        :return: per-cluster reports
+        :rtype: list
+        """
+        try:
+            asyncio.run(self.run())
+        finally:
+            self.executor.shutdown(wait=False)
+            for cluster in self.clusters:
+                cluster.client.close()
+        return [cluster.report() for cluster in self.clusters]
+
+
+def read_endpoints(filename):
+    with open(filename) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def print_report(reports):
+    print("{:<40} {:<14} {:>7} {:>8} {:>8} {:>9} {:>8}".format(
+        "endpoint", "status", "changed", "diff,s", "patch,s", "converge,s", "total,s"))
+    for r in reports:
+        timings = r["timings"]
+        print("{:<40} {:<14} {:>7} {:>8} {:>8} {:>9} {:>8}".format(
+            r["endpoint"], r["status"], len(r["changed"]), timings.get("diff", "-"), timings.get("patch", "-"),
+            timings.get("converge", "-"), timings.get("total", "-")))
+        if r["error"]:
+            print("    {}".format(r["error"]))
+
+
+def main():
+    import argparse
+    from utils import read_property_file
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Rollout of settings file to many patroni clusters")
+    parser.add_argument("settings_file")
+    parser.add_argument("endpoints", nargs="*", help="patroni REST API urls, one per cluster")
+    parser.add_argument("--endpoints-file", default=None, help="file with one url per line")
+    parser.add_argument("--parallel", type=int, default=20, help="max clusters processed at once")
+    parser.add_argument("--canary", type=int, default=1, help="size of the first wave")
+    parser.add_argument("--growth", type=int, default=4, help="growth factor of next waves")
+    parser.add_argument("--apply-timeout", type=int, default=60,
+                        help="seconds to wait until members read DCS after patch")
+    parser.add_argument("--member-url", default=None,
+                        help="template of member status url, {name}, {endpoint} and {api_url} are substituted")
+    parser.add_argument("--dry-run", action="store_true", help="only compare configs")
+    parser.add_argument("--output", default=None, help="save report to json file")
+    args = parser.parse_args()
+    endpoints = list(args.endpoints)
+    if args.endpoints_file:
+        endpoints += read_endpoints(args.endpoints_file)
+    if not endpoints:
+        sys.exit("No endpoints are passed")
+
+    properties = read_property_file(args.settings_file)
+    from param_validator import validate
+    validation = validate(properties)
+    if len(validation.properties) < len(properties):
+        sys.exit("Settings file has invalid values: {}".format(validation.errors))
+
+    reports = FleetRollout(validation.properties, endpoints, args.parallel, args.canary, args.growth,
+                           args.apply_timeout, args.dry_run, args.member_url,
+                           validation.restart_required).execute()
+    print_report(reports)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+    if any(r["status"] in (FAILED, NOT_CONVERGED, SKIPPED) for r in reports):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Counters and histograms of settings, callback and archive pipelines.
+# Scripts are short-lived, so every process accumulates metrics in memory and
+# merges them under lock into state file in METRICS_DIR on exit (daemons do it
+# periodically). Merged values are written in prometheus text format to
+# pgskipper.prom for node-exporter textfile collector and can be served over
+# http with "python3 /metrics.py serve".
+#
+# python3 /metrics.py serve
+# python3 /metrics.py show
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv("METRICS_DIR", "/patroni/metrics")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9187))
+FLUSH_INTERVAL = int(os.getenv("METRICS_FLUSH_INTERVAL", 15))
+PREFIX = "pgskipper_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def metric_key(name, labels):
+    return name + json.dumps(labels, sort_keys=True)
+
+
+def split_key(key):
+    index = key.index("{")
+    return key[:index], json.loads(key[index:])
+
+
+def format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                          for k, v in sorted(labels.items())) + "}"
+
+
+class Registry(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flush_registered = False
+
+    def inc(self, name, value=1, **labels):
+        key = metric_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.register_flush()
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = metric_key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"le": list(buckets), "buckets": [0] * len(buckets),
+                                                    "sum": 0, "count": 0}
+            for i, bound in enumerate(histogram["le"]):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+            self.register_flush()
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Observes duration of block, failures are counted in name_failures_total.
+        """
+        start = time.time()
+        try:
+            yield
+        except Exception:
+            self.inc(name + "_failures_total", **labels)
+            raise
+        finally:
+            self.observe(name + "_seconds", time.time() - start, **labels)
+
+    def register_flush(self):
+        if not self.flush_registered:
+            self.flush_registered = True
+            atexit.register(self.flush)
+
+    def take(self):
+        with self.lock:
+            counters, histograms = self.counters, self.histograms
+            self.counters, self.histograms = {}, {}
+        return counters, histograms
+
+    def flush(self):
+        """
+        Merges accumulated values into state file and rewrites textfile.
+        """
+        counters, histograms = self.take()
+        if not counters and not histograms:
+            return
+        try:
+            if not os.path.isdir(METRICS_DIR):
+                os.makedirs(METRICS_DIR)
+            with open(os.path.join(METRICS_DIR, "metrics.lock"), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                state = load_state()
+                merge(state, counters, histograms)
+                write_atomically(os.path.join(METRICS_DIR, "metrics.json"), json.dumps(state))
+                write_atomically(os.path.join(METRICS_DIR, "pgskipper.prom"), render(state))
+        except (IOError, OSError) as e:
+            logger.debug("Cannot write metrics to {}: {}".format(METRICS_DIR, e))
+
+
+def write_atomically(filename, data):
+    tmp_filename = "{}.{}.tmp".format(filename, os.getpid())
+    with open(tmp_filename, "w") as f:
+        f.write(data)
+    os.replace(tmp_filename, filename)
+
+
+def load_state():
+    try:
+        with open(os.path.join(METRICS_DIR, "metrics.json")) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {"counters": {}, "histograms": {}}
+
+
+def merge(state, counters, histograms):
+    for key, value in list(counters.items()):
+        state["counters"][key] = state["counters"].get(key, 0) + value
+    for key, histogram in list(histograms.items()):
+        current = state["histograms"].get(key)
+        if current is None or current["le"] != histogram["le"]:
+            state["histograms"][key] = histogram
+            continue
+        current["buckets"] = [a + b for a, b in zip(current["buckets"], histogram["buckets"])]
+        current["sum"] += histogram["sum"]
+        current["count"] += histogram["count"]
+
+
+def render(state):
+    """
+    Formats state in prometheus text exposition format.
+    """
+    lines = []
+    typed = set()
+    for key, value in sorted(state["counters"].items()):
+        name, labels = split_key(key)
+        if name not in typed:
+            typed.add(name)
+            lines.append("# TYPE {}{} counter".format(PREFIX, name))
+        lines.append("{}{}{} {}".format(PREFIX, name, format_labels(labels), value))
+    for key, histogram in sorted(state["histograms"].items()):
+        name, labels = split_key(key)
+        if name not in typed:
+            typed.add(name)
+            lines.append("# TYPE {}{} histogram".format(PREFIX, name))
+        for bound, count in zip(histogram["le"], histogram["buckets"]):
+            lines.append("{}{}_bucket{} {}".format(PREFIX, name, format_labels(labels, le=bound), count))
+        lines.append("{}{}_bucket{} {}".format(PREFIX, name, format_labels(labels, le="+Inf"),
+                                               histogram["count"]))
+        lines.append("{}{}_sum{} {}".format(PREFIX, name, format_labels(labels), histogram["sum"]))
+        lines.append("{}{}_count{} {}".format(PREFIX, name, format_labels(labels), histogram["count"]))
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+timer = registry.timer
+flush = registry.flush
+
+
+def start_flusher(interval=FLUSH_INTERVAL):
+    """
+    Flushes metrics periodically, used by long-running services.
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            flush()
+    threading.Thread(target=run, name="metrics-flusher", daemon=True).start()
+
+
+def serve(port=METRICS_PORT):
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = render(load_state()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    logger.info("Metrics are served on port {}".format(port))
+    HTTPServer(("", port), Handler).serve_forever()
+
+
+def main():
+    if len(sys.argv) == 2 and sys.argv[1] == "serve":
+        from utils import setup_logging
+        setup_logging()
+        serve()
+    elif len(sys.argv) == 2 and sys.argv[1] == "show":
+        sys.stdout.write(render(load_state()))
+    else:
+        sys.exit("Usage: {0} serve | show".format(sys.argv[0]))
+
+
+if __name__ == '__main__':
+    main()
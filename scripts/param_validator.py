@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Validation of parameter values against pg_settings catalog before they are
+# sent to patroni. Catalog (vartype, unit, min_val, max_val, enumvals, context)
+# is loaded from running server with single query, every load refreshes copy
+# per major version in PARAM_CATALOG_DIR. The copy and catalog shipped with
+# image, which is built at image build time from temporary cluster, are used
+# only when database is not available.
+# PARAM_VALIDATION_MODE: reject (default) - invalid values are not sent,
+# clamp - out of range numbers are replaced with min/max, warn - only log,
+# off - validation is disabled.
+#
+# python3 /param_validator.py build-catalog /usr/share/pgskipper/param_catalog
+# python3 /param_validator.py check /patroni/pg_conf_active.conf
+
+import collections
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from settings_diff import normalize_bool, normalize_number, parse_unit, unquote
+from utils import write_file_atomically
+
+logger = logging.getLogger(__name__)
+
+CATALOG_DIR = os.getenv("PARAM_CATALOG_DIR", "/patroni/param_catalog")
+SHIPPED_CATALOG_DIR = "/usr/share/pgskipper/param_catalog"
+VALIDATION_MODE = os.getenv("PARAM_VALIDATION_MODE", "reject")
+PG_BIN_DIR = os.getenv("PG_BIN_DIR", "")
+
+CATALOG_QUERY = "select name, vartype, unit, min_val, max_val, enumvals, context " \
+                "from pg_settings"
+
+_catalog = None
+
+ValidationResult = collections.namedtuple("ValidationResult", "properties errors restart_required")
+
+
+def catalog_file(directory, major):
+    return os.path.join(directory, "pg_settings_{}.json".format(major))
+
+
+def to_major(version_num):
+    version_num = int(version_num)
+    return version_num // 10000 if version_num >= 100000 else version_num // 100
+
+
+def query_catalog(cursor):
+    """
+    :return: (major version, name -> setting description)
+    """
+    cursor.execute("select current_setting('server_version_num')")
+    major = to_major(cursor.fetchone()[0])
+    cursor.execute(CATALOG_QUERY)
+    catalog = {}
+    for name, vartype, unit, min_val, max_val, enumvals, context in cursor.fetchall():
+        catalog[name] = {"vartype": vartype, "unit": unit, "min_val": min_val, "max_val": max_val,
+                         "enumvals": enumvals, "context": context}
+    return major, catalog
+
+
+def read_catalog(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def save_catalog(directory, major, catalog):
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        write_file_atomically(catalog_file(directory, major), json.dumps(catalog))
+    except (IOError, OSError) as e:
+        logger.warning("Cannot save parameters catalog to {}: {}".format(directory, e))
+
+
+def load_catalog(major=None):
+    """
+    Returns catalog of running server and saves it to CATALOG_DIR. Saved or
+    shipped catalog is returned if database is not available, database is
+    queried again on the next call then.
+    :param major: major version of offline catalog, POSTGRESQL_VERSION by default
+    :return: name -> setting description or None if catalog is not available
+    """
+    global _catalog
+    if _catalog is not None:
+        return _catalog
+    try:
+        from utils_db import get_connection
+        cursor = get_connection().cursor()
+        try:
+            server_major, catalog = query_catalog(cursor)
+        finally:
+            cursor.close()
+    except Exception as e:
+        logger.warning("Cannot read parameters catalog from database: {}".format(e))
+    else:
+        save_catalog(CATALOG_DIR, server_major, catalog)
+        _catalog = catalog
+        return catalog
+    major = major or os.getenv("POSTGRESQL_VERSION")
+    if major:
+        for directory in (CATALOG_DIR, SHIPPED_CATALOG_DIR):
+            path = catalog_file(directory, major)
+            catalog = read_catalog(path)
+            if catalog:
+                logger.info("Offline parameters catalog {} is used".format(path))
+                return catalog
+    logger.warning("Parameters catalog is not available")
+    return None
+
+
+def format_number(number, vartype):
+    if vartype == "integer":
+        return str(int(round(number)))
+    return repr(float(number))
+
+
+def check_value(name, value, entry):
+    """
+    Checks value against catalog entry.
+    :return: (error or None, clamped value or None)
+    """
+    if entry is None:
+        # custom placeholder variables like pg_stat_statements.max are not known before library is loaded
+        if "." in name:
+            return None, None
+        return "unrecognized configuration parameter", None
+    raw = unquote(str(value))
+    vartype = entry["vartype"]
+    if entry["context"] == "internal":
+        return "parameter cannot be changed", None
+    if vartype == "bool":
+        if normalize_bool(raw) is None:
+            return "requires a Boolean value", None
+    elif vartype == "enum":
+        enumvals = [v.lower() for v in entry.get("enumvals") or []]
+        # boolean aliases are hidden values of enums like synchronous_commit
+        if raw.lower() not in enumvals and \
+                not (normalize_bool(raw) is not None and ("on" in enumvals or "off" in enumvals)):
+            return "invalid value, available values: {}".format(", ".join(entry["enumvals"])), None
+    elif vartype in ("integer", "real"):
+        number = normalize_number(raw, entry["unit"])
+        if number is None:
+            return "invalid value for numeric parameter", None
+        base, _ = parse_unit(entry["unit"])
+        number = number / base if base else number
+        if vartype == "integer" and number != int(number) and not entry["unit"]:
+            return "invalid value for integer parameter", None
+        min_val = float(entry["min_val"]) if entry.get("min_val") is not None else None
+        max_val = float(entry["max_val"]) if entry.get("max_val") is not None else None
+        if min_val is not None and number < min_val:
+            return "{} is below minimum {}".format(raw, entry["min_val"]), format_number(min_val, vartype)
+        if max_val is not None and number > max_val:
+            return "{} is above maximum {}".format(raw, entry["max_val"]), format_number(max_val, vartype)
+    return None, None
+
+
+def validate(properties, catalog=None, mode=None):
+    """
+    Validates properties and predicts which of them require restart.
+    :param properties: name -> value
+    :param catalog: result of load_catalog, loaded if not passed
+    :param mode: reject, clamp, warn or off, PARAM_VALIDATION_MODE by default
+    :return: properties to send (invalid are removed, out of range numbers are clamped in clamp mode),
+             name -> error, names of postmaster context parameters
+    :rtype: ValidationResult
+    """
+    mode = mode or VALIDATION_MODE
+    if mode == "off":
+        return ValidationResult(dict(properties), {}, [])
+    catalog = catalog if catalog is not None else load_catalog()
+    if catalog is None:
+        logger.warning("Parameters are not validated because catalog is not available")
+        return ValidationResult(dict(properties), {}, [])
+    result, errors, restart_required = {}, {}, []
+    for name, value in list(properties.items()):
+        entry = catalog.get(name)
+        error, clamped = check_value(name, value, entry)
+        if error:
+            errors[name] = error
+            if mode == "clamp" and clamped is not None:
+                logger.warning("Value of {} is clamped to {}: {}".format(name, clamped, error))
+                value = clamped
+            elif mode in ("reject", "clamp"):
+                logger.error("Invalid value of {}: {}".format(name, error))
+                continue
+            else:
+                logger.warning("Invalid value of {}: {}".format(name, error))
+        if entry and entry["context"] == "postmaster":
+            restart_required.append(name)
+        result[name] = value
+    return ValidationResult(result, errors, sorted(restart_required))
+
+
+def build_catalog(output_dir):
+    """
+    Creates temporary cluster with initdb and saves its pg_settings catalog.
+    Must be started by postgres user.
+    """
+    import psycopg2
+    work_dir = tempfile.mkdtemp(prefix="param-catalog-")
+    data_dir = os.path.join(work_dir, "data")
+    pg_ctl = os.path.join(PG_BIN_DIR, "pg_ctl")
+    try:
+        subprocess.run([os.path.join(PG_BIN_DIR, "initdb"), "-D", data_dir, "-U", "postgres",
+                        "--no-sync", "-A", "trust"], check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([pg_ctl, "-D", data_dir, "-w", "-l", os.path.join(work_dir, "log"),
+                        "-o", "-c listen_addresses='' -c unix_socket_directories='{}'".format(work_dir),
+                        "start"], check=True, stdout=subprocess.DEVNULL)
+        try:
+            conn = psycopg2.connect(host=work_dir, dbname="postgres", user="postgres")
+            try:
+                major, catalog = query_catalog(conn.cursor())
+            finally:
+                conn.close()
+        finally:
+            subprocess.run([pg_ctl, "-D", data_dir, "-m", "immediate", "stop"],
+                           stdout=subprocess.DEVNULL)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    write_file_atomically(catalog_file(output_dir, major), json.dumps(catalog))
+    logger.info("Catalog of {} parameters for version {} is saved to {}".format(len(catalog), major, output_dir))
+
+
+def main():
+    from utils import read_property_file, setup_logging
+    setup_logging()
+    if len(sys.argv) == 3 and sys.argv[1] == "build-catalog":
+        build_catalog(sys.argv[2])
+    elif len(sys.argv) == 3 and sys.argv[1] == "check":
+        result = validate(read_property_file(sys.argv[2]), mode="warn")
+        print(json.dumps({"errors": result.errors, "restart_required": result.restart_required},
+                         sort_keys=True))
+        if result.errors:
+            sys.exit(1)
+    else:
+        sys.exit("Usage: {0} build-catalog output_dir | check settings_file".format(sys.argv[0]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Client for patroni REST API of current node.
+# Endpoint is resolved once: restapi.listen from pg_node.yml, host ip
+# (POD_IP or address of first non loopback interface) is used if patroni
+# listens on all addresses. Requests are sent over keep-alive session.
+
+import logging
+import os
+import time
+
+import metrics
+from utils import get_host_ip, is_ipv4
+
+logger = logging.getLogger(__name__)
+
+PATRONI_CONF = "/patroni/pg_node.yml"
+DEFAULT_PORT = 8008
+# (connect, read) timeouts
+TIMEOUT = (3, 10)
+WILDCARD_HOSTS = ("", "0.0.0.0", "::", "*")
+
+_endpoint = None
+_client = None
+
+
+def format_host(host):
+    host = host.strip("[]")
+    if ":" in host and not is_ipv4(host):
+        return "[{}]".format(host)
+    return host
+
+
+def split_listen(listen):
+    """
+    Splits restapi.listen value like 0.0.0.0:8008, [::1]:8008 or host:8008.
+    :return: (host, port)
+    """
+    listen = str(listen).strip()
+    if listen.startswith("["):
+        host, _, port = listen[1:].partition("]")
+        port = port.lstrip(":")
+    elif listen.count(":") == 1:
+        host, port = listen.split(":")
+    else:
+        host, port = listen, ""
+    return host, int(port) if port else DEFAULT_PORT
+
+
+def read_restapi_listen(conf_file=None):
+    conf_file = conf_file or PATRONI_CONF
+    try:
+        import yaml
+        with open(conf_file) as f:
+            conf = yaml.safe_load(f) or {}
+        return (conf.get("restapi") or {}).get("listen")
+    except (IOError, OSError) as e:
+        logger.debug("Cannot read {}: {}".format(conf_file, e))
+    except Exception as e:
+        logger.warning("Cannot parse {}: {}".format(conf_file, e))
+    return None
+
+
+def resolve_endpoint(conf_file=None):
+    """
+    Returns base url of patroni REST API of current node, result is cached.
+    :rtype: str
+    """
+    global _endpoint
+    if _endpoint is None:
+        host, port = "", DEFAULT_PORT
+        listen = read_restapi_listen(conf_file)
+        if listen:
+            host, port = split_listen(listen)
+        if host.strip("[]") in WILDCARD_HOSTS:
+            host = get_host_ip()
+        _endpoint = "http://{}:{}".format(format_host(host), port)
+        logger.debug("Patroni REST API endpoint is {}".format(_endpoint))
+    return _endpoint
+
+
+class PatroniClient(object):
+
+    def __init__(self, base_url=None, user=None, password=None, timeout=TIMEOUT):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.base_url = base_url or resolve_endpoint()
+        self.timeout = timeout
+        self.session = requests.Session()
+        user = user if user is not None else os.getenv('PATRONI_REST_API_USER')
+        password = password if password is not None else os.getenv('PATRONI_REST_API_PASSWORD')
+        if user:
+            self.session.auth = (user, password)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return self.base_url + path
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        # requests to other members are labeled by their endpoint path
+        endpoint = "/" + path.split("://", 1)[-1].split("/", 1)[-1] if "://" in path else path
+        start = time.time()
+        try:
+            r = self.session.request(method, self.url(path), **kwargs)
+        except Exception:
+            metrics.inc("patroni_request_failures_total", method=method, endpoint=endpoint)
+            raise
+        finally:
+            metrics.observe("patroni_request_seconds", time.time() - start,
+                            method=method, endpoint=endpoint)
+        if r.status_code >= 400:
+            metrics.inc("patroni_request_failures_total", method=method, endpoint=endpoint)
+        return r
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request("PATCH", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def get_json(self, path):
+        r = self.get(path)
+        r.raise_for_status()
+        return r.json()
+
+    def status(self, api_url="/patroni"):
+        """
+        Returns state of node, api_url of other member can be passed.
+        """
+        return self.get_json(api_url)
+
+    def config(self):
+        return self.get_json("/config")
+
+    def cluster(self):
+        return self.get_json("/cluster")
+
+    def close(self):
+        self.session.close()
+
+
+def get_client():
+    """
+    Returns shared client of current node.
+    :rtype: PatroniClient
+    """
+    global _client
+    if _client is None:
+        _client = PatroniClient()
+    return _client
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Single entry point for settings and callback scripts.
+# Only module of requested command is imported, heavy dependencies
+# (psycopg2, requests, yaml) are imported by modules on first use.
+#
+# python3 /pgskipper.py prepare /patroni/pg_conf_active.conf
+# python3 /pgskipper.py populate /patroni/pg_node.yml /patroni/pg_conf_active.conf
+# python3 /pgskipper.py propagate [--prepare] /patroni/pg_conf_propagate.conf
+# python3 /pgskipper.py validate [--prepare] --conf-file=/patroni/pg_conf_check.conf --restart-pg=false
+# python3 /pgskipper.py callback on_role_change master common
+# python3 /pgskipper.py restart --mode rolling --pending
+# python3 /pgskipper.py params check /patroni/pg_conf_active.conf
+# python3 /pgskipper.py stats top --by io --since 1h
+# python3 /pgskipper.py rollout --endpoints-file clusters.txt settings.conf
+
+import importlib
+import sys
+
+from utils import setup_logging
+
+COMMANDS = {
+    "prepare": ("prepare_settings_file", "main", "prepare settings file from env and user config"),
+    "populate": ("populate_patroni_config", "main", "merge settings to patroni bootstrap config"),
+    "propagate": ("propagate_settings_file", "main", "send changed settings to patroni"),
+    "validate": ("validate_settings_file", "cli", "check that settings are applied"),
+    "callback": ("setup_endpoint_callback", "main", "handle patroni callback"),
+    "restart": ("restart_manager", "main", "restart postgres through patroni REST API"),
+    "params": ("param_validator", "main", "check settings file against pg_settings bounds"),
+    "stats": ("stats_sampler", "main", "show workload statistics history"),
+    "rollout": ("fleet_rollout", "main", "send settings file to many patroni clusters"),
+}
+
+
+def usage():
+    return "Usage: {0} command [args]\n".format(sys.argv[0]) + \
+        "".join("  {:<10} {}\n".format(name, command[2]) for name, command in sorted(COMMANDS.items()))
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        sys.exit(usage())
+    module_name, function, _ = COMMANDS[sys.argv[1]]
+    setup_logging()
+    # commands parse sys.argv the same way as standalone scripts
+    sys.argv = ["{} {}".format(sys.argv[0], sys.argv[1])] + sys.argv[2:]
+    getattr(importlib.import_module(module_name), function)()
+
+
+if __name__ == '__main__':
+    main()
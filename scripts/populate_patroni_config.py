@@ -15,64 +15,102 @@
 import logging
 
 import sys
-import yaml
 # python /patroni/populate_patroni_config.py /patroni/pg_node.yml patroni/pg_conf_active.conf
-import json
-from utils import get_log_level
-
-logging.basicConfig(
-    level=get_log_level(),
-    format='[%(asctime)s][%(levelname)-5s][category=%(name)s] %(message)s',
-    datefmt='%Y-%m-%dT%H:%M:%S'
-)
+import property_file
+from utils import setup_logging, to_typed_value, write_file_atomically
+
 logger = logging.getLogger(__name__)
 
+_yaml = None
 
-def is_number(s):
-    """ Returns True if string is a number. """
-    try:
-        float(s)
-        return True
-    except ValueError:
-        return False
 
+def get_yaml():
+    """
+    Imports yaml on first use.
+    :return: (yaml module, loader, dumper)
+    """
+    global _yaml
+    if _yaml is None:
+        import yaml
+        # libyaml bindings are much faster, pure python implementation is fallback
+        try:
+            from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+        except ImportError:
+            from yaml import SafeLoader, SafeDumper
+        _yaml = (yaml, SafeLoader, SafeDumper)
+    return _yaml
 
-def populate_patroni_config(patroni_conf_filename, settings_conf_filename):
+
+def to_bootstrap_parameters(settings):
+    """
+    Converts raw settings values to typed values for patroni config.
+    :param settings: name -> raw value
+    :rtype: dict
+    """
+    result = {}
+    for param_name, raw_value in list(settings.items()):
+        value = to_typed_value(raw_value)
+        if param_name == "log_line_prefix" and value[:1] == "\\":
+            value = value[1:]
+        result[param_name] = value
+    return result
+
+
+def read_settings(settings_conf_filename):
+    """
+    Parses settings file to typed values.
+    :rtype: dict
+    """
+    return to_bootstrap_parameters(property_file.load(settings_conf_filename).raw)
+
+
+def load_patroni_config(patroni_conf_filename):
+    yaml, loader, _ = get_yaml()
     with open(patroni_conf_filename) as f:
-        patroni_conf = yaml.safe_load(f)
-
-        # todo[anin] check utils.read_property_file instead
-    config_data = ''
-    with open(settings_conf_filename) as f:
-        for line in f:
-            if "=" in line:
-                param_name = line[0:line.find("=")]
-                param_value = line[line.find("=")+1:-1]
-                config_data = \
-                    config_data + '\n' + \
-                    param_name + ": " + \
-                    ("!!str " if not is_number(param_value) else "") + \
-                    param_value
-            else:
-                config_data = config_data + '\n' + line
-    logger.debug("Result data from config file: {}\n".format(config_data))
-    conf = yaml.safe_load(config_data)
-    logger.debug(conf)
-    if conf:
-        params = patroni_conf['bootstrap']['dcs']['postgresql']['parameters']
-        for key in conf:
-            value = conf[key]
-            if key == "log_line_prefix" and value[:1] == "\\":
-                value = value[1:]
-
-            logger.debug("Apply {}={}".format(key, value))
+        return yaml.load(f, Loader=loader)
+
+
+def dump_patroni_config(patroni_conf):
+    yaml, _, dumper = get_yaml()
+    return yaml.dump(patroni_conf, Dumper=dumper, default_flow_style=False)
+
+
+def merge_bootstrap_parameters(patroni_conf, conf):
+    """
+    Applies typed parameters to bootstrap.dcs.postgresql.parameters.
+    :return: True if some parameter was changed
+    :rtype: bool
+    """
+    params = patroni_conf['bootstrap']['dcs']['postgresql']['parameters']
+    changed = False
+    for key, value in list(conf.items()):
+        if key not in params or params[key] != value:
+            logger.debug("Apply %s=%s", key, value)
             params[key] = value
+            changed = True
+    return changed
 
-    with open(patroni_conf_filename, mode='w') as f:
-        yaml.dump(patroni_conf, f, default_flow_style=False)
+
+def populate_patroni_config(patroni_conf_filename, settings_conf_filename):
+    """
+    Merges settings to bootstrap.dcs.postgresql.parameters section of patroni config.
+    Patroni config is rewritten only if parameters are changed.
+    :return: True if patroni config was changed
+    :rtype: bool
+    """
+    patroni_conf = load_patroni_config(patroni_conf_filename)
+    conf = read_settings(settings_conf_filename)
+    logger.debug("Result data from config file: %s", conf)
+    if not merge_bootstrap_parameters(patroni_conf, conf):
+        logger.info("Bootstrap parameters are not changed")
+        return False
+    write_file_atomically(patroni_conf_filename,
+                          dump_patroni_config(patroni_conf))
+    return True
 
 
 def main():
+    setup_logging()
     logger.info("Try to apply provided settings to patroni config. {}"
                 .format(sys.argv))
     if len(sys.argv) == 3:
@@ -18,13 +18,9 @@ import sys
 import os
 
 import logging
-from utils import read_property_file, get_log_level
+from utils import read_property_file, setup_logging
+from tune_resources import get_tuned_parameters
 
-logging.basicConfig(
-    level=get_log_level(),
-    format='[%(asctime)s][%(levelname)-5s][category=%(name)s] %(message)s',
-    datefmt='%Y-%m-%dT%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
 PG_USER_CONF = "/properties/postgresql.user.conf"
@@ -46,47 +42,72 @@ def get_parameters_from_user_conf():
     return read_property_file(PG_USER_CONF)
 
 
+def get_parameters():
+    """
+    Merges default parameters, parameters from env and user config.
+    :rtype: dict
+    """
+    params = {
+        "shared_preload_libraries": "pg_stat_statements, "
+                                    "pg_hint_plan, pg_cron",
+    }
+
+    tuned_params = get_tuned_parameters()
+    logger.info("Parameters calculated from resources: {}".format(tuned_params))
+    params.update(tuned_params)
+
+    logger.debug("Default parameters: %s", params)
+
+    env_params = get_parameters_from_env()
+    logger.info("Parameters from env: {}".format(env_params))
+    for key, value in list(env_params.items()):
+        params[key] = value
+
+    logger.info("RUN_PROPAGATE_SCRIPT is set to: {}, ".format(RUN_PROPAGATE_SCRIPT))
+    if RUN_PROPAGATE_SCRIPT == "true":
+        conf_params = get_parameters_from_user_conf()
+        logger.debug("Parameters from user config: %s", conf_params)
+        for key, value in list(conf_params.items()):
+            params[key] = value
+    else:
+        params.pop('shared_preload_libraries', None)
+
+    # pg_cron is required extension.
+    # check if it is present in shared_preload_libraries
+    if RUN_PROPAGATE_SCRIPT == "true":
+        libraries = [x.strip() for x in params.get("shared_preload_libraries", "").split(",")]
+        if 'pg_cron' not in libraries:
+            libraries.append("pg_cron")
+            params["shared_preload_libraries"] = ", ".join(libraries)
+
+    logger.info("Result: {}".format(params))
+    return params
+
+
+def format_settings(params):
+    return "".join("{}={}\n".format(key, value) for key, value in list(params.items()))
+
+
+def prepare_settings(target_file):
+    """
+    Merges parameters and writes result to target_file.
+    :return: merged parameters
+    :rtype: dict
+    """
+    params = get_parameters()
+    logger.debug("Target file {}".format(target_file))
+    with open(target_file, mode='w') as f:
+        f.write(format_settings(params))
+    return params
+
+
 def main():
+    setup_logging()
     logger.info("Try to prepare active properties configuration based on "
                 "current env and provided properties file. {}"
                 .format(sys.argv))
     if len(sys.argv) == 2:
-        target_file = sys.argv[1]
-
-        params = {
-            "shared_preload_libraries": "pg_stat_statements, "
-                                        "pg_hint_plan, pg_cron",
-        }
-
-        logger.debug("Default parameters: {}".format(params))
-
-        env_params = get_parameters_from_env()
-        logger.info("Parameters from env: {}".format(env_params))
-        for key, value in list(env_params.items()):
-            params[key] = value
-
-        logger.info("RUN_PROPAGATE_SCRIPT is set to: {}, ".format(RUN_PROPAGATE_SCRIPT))
-        if RUN_PROPAGATE_SCRIPT == "true":
-            conf_params = get_parameters_from_user_conf()
-            logger.debug("Parameters from user config: {}".format(conf_params))
-            for key, value in list(conf_params.items()):
-                params[key] = value
-        else:
-            params.pop('shared_preload_libraries', None)
-
-        # pg_cron is required extension.
-        # check if it is present in shared_preload_libraries
-        if RUN_PROPAGATE_SCRIPT == "true":
-            libraries = [x.strip() for x in params.get("shared_preload_libraries", "").split(",")]
-            if 'pg_cron' not in libraries:
-                libraries.append("pg_cron")
-                params["shared_preload_libraries"] = ", ".join(libraries)
-
-        logger.info("Result: {}".format(params))
-        logger.debug("Target file {}".format(target_file))
-        with open(target_file, mode='w') as f:
-            for key, value in list(params.items()):
-                f.write("{}={}\n".format(key, value))
+        prepare_settings(sys.argv[1])
     else:
         sys.exit("Usage: {0} ./new.properties".format(sys.argv[0]))
 
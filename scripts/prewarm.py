@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Buffer cache prewarm after promotion.
+# While node is replica, list of blocks in shared buffers is dumped to
+# $PGDATA/autoprewarm.blocks with autoprewarm_dump_now() every
+# PREWARM_DUMP_INTERVAL seconds. On promotion the list is loaded back with
+# pg_prewarm() by PREWARM_WORKERS connections in background, loading stops
+# when PREWARM_TIME_BUDGET seconds or PREWARM_IO_BUDGET_MB are spent.
+# Restored part of working set is logged and saved to PREWARM_REPORT.
+# Enabled by PREWARM_ENABLED=true, requires pg_prewarm extension.
+#
+# python3 /prewarm.py dump-loop
+# python3 /prewarm.py load
+
+import fcntl
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import metrics
+from utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "false").lower() == "true"
+DUMP_INTERVAL = int(os.getenv("PREWARM_DUMP_INTERVAL", 300))
+WORKERS = int(os.getenv("PREWARM_WORKERS", 4))
+TIME_BUDGET = float(os.getenv("PREWARM_TIME_BUDGET", 120))
+# 0 means that amount of read data is not limited
+IO_BUDGET_MB = int(os.getenv("PREWARM_IO_BUDGET_MB", 0))
+MODE = os.getenv("PREWARM_MODE", "buffer")
+REPORT = os.getenv("PREWARM_REPORT", "/patroni/prewarm_report.json")
+LOCK_FILE = "/patroni/prewarm.lock"
+BLOCKS_FILE = "autoprewarm.blocks"
+# max number of blocks read by single pg_prewarm call, budgets are checked between calls
+CHUNK_BLOCKS = 1024
+
+CONN_STRING = "host='localhost' dbname='{}' user='postgres' connect_timeout=3"
+
+
+def connect(dbname="postgres"):
+    import psycopg2
+    conn = psycopg2.connect(CONN_STRING.format(dbname))
+    conn.autocommit = True
+    return conn
+
+
+def dump_blocks(cursor):
+    """
+    Dumps list of blocks in shared buffers if node is replica.
+    :return: number of dumped blocks or None if node is primary
+    """
+    cursor.execute("select pg_is_in_recovery()")
+    if not cursor.fetchone()[0]:
+        return None
+    cursor.execute("select autoprewarm_dump_now()")
+    return cursor.fetchone()[0]
+
+
+def dump_loop(interval=DUMP_INTERVAL):
+    while True:
+        conn = None
+        try:
+            conn = connect()
+            with conn.cursor() as cursor:
+                blocks = dump_blocks(cursor)
+            if blocks is not None:
+                metrics.inc("prewarm_dumps_total")
+                logger.debug("Dumped {} blocks".format(blocks))
+        except Exception as e:
+            logger.warning("Cannot dump list of blocks: {}".format(e))
+        finally:
+            if conn is not None:
+                conn.close()
+        metrics.flush()
+        time.sleep(interval)
+
+
+def read_blocks_file(path):
+    """
+    Reads autoprewarm dump, lines are database,tablespace,filenode,fork,block
+    sorted in the same order.
+    :return: list of ranges (database, tablespace, filenode, fork, first block, last block)
+    """
+    ranges = []
+    with open(path) as f:
+        f.readline()  # <<number of blocks>>
+        for line in f:
+            parts = line.strip().split(",")
+            if len(parts) != 5:
+                continue
+            database, tablespace, filenode, fork, block = [int(p) for p in parts]
+            last = ranges[-1] if ranges else None
+            if last and last[:4] == (database, tablespace, filenode, fork) and \
+                    last[5] == block - 1 and last[5] - last[4] + 1 < CHUNK_BLOCKS:
+                ranges[-1] = last[:5] + (block,)
+            else:
+                ranges.append((database, tablespace, filenode, fork, block, block))
+    return ranges
+
+
+class Budget(object):
+    """
+    Time and IO budget shared by workers.
+    """
+
+    def __init__(self, seconds, max_blocks):
+        self.deadline = time.time() + seconds
+        self.max_blocks = max_blocks
+        self.blocks = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, blocks):
+        with self.lock:
+            if time.time() >= self.deadline:
+                return False
+            if self.max_blocks and self.blocks + blocks > self.max_blocks:
+                return False
+            self.blocks += blocks
+            return True
+
+
+class LoadTask(object):
+    """
+    Loads ranges of single database.
+    """
+
+    FORKS = {0: "main", 1: "fsm", 2: "vm", 3: "init"}
+
+    def __init__(self, dbname, ranges, budget):
+        self.dbname = dbname
+        self.ranges = ranges
+        self.budget = budget
+        self.loaded = 0
+        self.skipped = 0
+
+    def run(self):
+        conn = None
+        try:
+            conn = connect(self.dbname)
+            with conn.cursor() as cursor:
+                cursor.execute("select 1 from pg_extension where extname = 'pg_prewarm'")
+                if not cursor.fetchone():
+                    logger.info("Extension pg_prewarm is not installed in {}, skip it".format(self.dbname))
+                    self.skipped = sum(r[5] - r[4] + 1 for r in self.ranges)
+                    return
+                for database, tablespace, filenode, fork, first, last in self.ranges:
+                    blocks = last - first + 1
+                    if not self.budget.acquire(blocks):
+                        self.skipped += blocks
+                        continue
+                    timeout_ms = max(int((self.budget.deadline - time.time()) * 1000), 1)
+                    cursor.execute("set statement_timeout = {}".format(timeout_ms))
+                    try:
+                        cursor.execute("select pg_prewarm(pg_filenode_relation(%s, %s), %s, %s, %s, %s) "
+                                       "where pg_filenode_relation(%s, %s) is not null",
+                                       (tablespace, filenode, MODE, self.FORKS.get(fork, "main"),
+                                        first, last, tablespace, filenode))
+                        row = cursor.fetchone()
+                        if row:
+                            self.loaded += row[0]
+                        else:
+                            # relation was dropped or rewritten after dump
+                            self.skipped += blocks
+                    except Exception as e:
+                        logger.debug("Cannot prewarm {}/{}: {}".format(self.dbname, filenode, e))
+                        self.skipped += blocks
+        except Exception as e:
+            logger.warning("Prewarm of database {} failed: {}".format(self.dbname, e))
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def split_ranges(ranges, databases, workers):
+    """
+    Splits ranges of each database into parts which are loaded in parallel.
+    :return: list of (dbname, ranges)
+    """
+    by_db = {}
+    for r in ranges:
+        if r[0] in databases:
+            by_db.setdefault(databases[r[0]], []).append(r)
+    per_db = max(workers // max(len(by_db), 1), 1)
+    result = []
+    for dbname, db_ranges in sorted(by_db.items()):
+        for i in range(per_db):
+            part = db_ranges[i::per_db]
+            if part:
+                result.append((dbname, part))
+    return result
+
+
+def load(workers=WORKERS, time_budget=TIME_BUDGET, io_budget_mb=IO_BUDGET_MB):
+    """
+    Loads dumped blocks to shared buffers in parallel.
+    :return: report with total, loaded and skipped blocks, restored ratio and seconds
+    :rtype: dict
+    """
+    start = time.time()
+    conn = connect()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("select current_setting('data_directory'), current_setting('block_size')::int")
+            data_directory, block_size = cursor.fetchone()
+            cursor.execute("select oid, datname from pg_database where datallowconn")
+            databases = dict(cursor.fetchall())
+            # shared catalogs are dumped with database 0
+            databases[0] = "postgres"
+    finally:
+        conn.close()
+    path = os.path.join(data_directory, BLOCKS_FILE)
+    if not os.path.exists(path):
+        logger.info("There is no {}, nothing to prewarm".format(path))
+        return None
+    ranges = read_blocks_file(path)
+    total = sum(r[5] - r[4] + 1 for r in ranges)
+    budget = Budget(time_budget, io_budget_mb * 1024 * 1024 // block_size)
+    tasks = [LoadTask(dbname, part, budget) for dbname, part in split_ranges(ranges, databases, workers)]
+    if tasks:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda task: task.run(), tasks))
+    loaded = sum(task.loaded for task in tasks)
+    report = {
+        "total_blocks": total,
+        "loaded_blocks": loaded,
+        "skipped_blocks": total - loaded,
+        "restored_ratio": round(float(loaded) / total, 4) if total else 1.0,
+        "loaded_mb": round(float(loaded) * block_size / 1024 / 1024, 1),
+        "seconds": round(time.time() - start, 3),
+        "workers": min(workers, len(tasks)),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    metrics.observe("prewarm_seconds", report["seconds"])
+    metrics.inc("prewarm_loaded_blocks_total", loaded)
+    metrics.inc("prewarm_skipped_blocks_total", total - loaded)
+    logger.info("Restored {:.1%} of working set ({} of {} blocks, {} MB) in {}s"
+                .format(report["restored_ratio"], loaded, total, report["loaded_mb"], report["seconds"]))
+    try:
+        with open(REPORT, "w") as f:
+            json.dump(report, f)
+    except (IOError, OSError) as e:
+        logger.warning("Cannot save prewarm report: {}".format(e))
+    return report
+
+
+def load_once():
+    """
+    Runs load if another load is not in progress.
+    """
+    with open(LOCK_FILE, "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            logger.info("Prewarm is already in progress")
+            return None
+        return load()
+
+
+def start_background_load():
+    """
+    Starts prewarm in separate process, so callback is not delayed.
+    """
+    if not PREWARM_ENABLED:
+        return
+    logger.info("Start prewarm of buffer cache in background")
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "load"],
+                     start_new_session=True, close_fds=True)
+
+
+def main():
+    setup_logging()
+    if len(sys.argv) == 2 and sys.argv[1] == "dump-loop":
+        dump_loop()
+    elif len(sys.argv) == 2 and sys.argv[1] == "load":
+        load_once()
+    else:
+        sys.exit("Usage: {0} dump-loop | load".format(sys.argv[0]))
+
+
+if __name__ == '__main__':
+    main()
@@ -16,8 +16,5 @@
 
 source /setEnv.sh
 
-echo "Prepare file with current properties"
-python3 /prepare_settings_file.py /patroni/pg_conf_propagate.conf
-
-echo "Propagate to patroni file with current properties"
-python3 /propagate_settings_file.py /patroni/pg_conf_propagate.conf
+echo "Prepare file with current properties and propagate it to patroni"
+python3 /pgskipper.py propagate --prepare /patroni/pg_conf_propagate.conf
@@ -14,113 +14,332 @@
 # limitations under the License.
 
 import json
-import re
-import subprocess
 import sys
 import os
 import time
 
-from utils import read_property_file, get_host_ip, get_log_level
-from utils_db import get_settings_data, get_context_data, is_values_diff, is_restart_pending, schedule_restart, patroni_restart_state
+from utils import read_property_file, setup_logging
+from patroni_client import get_client
+import metrics
+from settings_diff import diff_settings, diff_dcs_settings
+from param_validator import validate as validate_parameters
+from utils_db import get_settings_snapshot, schedule_restart, patroni_restart_state
 import logging
-import requests
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s][%(levelname)-5s][category=%(name)s] %(message)s',
-    datefmt='%Y-%m-%dT%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
 
-def main():
+def to_patch_value(key, value):
+    if key != 'log_line_prefix':
+        tmp = value.strip()
+        if "\\" in tmp:
+            tmp = tmp.replace("\\", "\\\\")
+    else:
+        if "\\" == value[:2]:
+            tmp = value[2:]
+        else:
+            tmp = value
+    return tmp
+
+
+def get_dcs_parameters(client):
+    """
+    Reads postgresql parameters which are stored in DCS.
+    :rtype: dict
+    """
+    return (client.config().get("postgresql") or {}).get("parameters") or {}
+
+
+def parse_http_date(value):
+    """
+    :return: unix timestamp of HTTP Date header or None
+    """
+    from email.utils import parsedate_to_datetime
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def get_reference_times(client, members):
+    """
+    Reads dcs_last_seen of every member before patch. Patch is applied by
+    member on DCS read which is reported later than this value, so clocks
+    of different nodes are never compared.
+    :return: member name -> dcs_last_seen or None if member did not answer
+    :rtype: dict
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def read(member):
+        try:
+            return client.status(member["api_url"]).get("dcs_last_seen")
+        except Exception as e:
+            logger.debug("Cannot get status of member {}: {}".format(member.get("name"), e))
+            return None
+    members = [member for member in members if member.get("api_url")]
+    if not members:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(members)) as pool:
+        return dict(zip([member["name"] for member in members], pool.map(read, members)))
+
+
+def fill_reference_times(references, members, response):
+    """
+    Uses Date of PATCH response for members without own reference, server
+    time is closer to clocks of members than local time.
+    """
+    fallback = parse_http_date(response.headers.get("Date")) or time.time()
+    return dict((member["name"], references.get(member["name"]) or fallback) for member in members)
+
+
+def get_restart_expected(properties, snapshot):
+    """
+    :return: names of postmaster parameters which values differ from running values
+    :rtype: list
+    """
+    postmaster = dict((key, value) for key, value in list(properties.items())
+                      if snapshot.get(key, {}).get("context") == "postmaster")
+    return sorted(diff_settings(postmaster, snapshot))
+
+
+def check_local_values(expected):
+    """
+    Checks pg_settings of local node: parameters must have expected values or
+    wait for restart. Parameters unknown to the server are not checked.
+    :param expected: name -> value which was sent to patroni
+    :rtype: bool
+    """
+    snapshot = get_settings_snapshot(list(expected.keys()))
+    if not snapshot:
+        return False
+    changed = diff_settings(dict((key, value) for key, value in list(expected.items()) if key in snapshot),
+                            snapshot)
+    return all(snapshot[key].get("pending_restart") for key in changed)
+
+
+def get_restart_missing(status, restart_expected):
+    """
+    :return: names of restart_expected which member does not report as pending restart
+    :rtype: list
+    """
+    if "pending_restart_reason" in status:
+        reasons = status.get("pending_restart_reason") or {}
+        return [name for name in restart_expected if name not in reasons]
+    return [] if status.get("pending_restart") else list(restart_expected)
 
-    logger.info("Try to propagate property file to cluster. {}".format(sys.argv))
-    if len(sys.argv) == 2:
-        source_file = sys.argv[1]
-        properties = read_property_file(source_file)
-
-        # find properties which requires update
-        properties4update = {}
-        restart_required = False
-        for key, value in list(properties.items()):
-            current_value = get_settings_data(key)
-            if is_values_diff(value, current_value):
-                context = get_context_data(key)
-                logger.info(context)
-                if context == "internal":
-                    logger.error("We cannot change variable of internal context: {}".format(key))
-                    sys.exit(1)
-                properties4update[key] = value
-
-        if not properties4update:
-            logger.info("No properties to update")
-            return
-        logger.info("Need to update: {}".format(properties4update))
 
-        # form patch
-        #  todo[anin] add parameters validation (int - max, min val; string; enum)
-        patch_data = {"postgresql": {"parameters": {}}}
-        for key, value in list(properties4update.items()):
-            tmp = ""
-            if key != 'log_line_prefix':
-                tmp = value.strip()
-                if "\\" in tmp:
-                    tmp = tmp.replace("\\", "\\\\")
+def is_member_applied(status, reference, restart_expected=(), check_values=None):
+    """
+    Member applied patch if it read DCS later than reference, parameters
+    which require restart are reported in pending_restart_reason (patroni
+    without this field reports only pending_restart flag) and check_values
+    confirms values in pg_settings.
+    """
+    if status.get("dcs_last_seen", 0) <= reference:
+        return False
+    if restart_expected and get_restart_missing(status, restart_expected):
+        return False
+    return check_values is None or check_values()
+
+
+def wait_member_applied(client, member, reference, patch_time, timeout, restart_expected=(), check_values=None):
+    """
+    Waits while member reads DCS after patch and applies parameters.
+    :param reference: dcs_last_seen of member before patch, see get_reference_times
+    :param patch_time: local time of patch, used only to measure time-to-apply
+    :param restart_expected: names of parameters which must be pending restart
+    :param check_values: function which confirms values in pg_settings of member
+    :return: name, time-to-apply in seconds or None, pending_restart flag
+    """
+    api_url = member.get("api_url")
+    if not api_url:
+        return member.get("name"), None, None
+    start = time.time()
+    delay = 0.2
+    while True:
+        try:
+            status = client.status(api_url)
+            if is_member_applied(status, reference, restart_expected, check_values):
+                return member["name"], round(time.time() - patch_time, 3), \
+                    bool(status.get("pending_restart"))
+        except Exception as e:
+            logger.debug("Cannot get status of member {}: {}".format(member.get("name"), e))
+        if time.time() - start > timeout:
+            return member["name"], None, None
+        time.sleep(delay)
+        delay = min(delay * 2, 2)
+
+
+def wait_restart_pending(client, member, timeout, restart_expected):
+    """
+    Waits while member which applied patch reports parameters which require
+    restart. Patroni does not report pending restart if running value is
+    already equal to the new one, so waiting ends when member reads DCS
+    once more without them.
+    :return: names of parameters which are not pending restart
+    :rtype: list
+    """
+    reference = None
+    missing = list(restart_expected)
+    start = time.time()
+    delay = 0.2
+    while True:
+        try:
+            status = client.status(member["api_url"])
+            missing = get_restart_missing(status, restart_expected)
+            if not missing:
+                return missing
+            if reference is None:
+                reference = status.get("dcs_last_seen", 0)
+            elif status.get("dcs_last_seen", 0) > reference:
+                return missing
+        except Exception as e:
+            logger.debug("Cannot get status of member {}: {}".format(member.get("name"), e))
+        if time.time() - start > timeout:
+            return missing
+        time.sleep(delay)
+        delay = min(delay * 2, 2)
+
+
+def get_local_member_name(client, members):
+    """
+    :return: name of member which runs on current node or None
+    """
+    base_url = client.base_url.rstrip("/")
+    for member in members:
+        if (member.get("api_url") or "").startswith(base_url + "/"):
+            return member["name"]
+    return None
+
+
+def verify_members(client, members, references, patch_time, timeout, restart_expected=(), expected=None):
+    """
+    Checks in parallel that every cluster member picked up the patch. Values
+    in pg_settings are checked for member of current node.
+    :param references: member name -> dcs_last_seen before patch
+    :param expected: name -> value which was sent to patroni
+    :return: member name -> {"seconds": time-to-apply or None, "pending_restart": bool}
+    :rtype: dict
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    result = {}
+    if not members:
+        return result
+    local_name = get_local_member_name(client, members) if expected else None
+    with ThreadPoolExecutor(max_workers=len(members)) as pool:
+        futures = [pool.submit(wait_member_applied, client, member, references.get(member.get("name"), 0),
+                               patch_time, timeout, restart_expected,
+                               (lambda: check_local_values(expected)) if member.get("name") == local_name else None)
+                   for member in members]
+        for future in futures:
+            name, seconds, pending_restart = future.result()
+            result[name] = {"seconds": seconds, "pending_restart": pending_restart}
+            if seconds is None:
+                metrics.inc("settings_member_apply_timeouts_total")
+                logger.warning("Member {} did not apply settings in {}s".format(name, timeout))
             else:
-                if "\\" == value[:2]:
-                    tmp = value[2:]
-                else:
-                    tmp = value
+                metrics.observe("settings_member_apply_seconds", seconds)
+                logger.info("Member {} applied settings in {}s, pending restart: {}"
+                            .format(name, seconds, pending_restart))
+    return result
+
 
-            patch_data["postgresql"]["parameters"][key] = tmp  # json.dumps(value)
+def propagate_settings(source_file, client=None):
+    """
+    Sends parameters from source_file which differ from parameters in DCS
+    to patroni, checks that every member applied them and schedules restart
+    if it is required.
+    :param source_file:
+    :param client: patroni_client.PatroniClient, shared client by default
+    :return: False if some parameter cannot be changed or patch failed,
+             otherwise dict member name -> time-to-apply
+    """
+    properties = read_property_file(source_file)
+    client = client or get_client()
+
+    snapshot = get_settings_snapshot(list(properties.keys()))
+    patch_values = dict((key, to_patch_value(key, value)) for key, value in list(properties.items()))
+    # find properties which requires update in DCS
+    properties4update = diff_dcs_settings(patch_values, get_dcs_parameters(client), snapshot)
+    for key in properties4update:
+        if snapshot.get(key, {}).get("context") == "internal":
+            logger.error("We cannot change variable of internal context: {}".format(key))
+            return False
+
+    # DCS can be already updated while previous run was interrupted before restart.
+    # Parameters unknown to the server, like GUCs of not loaded libraries, cannot be checked.
+    not_applied = {}
+    if snapshot:
+        not_applied = diff_settings(dict((key, properties[key]) for key in properties
+                                         if key not in properties4update and key in snapshot), snapshot)
+    if not properties4update and not not_applied:
+        logger.info("No properties to update")
+        return {}
+
+    members = {}
+    if properties4update:
+        logger.info("Need to update: {}".format(properties4update))
+        validation = validate_parameters(properties4update)
+        if len(validation.properties) < len(properties4update):
+            logger.error("Settings are not sent to patroni because of invalid values: {}"
+                         .format(validation.errors))
+            metrics.inc("settings_validation_failures_total")
+            return False
+        properties4update = validation.properties
+        # values are escaped for patroni, only clamped values differ from the file
+        sent = dict((key, properties[key] if value == patch_values[key] else value)
+                    for key, value in list(properties4update.items()))
+        if validation.restart_required:
+            logger.info("Restart is expected for: {}".format(validation.restart_required))
+        patch_data = {"postgresql": {"parameters": properties4update}}
 
         # send patch
         # curl -i -XPATCH -d @/patroni/parameters_data http://$(hostname -i):8008/config
-        logger.debug("Patch prepared: {}".format(patch_data))
-        user = os.getenv('PATRONI_REST_API_USER')
-        password = os.getenv('PATRONI_REST_API_PASSWORD')
-        from requests.auth import HTTPBasicAuth
-        basic_auth = HTTPBasicAuth(user, password)
-        logger.info(requests.patch(
-            "http://{}:8008/config".format(get_host_ip()),
-            data=json.dumps(patch_data),
-            auth=basic_auth))
-
-
-        # todo[anin] replace with pg_settings.pending_restart check.
-        # There is problem - patroni updates config after restart command.
-        # So we cannot detect pending_restart flag until actual restart.
-        # for key, value in properties4update.items():
-        #     (current_value, unit, category, vartype, context) = get_setting_data(key)
-        #     if is_values_differs(value, current_value, unit, vartype):
-        #         logger.info("Schedule restart because some settings requires restart")
-        #         schedule_restart()
-        #         return
-        iterations = int(os.getenv('CHANGE_SETTINGS_RETRIES', 5))
-        sleep = int(os.getenv('CHANGE_SETTINGS_INTERVAL', 3))
-        if patroni_restart_state(basic_auth, iterations, sleep):
-            schedule_restart()
-
-            return
-
-        # # todo[anin] this code can be interrupted by callback executor
-        # # wait while value will be applied to current server
-        # applied = True
-        # for i in range(1, 60):
-        #     applied = True
-        #     for key, value in properties4update.items():
-        #         (current_value, unit, category, vartype) = get_setting_data(key)
-        #         if is_values_differs(value, current_value, unit, vartype):
-        #             applied = False
-        #             sleep(1)
-        #             break
-        #
-        # if not applied:
-        #     sys.exit("Setting were not applied")
+        logger.debug("Patch prepared: %s", patch_data)
+        cluster_members = client.cluster().get("members", [])
+        references = get_reference_times(client, cluster_members)
+        patch_time = time.time()
+        r = client.patch("/config", data=json.dumps(patch_data))
+        metrics.observe("settings_patch_seconds", time.time() - patch_time)
+        if not r.ok:
+            logger.error("Cannot patch patroni config: {} {}".format(r.status_code, r.text))
+            metrics.inc("settings_patch_failures_total")
+            return False
+        metrics.inc("settings_patched_parameters_total", len(properties4update))
+        logger.info("Patroni config is patched in {:.3f}s".format(time.time() - patch_time))
+        references = fill_reference_times(references, cluster_members, r)
+        members = verify_members(client, cluster_members, references, patch_time,
+                                 int(os.getenv('CHANGE_SETTINGS_APPLY_TIMEOUT', 30)),
+                                 get_restart_expected(properties4update, snapshot), sent)
+    else:
+        logger.info("DCS is up to date, not applied locally: {}".format(not_applied))
 
+    # todo[anin] replace with pg_settings.pending_restart check.
+    # There is problem - patroni updates config after restart command.
+    # So we cannot detect pending_restart flag until actual restart.
+    iterations = int(os.getenv('CHANGE_SETTINGS_RETRIES', 5))
+    sleep = int(os.getenv('CHANGE_SETTINGS_INTERVAL', 3))
+    expected = dict(not_applied)
+    if properties4update:
+        expected.update(sent)
+    if patroni_restart_state(client, iterations, sleep, expected=expected):
+        schedule_restart()
+    return dict((name, state["seconds"]) for name, state in list(members.items()))
+
+
+def main():
+    setup_logging()
+    logger.info("Try to propagate property file to cluster. {}".format(sys.argv))
+    args = [arg for arg in sys.argv[1:] if arg != "--prepare"]
+    if len(args) == 1:
+        if "--prepare" in sys.argv:
+            from prepare_settings_file import prepare_settings
+            prepare_settings(args[0])
+        if propagate_settings(args[0]) is False:
+            sys.exit(1)
     else:
-        sys.exit("Usage: {0} ./active.properties".format(sys.argv[0]))
+        sys.exit("Usage: {0} [--prepare] ./active.properties".format(sys.argv[0]))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,220 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Property files parser with on-disk cache.
+# include, include_if_exists and include_dir directives are processed the same
+# way as postgresql.conf does. Result of the previous parse is kept in cache
+# file together with mtime, size and sha256 of every parsed file, so unchanged
+# files are not parsed again and caller gets diff against the previous parse.
+
+import collections
+import glob
+import hashlib
+import json
+import logging
+import os
+
+from utils import comment_pattern, to_typed_value, write_file_atomically
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("PROPERTY_CACHE_DIR", "/patroni/property_cache")
+# the same limit as CONF_FILE_MAX_DEPTH in postgres
+MAX_INCLUDE_DEPTH = 10
+INCLUDE_DIRECTIVES = ("include", "include_if_exists", "include_dir")
+
+PropertyDiff = collections.namedtuple("PropertyDiff", "added removed changed")
+
+
+class PropertySet(object):
+
+    def __init__(self, raw, diff, cached):
+        """
+        :param raw: ordered name -> value text after "="
+        :param diff: PropertyDiff against the previous parse
+        :param cached: True if files were not parsed again
+        """
+        self.raw = raw
+        self.diff = diff
+        self.cached = cached
+
+    @property
+    def changed(self):
+        return bool(self.diff.added or self.diff.removed or self.diff.changed)
+
+    def properties(self):
+        """
+        Returns values in format of utils.read_property_file.
+        :rtype: collections.OrderedDict
+        """
+        result = collections.OrderedDict()
+        for name, value in list(self.raw.items()):
+            if name != 'log_line_prefix':
+                value = value.strip()
+            else:
+                if value[:1] == '%':
+                    value = "\\{}".format(value)
+                value = value.lstrip()
+            result[name] = value
+        return result
+
+    def typed(self):
+        """
+        Returns values converted to int, float or str as yaml does.
+        :rtype: collections.OrderedDict
+        """
+        return collections.OrderedDict((name, to_typed_value(value))
+                                       for name, value in list(self.raw.items()))
+
+
+def file_state(path):
+    st = os.stat(path)
+    return [path, st.st_mtime_ns, st.st_size, None]
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class Parser(object):
+
+    def __init__(self):
+        self.raw = collections.OrderedDict()
+        self.files = []
+        self.dirs = []
+        self.missing = []
+
+    def parse(self, path, depth=0):
+        if depth > MAX_INCLUDE_DEPTH:
+            raise ValueError("Could not open file {}: maximum nesting depth exceeded".format(path))
+        path = os.path.abspath(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        state = file_state(path)
+        state[3] = hashlib.sha256(data).hexdigest()
+        self.files.append(state)
+        # universal newlines as text mode open does
+        for line in data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+            self.parse_line(path, line, depth)
+
+    def parse_line(self, path, line, depth):
+        stripped = line.strip()
+        if not stripped or stripped[0] == "#":
+            return
+        directive = stripped.split(None, 1)[0].split("=", 1)[0]
+        if directive in INCLUDE_DIRECTIVES:
+            self.include(path, directive, stripped[len(directive):].lstrip().lstrip("=").strip(), depth)
+            return
+        if "=" in line and not comment_pattern.match(line):
+            name, _, value = line.partition("=")
+            self.raw[name.strip()] = value
+
+    def include(self, path, directive, value, depth):
+        target = str(to_typed_value(value))
+        if not os.path.isabs(target):
+            target = os.path.join(os.path.dirname(path), target)
+        if directive == "include_dir":
+            if not os.path.isdir(target):
+                raise ValueError("Could not open configuration directory {}".format(target))
+            self.dirs.append([target, os.stat(target).st_mtime_ns])
+            for name in sorted(glob.glob(os.path.join(target, "*.conf"))):
+                if not os.path.basename(name).startswith("."):
+                    self.parse(name, depth + 1)
+        elif directive == "include_if_exists" and not os.path.exists(target):
+            logger.debug("Skipping missing configuration file {}".format(target))
+            self.missing.append(target)
+        else:
+            self.parse(target, depth + 1)
+
+
+def cache_file(filename, key):
+    name = "{}:{}".format(os.path.abspath(filename), key or "")
+    return os.path.join(CACHE_DIR, hashlib.sha1(name.encode("utf-8")).hexdigest() + ".json")
+
+
+def load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def save_cache(path, data):
+    try:
+        if not os.path.isdir(CACHE_DIR):
+            os.makedirs(CACHE_DIR)
+        write_file_atomically(path, json.dumps(data))
+    except (IOError, OSError) as e:
+        logger.debug("Cannot write property cache {}: {}".format(path, e))
+
+
+def is_cache_valid(cache):
+    """
+    Checks that parsed files were not changed. If stat differs, file
+    content hash is compared, so touched files do not invalidate cache,
+    their new stat is stored to cache.
+    """
+    for state in cache["files"]:
+        try:
+            current = file_state(state[0])
+        except OSError:
+            return False
+        if current[1:3] != state[1:3]:
+            if file_hash(state[0]) != state[3]:
+                return False
+            state[1:3] = current[1:3]
+            cache["touched"] = True
+    for path, mtime_ns in cache["dirs"]:
+        try:
+            if os.stat(path).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+    return not any(os.path.exists(path) for path in cache["missing"])
+
+
+def diff(previous, current):
+    added = collections.OrderedDict((k, v) for k, v in list(current.items()) if k not in previous)
+    removed = collections.OrderedDict((k, v) for k, v in list(previous.items()) if k not in current)
+    changed = collections.OrderedDict((k, (previous[k], v)) for k, v in list(current.items())
+                                      if k in previous and previous[k] != v)
+    return PropertyDiff(added, removed, changed)
+
+
+def load(filename, key=None, use_cache=True):
+    """
+    Parses property file with included files.
+    :param filename: path to property file
+    :param key: name of consumer, each consumer gets diff against its own previous parse
+    :param use_cache: use on-disk cache of previous parse
+    :rtype: PropertySet
+    """
+    path = cache_file(filename, key)
+    cache = load_cache(path) if use_cache else None
+    if cache:
+        previous = collections.OrderedDict(cache["properties"])
+        if is_cache_valid(cache):
+            if cache.pop("touched", False):
+                save_cache(path, cache)
+            return PropertySet(previous, diff(previous, previous), True)
+    else:
+        previous = collections.OrderedDict()
+    parser = Parser()
+    parser.parse(filename)
+    if use_cache:
+        save_cache(path, {"files": parser.files, "dirs": parser.dirs, "missing": parser.missing,
+                          "properties": list(parser.raw.items())})
+    return PropertySet(parser.raw, diff(previous, parser.raw), False)
@@ -0,0 +1,223 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Restart of postgres through patroni REST API POST /restart.
+# RESTART_MODE=local (default) restarts current node, rolling restarts
+# replicas one by one and primary last. Next member is restarted only when
+# the previous one is running and its replication lag is below
+# RESTART_MAX_LAG_BYTES. Restart is done in background thread which logs
+# progress, caller can wait for result.
+#
+# python3 /pgskipper.py restart --mode rolling --pending
+
+import logging
+import os
+import sys
+import threading
+import time
+
+import metrics
+from patroni_client import get_client
+
+logger = logging.getLogger(__name__)
+
+RESTART_MODE = os.getenv("RESTART_MODE", "local")
+RESTART_TIMEOUT = int(os.getenv("RESTART_TIMEOUT", 300))
+MAX_LAG_BYTES = int(os.getenv("RESTART_MAX_LAG_BYTES", 16 * 1024 * 1024))
+POLL_INTERVAL = 1
+LEADER_ROLES = ("leader", "master", "primary", "standby_leader")
+
+
+def base_url(api_url):
+    """
+    Converts member api_url like http://10.0.0.1:8008/patroni to base url.
+    """
+    scheme, _, rest = api_url.partition("://")
+    return "{}://{}".format(scheme, rest.split("/", 1)[0])
+
+
+def get_members(client):
+    """
+    Returns members in restart order: replicas with the smallest lag first, leader last.
+    :rtype: list
+    """
+    members = []
+    for member in client.cluster().get("members", []):
+        members.append({"name": member["name"], "url": base_url(member["api_url"]),
+                        "leader": member.get("role") in LEADER_ROLES})
+    lags = get_lags(client)
+    return sorted(members, key=lambda m: (m["leader"], lags.get(m["name"]) or 0))
+
+
+def get_lags(client):
+    """
+    :return: member name -> replication lag in bytes or None if unknown
+    :rtype: dict
+    """
+    result = {}
+    for member in client.cluster().get("members", []):
+        lag = member.get("lag")
+        result[member["name"]] = lag if isinstance(lag, int) else None
+    return result
+
+
+class RestartTask(threading.Thread):
+
+    def __init__(self, client, members, restart_pending=False, schedule=None,
+                 max_lag=MAX_LAG_BYTES, timeout=RESTART_TIMEOUT):
+        threading.Thread.__init__(self, name="restart")
+        self.client = client
+        self.members = members
+        self.restart_pending = restart_pending
+        self.schedule = schedule
+        self.max_lag = max_lag
+        self.timeout = timeout
+        # member name -> restarted, scheduled, skipped, failed or not started
+        self.results = dict((member["name"], "not started") for member in members)
+
+    def post_restart(self, member, response):
+        data = {"restart_pending": self.restart_pending}
+        if self.schedule:
+            data["schedule"] = self.schedule
+        try:
+            response.append(self.client.post(member["url"] + "/restart", json=data,
+                                             timeout=(3, self.timeout)))
+        except Exception as e:
+            response.append(e)
+
+    def get_state(self, member):
+        try:
+            return self.client.status(member["url"] + "/patroni").get("state")
+        except Exception:
+            return "unavailable"
+
+    def restart_member(self, member):
+        """
+        Sends restart request, patroni answers when restart is finished,
+        state of member is logged meanwhile.
+        :return: restarted, scheduled, skipped or failed
+        """
+        start = time.time()
+        response = []
+        poster = threading.Thread(target=self.post_restart, args=(member, response))
+        poster.start()
+        state = None
+        while poster.is_alive():
+            poster.join(POLL_INTERVAL)
+            if poster.is_alive():
+                current = self.get_state(member)
+                if current != state:
+                    state = current
+                    logger.info("Member {} is {} ({:.1f}s)".format(member["name"], state, time.time() - start))
+        r = response[0]
+        if isinstance(r, Exception):
+            logger.error("Cannot restart member {}: {}".format(member["name"], r))
+            return "failed"
+        if r.status_code == 202:
+            logger.info("Restart of member {} is scheduled: {}".format(member["name"], r.text))
+            return "scheduled"
+        if r.status_code == 503 and self.restart_pending:
+            logger.info("Member {} does not require restart: {}".format(member["name"], r.text))
+            return "skipped"
+        if r.status_code != 200:
+            logger.error("Cannot restart member {}: {} {}".format(member["name"], r.status_code, r.text))
+            return "failed"
+        metrics.observe("restart_seconds", time.time() - start)
+        logger.info("Member {} is restarted in {:.1f}s".format(member["name"], time.time() - start))
+        return "restarted"
+
+    def wait_replica_caught_up(self, member):
+        deadline = time.time() + self.timeout
+        while time.time() < deadline:
+            try:
+                if self.get_state(member) == "running":
+                    lag = get_lags(self.client).get(member["name"])
+                    if lag is not None and lag <= self.max_lag:
+                        return True
+                    logger.info("Replication lag of member {} is {}".format(member["name"], lag))
+            except Exception as e:
+                logger.warning("Cannot get lag of member {}: {}".format(member["name"], e))
+            time.sleep(POLL_INTERVAL)
+        return False
+
+    def run(self):
+        for member in self.members:
+            logger.info("Restart member {}".format(member["name"]))
+            result = self.restart_member(member)
+            self.results[member["name"]] = result
+            if result == "failed":
+                logger.error("Restart is stopped because member {} failed".format(member["name"]))
+                return
+            if result == "restarted" and not member["leader"] and len(self.members) > 1 and \
+                    not self.wait_replica_caught_up(member):
+                logger.error("Restart is stopped because member {} did not catch up in {}s"
+                             .format(member["name"], self.timeout))
+                return
+        logger.info("Restart is finished: {}".format(self.results))
+
+    def wait(self, timeout=None):
+        """
+        :return: member name -> restart result
+        :rtype: dict
+        """
+        self.join(timeout)
+        return self.results
+
+
+def schedule_restart(client=None, restart_pending=False, schedule=None, mode=None, wait=False):
+    """
+    Starts restart of current node or rolling restart of cluster in background.
+    :param restart_pending: restart only members with pending restart
+    :param schedule: timestamp in ISO format to schedule restart by patroni
+    :param mode: local or rolling, RESTART_MODE by default
+    :param wait: wait until restart is finished
+    :rtype: RestartTask
+    """
+    client = client or get_client()
+    mode = mode or RESTART_MODE
+    if mode == "rolling":
+        members = get_members(client)
+    elif mode == "local":
+        members = [{"name": client.status().get("patroni", {}).get("name", "local"),
+                    "url": client.base_url, "leader": True}]
+    else:
+        raise ValueError("Unknown restart mode {}".format(mode))
+    logger.info("Schedule {} restart of {}".format(mode, [member["name"] for member in members]))
+    task = RestartTask(client, members, restart_pending, schedule)
+    task.start()
+    if wait:
+        task.wait()
+    return task
+
+
+def main():
+    import argparse
+    from utils import setup_logging
+    setup_logging()
+    parser = argparse.ArgumentParser(description='Restart postgres through patroni')
+    parser.add_argument('--mode', choices=('local', 'rolling'), default=None,
+                        help='restart current node or all members, RESTART_MODE by default')
+    parser.add_argument('--pending', action='store_true',
+                        help='restart only members with pending restart')
+    parser.add_argument('--schedule', default=None,
+                        help='timestamp in ISO format to schedule restart')
+    args = parser.parse_args()
+    results = schedule_restart(restart_pending=args.pending, schedule=args.schedule,
+                               mode=args.mode, wait=True).results
+    if any(result in ("failed", "not started") for result in list(results.values())):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
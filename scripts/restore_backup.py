@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Restores basebackup from backup daemon.
+# Response body is streamed straight into decompressor and tar extraction,
+# archive is never stored on disk. Dropped connection is continued with
+# http range request from the last received byte while decompressor state
+# is still in memory. Restarted restore downloads archive again, but skips
+# tar members which were fully written according to checkpoint, so only
+# the rest of files is written. Checkpoint keeps ETag and size of archive,
+# restore is not continued if backup is changed or cannot be identified. Decompression is done by pigz or zstd,
+# python gzip is used if pigz is not installed, file data is written by
+# pool of writer threads.
+#
+# python3 /restore_backup.py --restore-version 20240101T0000 --target-dir /var/lib/pgsql/data/postgresql_node1
+
+import argparse
+import collections
+import gzip
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+RESTORE_URL = os.getenv("RESTORE_URL", "http://postgres-backup-daemon:8081/get")
+# checkpoint is small, it is kept outside of data volume
+CHECKPOINT_DIR = os.getenv("RESTORE_CHECKPOINT_DIR", "/patroni/restore")
+WRITERS = int(os.getenv("RESTORE_WRITERS", 4))
+DOWNLOAD_RETRIES = int(os.getenv("RESTORE_DOWNLOAD_RETRIES", 10))
+CHUNK_SIZE = 1024 * 1024
+CHECKPOINT_INTERVAL = 5
+MAX_PENDING_CHUNKS = 64
+PROGRESS_INTERVAL = 10
+
+
+class Checkpoint(object):
+    """
+    Number and name of tar members which are completely written
+    and identity of backup archive they belong to.
+    """
+
+    def __init__(self, checkpoint_dir, restore_version):
+        self.path = os.path.join(checkpoint_dir, "checkpoint.json")
+        self.data = {"restore_version": restore_version, "backup": None,
+                     "members": 0, "last_member": None, "bytes": 0}
+        self.saved_at = 0
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("restore_version") == restore_version:
+                self.data = data
+                logger.info("Resume restore after member {} ({} members are written)"
+                            .format(data["last_member"], data["members"]))
+
+    def check_backup(self, backup):
+        """
+        Remembers identity of archive on the first response, checks it on resume.
+        :param backup: dict with etag and size of archive, values are None if unknown
+        """
+        if self.data.get("backup") is None and not self.data["members"]:
+            self.data["backup"] = backup
+            return
+        known = self.data.get("backup") or {}
+        if not any(known.values()) or not any(backup.values()):
+            raise RuntimeError("Backup cannot be identified, restore cannot be continued. "
+                               "Clean target directory and remove {}".format(self.path))
+        for key, value in list(known.items()):
+            if value and backup.get(key) and value != backup[key]:
+                raise RuntimeError("Backup was changed since previous attempt ({} {} != {}). "
+                                   "Clean target directory and remove {}"
+                                   .format(key, value, backup[key], self.path))
+
+    def update(self, members, last_member, offset):
+        self.data.update(members=members, last_member=last_member, bytes=offset)
+        if time.time() - self.saved_at >= CHECKPOINT_INTERVAL:
+            self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.saved_at = time.time()
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class HttpStream(object):
+    """
+    File-like object over response body, reconnects with range request
+    from the last received byte if connection is dropped.
+    """
+
+    def __init__(self, session, url, params, checkpoint):
+        self.session = session
+        self.url = url
+        self.params = params
+        self.checkpoint = checkpoint
+        self.offset = 0
+        self.started_at = time.time()
+        self.response = self.request()
+        self.encoding = self.get_encoding(self.response)
+
+    def request(self):
+        headers = {}
+        backup = self.checkpoint.data.get("backup") or {}
+        if self.offset:
+            headers["Range"] = "bytes={}-".format(self.offset)
+            if backup.get("etag"):
+                headers["If-Range"] = backup["etag"]
+        r = self.session.get(self.url, params=self.params, headers=headers,
+                             stream=True, timeout=(5, 60))
+        r.raise_for_status()
+        if self.offset and r.status_code != 206:
+            r.close()
+            raise RuntimeError("Backup daemon cannot continue download from byte {}".format(self.offset))
+        try:
+            self.checkpoint.check_backup(self.get_backup(r))
+        except RuntimeError:
+            r.close()
+            raise
+        return r
+
+    @staticmethod
+    def get_backup(response):
+        """
+        :return: ETag and size of whole archive, size of range response is taken from Content-Range
+        """
+        if response.status_code == 206:
+            size = response.headers.get("Content-Range", "").rpartition("/")[2]
+        else:
+            size = response.headers.get("Content-Length")
+        return {"etag": response.headers.get("ETag"),
+                "size": int(size) if size and size.isdigit() else None}
+
+    @staticmethod
+    def get_encoding(response):
+        content_type = "{} {}".format(response.headers.get("Content-Encoding", ""),
+                                      response.headers.get("Content-Type", ""))
+        return "zstd" if "zstd" in content_type else "gzip"
+
+    def read(self, size=CHUNK_SIZE):
+        import requests
+        import urllib3
+        if size is None or size < 0:
+            size = CHUNK_SIZE
+        delay = 1
+        for attempt in range(DOWNLOAD_RETRIES):
+            try:
+                # body is passed to decompressor as is, like curl does
+                data = self.response.raw.read(size, decode_content=False)
+                self.offset += len(data)
+                return data
+            except (requests.RequestException, urllib3.exceptions.HTTPError, IOError) as e:
+                logger.warning("Download is interrupted at byte {}: {}. Retry in {}s".format(self.offset, e, delay))
+                self.response.close()
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+            try:
+                self.response = self.request()
+            except (requests.RequestException, IOError) as e:
+                logger.warning("Cannot continue download: {}".format(e))
+        raise IOError("Cannot download backup after {} attempts".format(DOWNLOAD_RETRIES))
+
+    def close(self):
+        self.response.close()
+
+
+class Decompressor(object):
+    """
+    Runs pigz or zstd, input is fed by separate thread.
+    """
+
+    def __init__(self, command, source):
+        self.command = command
+        self.source = source
+        self.error = None
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.stdout = self.process.stdout
+        threading.Thread(target=self.feed, name="decompressor-feed", daemon=True).start()
+
+    def feed(self):
+        try:
+            while True:
+                data = self.source.read(CHUNK_SIZE)
+                if not data:
+                    break
+                self.process.stdin.write(data)
+        except Exception as e:
+            self.error = e
+        finally:
+            try:
+                self.process.stdin.close()
+            except (IOError, OSError):
+                pass
+
+    def read(self, size=-1):
+        return self.stdout.read(size)
+
+    def close(self):
+        self.stdout.close()
+        if self.process.wait() != 0 and self.error is None:
+            self.error = IOError("{} exited with code {}".format(self.command[0], self.process.returncode))
+        if self.error:
+            raise self.error
+
+
+def decompressed_stream(source, encoding):
+    """
+    Returns file-like object with decompressed archive.
+    pigz decompresses in separate process with its own read, write and
+    checksum threads, so it runs in parallel with extraction.
+    """
+    if encoding == "zstd":
+        if not shutil.which("zstd"):
+            raise RuntimeError("Backup is compressed with zstd, but zstd is not installed")
+        return Decompressor(["zstd", "-d", "-c"], source)
+    if shutil.which("pigz"):
+        return Decompressor(["pigz", "-d", "-c"], source)
+    logger.warning("pigz is not installed, archive is decompressed by python gzip")
+    return gzip.GzipFile(fileobj=source, mode="rb")
+
+
+class FileWriter(object):
+    """
+    Writes file data with pool of threads, amount of buffered chunks is bounded.
+    """
+
+    def __init__(self, writers=WRITERS):
+        self.pool = ThreadPoolExecutor(max_workers=writers)
+        self.pending = threading.BoundedSemaphore(MAX_PENDING_CHUNKS)
+        self.written = 0
+        self.lock = threading.Lock()
+
+    def write_chunk(self, fd, data, offset):
+        try:
+            os.pwrite(fd, data, offset)
+            with self.lock:
+                self.written += len(data)
+        finally:
+            self.pending.release()
+
+    def close_file(self, fd, futures, mode, mtime, path):
+        try:
+            for future in futures:
+                future.result()
+            os.fchmod(fd, mode)
+        finally:
+            os.close(fd)
+        os.utime(path, (mtime, mtime))
+
+    def write(self, path, fileobj, member):
+        """
+        :return: future which is done when file is completely written
+        """
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        futures = []
+        offset = 0
+        while True:
+            data = fileobj.read(CHUNK_SIZE)
+            if not data:
+                break
+            self.pending.acquire()
+            futures.append(self.pool.submit(self.write_chunk, fd, data, offset))
+            offset += len(data)
+        return self.pool.submit(self.close_file, fd, futures, member.mode & 0o7777, member.mtime, path)
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+def safe_path(target_dir, name):
+    path = os.path.normpath(os.path.join(target_dir, name.lstrip("/")))
+    if path != target_dir and not path.startswith(target_dir + os.sep):
+        raise ValueError("Archive member {} is outside of {}".format(name, target_dir))
+    return path
+
+
+def check_link(target_dir, member, path):
+    """
+    Checks that link member points inside of target_dir.
+    Tablespace links in pg_tblspc point to absolute location of tablespace,
+    such links are allowed if they do not contain "..".
+    """
+    if member.issym() and os.path.isabs(member.linkname):
+        if os.path.dirname(os.path.relpath(path, target_dir)) != "pg_tblspc" \
+                or ".." in member.linkname.split("/"):
+            raise ValueError("Archive member {} links to {}, absolute links are allowed only in pg_tblspc"
+                             .format(member.name, member.linkname))
+    elif member.issym():
+        safe_path(target_dir, os.path.relpath(
+            os.path.normpath(os.path.join(os.path.dirname(path), member.linkname)), target_dir))
+    elif member.islnk():
+        safe_path(target_dir, member.linkname)
+
+
+class Extractor(object):
+    """
+    Extracts tar stream, members which are written before checkpoint are skipped.
+    Member is done when it and all previous members are written.
+    """
+
+    def __init__(self, target_dir, writer, checkpoint, source):
+        self.target_dir = target_dir
+        self.writer = writer
+        self.checkpoint = checkpoint
+        self.source = source
+        self.in_progress = collections.deque()
+        self.files = 0
+
+    def complete(self, wait=False):
+        while self.in_progress and (wait or self.in_progress[0][2] is None or self.in_progress[0][2].done()):
+            index, name, future = self.in_progress.popleft()
+            if future is not None:
+                future.result()
+            self.checkpoint.update(index + 1, name, self.source.offset)
+
+    def extract_member(self, tar, member):
+        path = safe_path(self.target_dir, member.name)
+        if member.isreg():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.files += 1
+            return self.writer.write(path, tar.extractfile(member), member)
+        if member.isdir():
+            os.makedirs(path, exist_ok=True)
+            os.chmod(path, member.mode & 0o7777)
+        elif member.issym() or member.islnk():
+            # links are created here, tarfile data filter rejects absolute tablespace links
+            check_link(self.target_dir, member, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.lexists(path):
+                os.remove(path)
+            if member.issym():
+                os.symlink(member.linkname, path)
+            else:
+                os.link(safe_path(self.target_dir, member.linkname), path)
+        else:
+            logger.warning("Archive member {} of type {} is skipped".format(member.name, member.type))
+        return None
+
+    def run(self, stream):
+        skip = self.checkpoint.data["members"]
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            for index, member in enumerate(tar):
+                if index < skip:
+                    if index == skip - 1 and member.name != self.checkpoint.data["last_member"]:
+                        raise RuntimeError("Archive does not match checkpoint: member {} is {}, expected {}"
+                                           .format(index, member.name, self.checkpoint.data["last_member"]))
+                    continue
+                self.in_progress.append((index, member.name, self.extract_member(tar, member)))
+                self.complete()
+        self.complete(wait=True)
+        self.checkpoint.save()
+        return self.files
+
+
+def report(source, writer, final=False):
+    elapsed = max(time.time() - source.started_at, 0.001)
+    logger.info("{}downloaded {:.1f} MB ({:.1f} MB/s), written {:.1f} MB ({:.1f} MB/s) in {:.1f}s"
+                .format("Restore finished: " if final else "Restore progress: ",
+                        source.offset / 1048576.0, source.offset / 1048576.0 / elapsed,
+                        writer.written / 1048576.0, writer.written / 1048576.0 / elapsed,
+                        elapsed))
+
+
+def restore(target_dir, restore_version=None, checkpoint_dir=CHECKPOINT_DIR, url=RESTORE_URL):
+    import requests
+    target_dir = os.path.abspath(target_dir)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    session = requests.Session()
+    session.auth = ("postgres", os.getenv("PG_ROOT_PASSWORD"))
+    params = {"id": restore_version} if restore_version else {}
+
+    checkpoint = Checkpoint(checkpoint_dir, restore_version)
+    source = HttpStream(session, url, params, checkpoint)
+    writer = FileWriter()
+    stop = threading.Event()
+
+    def progress():
+        while not stop.wait(PROGRESS_INTERVAL):
+            report(source, writer)
+
+    threading.Thread(target=progress, name="progress", daemon=True).start()
+    extractor = Extractor(target_dir, writer, checkpoint, source)
+    stream = decompressed_stream(source, source.encoding)
+    try:
+        files = extractor.run(stream)
+        stream.close()
+    except Exception:
+        # members which are written are kept for the next attempt
+        try:
+            extractor.complete(wait=True)
+        finally:
+            checkpoint.save()
+        # tar reports truncated stream, download error is more useful
+        if getattr(stream, "error", None):
+            raise stream.error
+        raise
+    finally:
+        stop.set()
+        writer.shutdown()
+        source.close()
+    report(source, writer, final=True)
+    logger.info("Restored {} files to {}".format(files, target_dir))
+    checkpoint.remove()
+
+
+if __name__ == '__main__':
+    setup_logging()
+    parser = argparse.ArgumentParser(description='Restore basebackup from backup daemon')
+    parser.add_argument('--restore-version', dest='restore_version', default=None,
+                        help='id of backup, latest backup is restored if empty')
+    parser.add_argument('--target-dir', dest='target_dir', default='.',
+                        help='directory to extract backup to')
+    parser.add_argument('--checkpoint-dir', dest='checkpoint_dir', default=CHECKPOINT_DIR,
+                        help='directory for restore checkpoint')
+    args = parser.parse_args()
+
+    try:
+        restore(args.target_dir, args.restore_version or None, args.checkpoint_dir)
+    except Exception:
+        logger.exception("Restore failed, run it again to continue from checkpoint")
+        sys.exit(1)
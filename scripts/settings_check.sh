@@ -16,10 +16,7 @@
 
 source /setEnv.sh
 
-echo "Prepare file with current properties"
-python3 /prepare_settings_file.py /patroni/pg_conf_check.conf
-
 RESTART_PG=${RESTART_PG:-false}
 
-echo "Propagate to patroni file with current properties"
-python3 /validate_settings_file.py --conf-file=/patroni/pg_conf_check.conf --restart-pg=${RESTART_PG}
\ No newline at end of file
+echo "Prepare file with current properties and validate it"
+python3 /pgskipper.py validate --prepare --conf-file=/patroni/pg_conf_check.conf --restart-pg=${RESTART_PG}
\ No newline at end of file
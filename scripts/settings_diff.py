@@ -0,0 +1,256 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Normalisation of postgresql setting values, so '128MB' and '131072kB'
+# or 'on' and 'true' are treated as the same value.
+# Rules follow parse_int/parse_real/parse_bool from guc.c and are driven
+# by pg_settings.unit and pg_settings.vartype.
+
+import re
+
+MEMORY_UNITS = {
+    "B": 1,
+    "kB": 1024,
+    "MB": 1024 ** 2,
+    "GB": 1024 ** 3,
+    "TB": 1024 ** 4,
+}
+
+# microseconds
+TIME_UNITS = {
+    "us": 1,
+    "ms": 1000,
+    "s": 1000 ** 2,
+    "min": 60 * 1000 ** 2,
+    "h": 60 * 60 * 1000 ** 2,
+    "d": 24 * 60 * 60 * 1000 ** 2,
+}
+
+BOOL_VALUES = {
+    "on": True, "true": True, "yes": True, "1": True,
+    "off": False, "false": False, "no": False, "0": False,
+}
+
+LIST_SETTINGS = {
+    "shared_preload_libraries", "session_preload_libraries",
+    "local_preload_libraries", "search_path", "temp_tablespaces",
+    "listen_addresses", "unix_socket_directories", "log_destination",
+}
+
+value_pattern = re.compile(r"^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([A-Za-z]*)\s*$")
+hex_pattern = re.compile(r"^\s*([-+]?0[xX][0-9a-fA-F]+)\s*([A-Za-z]*)\s*$")
+octal_pattern = re.compile(r"^\s*([-+]?0[0-7]+)\s*([A-Za-z]*)\s*$")
+unit_pattern = re.compile(r"^(\d*)\s*([A-Za-z]+)$")
+
+
+def unquote(value):
+    """
+    Removes quotes of config file value. Unquoted value is returned as is,
+    current_setting() of string settings can end with significant spaces.
+    """
+    stripped = value.strip()
+    if len(stripped) >= 2 and stripped[0] == stripped[-1] == "'":
+        return stripped[1:-1].replace("''", "'")
+    return value
+
+
+def parse_unit(unit):
+    """
+    Parses pg_settings.unit like '8kB', 'kB' or 'ms'.
+    :return: (multiplier, unit table) or (None, None) for unitless settings
+    """
+    if not unit:
+        return None, None
+    match = unit_pattern.match(unit.strip())
+    if not match:
+        return None, None
+    count = int(match.group(1)) if match.group(1) else 1
+    name = match.group(2)
+    if name in MEMORY_UNITS:
+        return count * MEMORY_UNITS[name], MEMORY_UNITS
+    if name in TIME_UNITS:
+        return count * TIME_UNITS[name], TIME_UNITS
+    return None, None
+
+
+def parse_number(value, vartype=None):
+    """
+    Parses number with optional unit suffix. Hex is accepted for any numeric
+    setting, leading zero means octal only for integers, like strtol(value, 0)
+    in parse_int.
+    :return: (number, suffix) or (None, None) if value is not a number
+    """
+    match = hex_pattern.match(value)
+    if match:
+        return int(match.group(1), 16), match.group(2)
+    if vartype == "integer":
+        match = octal_pattern.match(value)
+        if match:
+            return int(match.group(1), 8), match.group(2)
+    match = value_pattern.match(value)
+    if not match:
+        return None, None
+    return float(match.group(1)), match.group(2)
+
+
+def normalize_number(value, unit=None, vartype=None):
+    """
+    Converts numeric value to bytes or microseconds if setting has unit.
+    Value without unit is interpreted in base unit of the setting, values
+    of integer settings are rounded to base unit.
+    :return: number or None if value cannot be parsed
+    """
+    number, suffix = parse_number(value, vartype)
+    if number is None:
+        return None
+    base, units = parse_unit(unit)
+    if suffix:
+        multiplier = None
+        if units is not None:
+            multiplier = units.get(suffix)
+        else:
+            # unit is unknown, try to guess it by suffix
+            for table in (MEMORY_UNITS, TIME_UNITS):
+                if suffix in table:
+                    multiplier = table[suffix]
+                    break
+        if multiplier is None:
+            return None
+        number *= multiplier
+        if vartype == "integer" and base is not None:
+            number = round(number / base) * base
+    else:
+        if vartype == "integer":
+            number = round(number)
+        if base is not None:
+            number *= base
+    # 1.1s and 1100ms differ in the last bits after multiplication
+    return float("{:.15g}".format(number))
+
+
+def normalize_bool(value):
+    """
+    Parses boolean the same way as postgresql does: any unique prefix of
+    true/false/yes/no, on/off and 1/0 are accepted.
+    :return: True, False or None if value is not boolean
+    """
+    value = value.strip().lower()
+    if value in BOOL_VALUES:
+        return BOOL_VALUES[value]
+    if value == "of":
+        return False
+    if value[:1] in ("t", "f", "y", "n"):
+        for name in ("true", "false", "yes", "no"):
+            if name.startswith(value):
+                return BOOL_VALUES[name]
+    return None
+
+
+def normalize_list(value):
+    return tuple(unquote(item).strip().strip('"')
+                 for item in unquote(value).split(",") if item.strip())
+
+
+def normalize_value(name, value, unit=None, vartype=None):
+    """
+    Returns comparable representation of the setting value.
+    :param name: setting name
+    :param value: raw value from config file or current_setting()
+    :param unit: pg_settings.unit
+    :param vartype: pg_settings.vartype
+    """
+    if value is None:
+        return None
+    value = unquote(str(value))
+    if name in LIST_SETTINGS:
+        return normalize_list(value)
+    if vartype == "bool":
+        result = normalize_bool(value)
+        return value if result is None else result
+    if vartype in ("integer", "real") or vartype is None:
+        result = normalize_number(value, unit, vartype)
+        if result is not None:
+            return result
+    if vartype == "enum":
+        # enums like huge_pages or synchronous_commit accept boolean aliases
+        result = normalize_bool(value)
+        if result is not None:
+            return "on" if result else "off"
+        return value.strip().lower()
+    if vartype is None:
+        result = normalize_bool(value)
+        if result is not None:
+            return result
+    return value
+
+
+def is_values_diff(name, value, db_value, unit=None, vartype=None):
+    return normalize_value(name, value, unit, vartype) != \
+        normalize_value(name, db_value, unit, vartype)
+
+
+def build_lookup(snapshot):
+    """
+    Precomputes normalised current values from get_settings_snapshot result.
+    :return: name -> (normalised value, unit, vartype)
+    :rtype: dict
+    """
+    lookup = {}
+    for name, setting in list(snapshot.items()):
+        unit, vartype = setting.get("unit"), setting.get("vartype")
+        lookup[name] = (normalize_value(name, setting.get("value"), unit, vartype),
+                        unit, vartype)
+    return lookup
+
+
+def diff_settings(properties, snapshot):
+    """
+    Finds properties which values differ from current settings.
+    :param properties: name -> desired value
+    :param snapshot: result of utils_db.get_settings_snapshot
+    :return: name -> desired value for changed properties
+    :rtype: dict
+    """
+    lookup = build_lookup(snapshot)
+    result = {}
+    for name, value in list(properties.items()):
+        if name not in lookup:
+            result[name] = value
+            continue
+        current, unit, vartype = lookup[name]
+        if normalize_value(name, value, unit, vartype) != current:
+            result[name] = value
+    return result
+
+
+def diff_dcs_settings(properties, dcs_parameters, snapshot=None):
+    """
+    Finds properties which values differ from parameters stored in DCS.
+    :param properties: name -> value as it would be sent to patroni
+    :param dcs_parameters: postgresql.parameters section of patroni /config
+    :param snapshot: result of utils_db.get_settings_snapshot, used for units and types
+    :return: name -> value for changed properties
+    :rtype: dict
+    """
+    snapshot = snapshot or {}
+    result = {}
+    for name, value in list(properties.items()):
+        if name not in dcs_parameters:
+            result[name] = value
+            continue
+        unit, vartype = snapshot.get(name, {}).get("unit"), snapshot.get(name, {}).get("vartype")
+        if normalize_value(name, value, unit, vartype) != \
+                normalize_value(name, dcs_parameters[name], unit, vartype):
+            result[name] = value
+    return result
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Long-running settings reconciler.
+# Patroni callbacks send events over local unix socket, reconciler runs
+# prepare -> propagate pipeline in-process and keeps db connection and
+# http session between runs. Burst of events results in single reconciliation.
+# Events of callback dispatcher carry its sequence number, their result is
+# recorded to dispatcher events log when reconciliation ends.
+#
+# python3 /settings_reconciler.py serve
+# python3 /settings_reconciler.py notify on_role_change master common
+
+import json
+import logging
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+import metrics
+from utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = os.getenv("SETTINGS_RECONCILER_SOCKET", "/patroni/settings_reconciler.sock")
+DEBOUNCE = float(os.getenv("SETTINGS_RECONCILER_DEBOUNCE", 2))
+PROPAGATE_CONF = "/patroni/pg_conf_propagate.conf"
+
+
+def notify(action, role, cluster, timeout=1, seq=None):
+    """
+    Sends event to running reconciler.
+    :param seq: sequence number of callback dispatcher event
+    :return: True if reconciler accepted event, False if it is not available
+    :rtype: bool
+    """
+    event = {"action": action, "role": role, "cluster": cluster}
+    if seq is not None:
+        event["seq"] = seq
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    try:
+        s.connect(SOCKET_PATH)
+        s.sendall((json.dumps(event) + "\n").encode("utf-8"))
+        return s.recv(64).strip() == b"accepted"
+    except (OSError, socket.timeout) as e:
+        logger.info("Settings reconciler is not available: {}".format(e))
+        return False
+    finally:
+        s.close()
+
+
+def record_result(events, status, **kwargs):
+    """
+    Records result of events which were passed by callback dispatcher.
+    """
+    from callback_dispatcher import record_event
+    for event in events:
+        if "seq" in event:
+            try:
+                record_event(event, status, **kwargs)
+            except (IOError, OSError):
+                logger.exception("Cannot record result of event {}".format(event))
+
+
+class SettingsReconciler(object):
+
+    def __init__(self, socket_path=SOCKET_PATH, debounce=DEBOUNCE):
+        self.socket_path = socket_path
+        self.debounce = debounce
+        self.events = queue.Queue()
+        self.client = None
+
+    def reconcile(self, event):
+        # heavy modules are imported once and reused by all reconciliations
+        from patroni_client import PatroniClient
+        from prepare_settings_file import prepare_settings
+        from propagate_settings_file import propagate_settings
+
+        if self.client is None:
+            self.client = PatroniClient()
+        start = time.time()
+        logger.info("Start reconciliation for event {}".format(event))
+        prepare_settings(PROPAGATE_CONF)
+        result = propagate_settings(PROPAGATE_CONF, self.client)
+        metrics.observe("reconciliation_seconds", time.time() - start, result=result is not False)
+        logger.info("Reconciliation finished with result {} in {:.3f}s"
+                    .format(result, time.time() - start))
+        return result
+
+    def collect_events(self):
+        """
+        Waits for event and collects all events which come within debounce window.
+        :return: received events, the last one is reconciled
+        :rtype: list
+        """
+        events = [self.events.get()]
+        deadline = time.time() + self.debounce
+        while True:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                events.append(self.events.get(timeout=timeout))
+            except queue.Empty:
+                break
+        if len(events) > 1:
+            logger.info("Coalesced {} events into one reconciliation".format(len(events)))
+        return events
+
+    def worker(self):
+        while True:
+            events = self.collect_events()
+            event = events[-1]
+            if event.get("role") != "master":
+                logger.info("Skip reconciliation for role {}".format(event.get("role")))
+                record_result(events, "skipped")
+                continue
+            start = time.time()
+            try:
+                result = self.reconcile(event)
+                status, kwargs = ("failed" if result is False else "done"), {}
+            except Exception as e:
+                logger.exception("Reconciliation failed")
+                status, kwargs = "failed", {"error": str(e)}
+            record_result(events, status, duration=round(time.time() - start, 3),
+                          coalesced=len(events), **kwargs)
+
+    def handle(self, conn):
+        conn.settimeout(5)
+        with conn:
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = conn.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+            try:
+                event = json.loads(data.decode("utf-8"))
+            except ValueError:
+                logger.error("Cannot parse event: {}".format(data))
+                conn.sendall(b"rejected\n")
+                return
+            logger.info("Received event {}".format(event))
+            self.events.put(event)
+            conn.sendall(b"accepted\n")
+
+    def serve(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        server.listen(16)
+        threading.Thread(target=self.worker, name="reconciler", daemon=True).start()
+        logger.info("Settings reconciler is listening on {}".format(self.socket_path))
+        metrics.start_flusher()
+        while True:
+            conn, _ = server.accept()
+            try:
+                self.handle(conn)
+            except OSError:
+                logger.exception("Cannot handle event")
+
+
+def main():
+    setup_logging()
+    if len(sys.argv) == 2 and sys.argv[1] == "serve":
+        SettingsReconciler().serve()
+    elif len(sys.argv) == 5 and sys.argv[1] == "notify":
+        if not notify(sys.argv[2], sys.argv[3], sys.argv[4]):
+            sys.exit(1)
+    else:
+        sys.exit("Usage: {0} serve | notify action role name".format(sys.argv[0]))
+
+
+if __name__ == '__main__':
+    main()
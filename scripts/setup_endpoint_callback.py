@@ -13,21 +13,90 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import subprocess
 import sys
 import logging
 import os
+import time
+from utils import setup_logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s][%(levelname)-5s][category=%(name)s] %(message)s',
-    datefmt='%Y-%m-%dT%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 RUN_PROPAGATE_SCRIPT = os.getenv("RUN_PROPAGATE_SCRIPT", "True").lower()
+DRAIN_BATCH_SIZE = int(os.getenv("DEMOTION_DRAIN_BATCH_SIZE", 100))
+DRAIN_GRACE_PERIOD = float(os.getenv("DEMOTION_DRAIN_GRACE_PERIOD", 5))
+DRAIN_TIMEOUT = float(os.getenv("DEMOTION_DRAIN_TIMEOUT", 30))
+
+# idle sessions are terminated first, active queries last
+ACTIVE_CONNECTIONS_QUERY = """
+    select pid from pg_stat_activity
+    where datname <> 'postgres' and pid <> pg_backend_pid()
+    order by case state when 'idle' then 0
+                        when 'idle in transaction' then 1
+                        when 'idle in transaction (aborted)' then 2
+                        else 3 end, backend_start
+"""
+
+
+def terminate_batch(cur, pids, grace_period):
+    """
+    Terminates backends and waits until they exit.
+    :return: pids which are still alive after grace period
+    """
+    cur.execute("select pg_terminate_backend(pid) from unnest(%(pids)s::int[]) as pid",
+                {"pids": pids})
+    deadline = time.time() + grace_period
+    while True:
+        cur.execute("select pid from pg_stat_activity where pid = any(%(pids)s::int[])",
+                    {"pids": pids})
+        alive = [row[0] for row in cur.fetchall()]
+        if not alive or time.time() >= deadline:
+            return alive
+        time.sleep(0.1)
+
+
+def drain_connections(batch_size=DRAIN_BATCH_SIZE, grace_period=DRAIN_GRACE_PERIOD,
+                      timeout=DRAIN_TIMEOUT):
+    """
+    Terminates application connections in batches ordered by state.
+    Node is read-only standby at this moment, so new connections cannot be
+    forbidden in database. Instead connections are selected again after each
+    round, clients which reconnected during drain are terminated too.
+    """
+    import psycopg2
+    start = time.time()
+    terminated = 0
+    survivors = None
+    conn = None
+    try:
+        conn = psycopg2.connect(host='localhost', user='postgres')
+        # pg_stat_activity is cached inside transaction
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            while time.time() - start < timeout:
+                cur.execute(ACTIVE_CONNECTIONS_QUERY)
+                pids = [row[0] for row in cur.fetchall()]
+                if not pids:
+                    break
+                for i in range(0, len(pids), batch_size):
+                    batch = pids[i:i + batch_size]
+                    alive = terminate_batch(cur, batch, grace_period)
+                    terminated += len(batch) - len(alive)
+                    if alive:
+                        logger.warning("{} backends are still alive after grace period"
+                                       .format(len(alive)))
+            # survivors of all batches and clients which connected after the last round
+            cur.execute(ACTIVE_CONNECTIONS_QUERY)
+            survivors = len(cur.fetchall())
+    except psycopg2.Error:
+        logger.exception("Exception happened during termination of connections")
+    finally:
+        if conn is not None:
+            conn.close()
+    logger.info("Connections are drained in {:.3f}s, terminated: {}, still alive: {}"
+                .format(time.time() - start, terminated, "unknown" if survivors is None else survivors))
 
 
 def main():
+    setup_logging()
     logger.info("Start callback with parameters {}".format(sys.argv))
     if len(sys.argv) == 4:
         action, role, cluster = sys.argv[1], sys.argv[2], sys.argv[3]
@@ -37,33 +106,17 @@ def main():
         if role == "master":
             logger.info("We were promoted to master. "
                         "Start configuration checks.")
-            logger.info("Triggering propagate_settings script.")
-            subprocess.check_call("/propagate_settings.sh")
+            if action == "on_role_change":
+                from prewarm import start_background_load
+                start_background_load()
         elif role == "replica":
             logger.info("Role is set to replica, "
                         "will terminate active applications connections")
-            connection_properties = {
-                'host': 'localhost',
-                'user': 'postgres',
-            }
-            import psycopg2
-            with psycopg2.connect(**connection_properties) as conn:
-                with conn.cursor() as cur:
-                    def execute_silently(query_):
-                        logger.debug(
-                            "Executing next query: {}".format(query_))
-                        try:
-                            cur.execute(query_)
-                        except psycopg2.Error:
-                            logger.exception("Exception happened during "
-                                             "execution of the query")
-                    # TODO handle pg-pool case
-                    execute_silently("""
-                        select pg_terminate_backend(pid) from 
-                        pg_stat_activity where datname <> 'postgres' and
-                        pid <> pg_backend_pid()
-                    """)
-                    logger.info("Connections are terminated successfully")
+        else:
+            return
+        # handlers are started in background and duplicate events are collapsed
+        from callback_dispatcher import dispatch
+        dispatch(action, role, cluster)
     else:
         sys.exit("Usage: {0} action role name".format(sys.argv[0]))
 
@@ -26,13 +26,6 @@ chmod 700 ${ROOT_DIR}
 chown $(id -u):$(id -u) ${ROOT_DIR}
 
 
-function set_property() {
-    PROP_NAME=$1
-    PROP_VALUE=$2
-    FILE=$3
-    sed -i "/^#*${PROP_NAME}[ ]*=/{h;s/.*/${PROP_NAME} = ${PROP_VALUE}/};\${x;/^\$/{s//$PROP_NAME = '$PROP_VALUE'/;H};x}" ${FILE}
-}
-
 cur_user=$(id -u)
 if [ "$cur_user" != "26" ]
 then
@@ -124,57 +117,54 @@ if [[ -n "${FROM_SCRATCH}" ]]; then
   rm -rf ${ROOT_DIR}/*
 fi
 
-# prepare config for patroni
+if [[ -d /var/lib/pgsql/data/data/${ROOT_DIR_NAME} ]] ; then
+    echo "Find an uncommon database location"
+    echo "Moving it to ROOT_DIR, might take a while"
+    mv /var/lib/pgsql/data/data/${ROOT_DIR_NAME} /var/lib/pgsql/data/
+    [[ $? != 0 ]] && echo "Something goes wrong, please check is moving correctly" || echo "Moving complete"
+fi
+
+# prepare config for patroni, apply properties to bootstrap section
+# and to postgresql.base.conf from previous start
 PG_BIN_DIR=${PG_BIN_DIR} \
 PG_ROOT_PASSWORD=${PG_ROOT_PASSWORD} \
 PG_REPL_PASSWORD=${PG_REPL_PASSWORD} \
 LISTEN_ADDR=`hostname -i` \
 PG_CLUST_NAME=${PG_CLUST_NAME} \
 POD_NAMESPACE=${POD_NAMESPACE} \
-envsubst < /patroni/pg_template.yaml > /patroni/pg_node.yml
-
-echo "Prepare file with initial properties"
-python3 /prepare_settings_file.py /patroni/pg_conf_initial.conf
+python3 /boot.py --root-dir ${ROOT_DIR} || exit 1
 
 echo "Initial properties: "
 cat /patroni/pg_conf_initial.conf
 
-echo "Apply properties to bootstrap section"
-python3 /populate_patroni_config.py /patroni/pg_node.yml /patroni/pg_conf_initial.conf
-
 echo "Config result"
 cat /patroni/pg_node.yml | grep -v password
 
-echo "Check if we have datafiles from previous start and apply required settings"
+if [[ -f /certs/server.crt ]] ; then
+    cp /certs/server.crt /patroni/server.crt && chmod 600 /patroni/server.crt
+    cp /certs/server.key /patroni/server.key && chmod 600 /patroni/server.key
+    ls -ll /
+fi
+
+# Start settings reconciler which handles patroni callbacks in single process.
+python3 /settings_reconciler.py serve &
 
-if [[ -d /var/lib/pgsql/data/data/${ROOT_DIR_NAME} ]] ; then
-    echo "Find an uncommon database location"
-    echo "Moving it to ROOT_DIR, might take a while"
-    mv /var/lib/pgsql/data/data/${ROOT_DIR_NAME} /var/lib/pgsql/data/
-    [[ $? != 0 ]] && echo "Something goes wrong, please check is moving correctly" || echo "Moving complete"
+# Start WAL archiver which is used by /opt/scripts/archive_wal.sh.
+python3 /wal_archiver.py serve &
+
+# Dump list of hot blocks while node is replica, it is loaded back on promotion.
+if [[ "${PREWARM_ENABLED,,}" == "true" ]]; then
+    python3 /prewarm.py dump-loop &
 fi
 
-required_array=("shared_buffers" "effective_cache_size" "work_mem" "maintenance_work_mem")
-if [[ -f ${ROOT_DIR}/postgresql.base.conf ]] ; then
-    echo "Set properties"
-    cat /patroni/pg_conf_initial.conf | while read line
-    do
-      if ! [[ ${line} =~ \s*#.* ]]; then
-        IFS='=' read -r pg_setting_name value <<< "${line}"
-        for e in "${@:required_array}"; do
-            if [[ "$e" == "${pg_setting_name}" ]] ; then
-                echo "Setting from config file: ${pg_setting_name} = ${value}"
-                set_property ${pg_setting_name} ${value} ${ROOT_DIR}/postgresql.base.conf;
-            fi
-        done
-      fi
-    done
+# Keep history of workload statistics, samples are taken only on primary.
+if [[ "${STATS_SAMPLER_ENABLED,,}" == "true" ]]; then
+    python3 /stats_sampler.py serve &
 fi
 
-if [[ -f /certs/server.crt ]] ; then
-    cp /certs/server.crt /patroni/server.crt && chmod 600 /patroni/server.crt
-    cp /certs/server.key /patroni/server.key && chmod 600 /patroni/server.key
-    ls -ll /
+# Serve metrics collected by scripts, textfile is written to ${METRICS_DIR:-/patroni/metrics} anyway.
+if [[ -n "${METRICS_PORT}" ]]; then
+    python3 /metrics.py serve &
 fi
 
 # Disable coredumps to keep PV clean and free.
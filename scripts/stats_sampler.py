@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Workload statistics history.
+# Every STATS_SAMPLE_INTERVAL seconds deltas of pg_stat_statements and
+# pg_stat_database and counts of wait events of active sessions are appended
+# to gzipped json lines segments in STATS_DIR. Segment is switched every
+# STATS_SEGMENT_SECONDS, oldest segments are removed when total size exceeds
+# STATS_MAX_SIZE_MB. Samples are taken only on primary.
+#
+# python3 /stats_sampler.py serve
+# python3 /stats_sampler.py top --by time --since 1h --limit 10
+# python3 /stats_sampler.py top --by io --since 2025-01-01T10:00 --until 2025-01-01T11:00
+# python3 /stats_sampler.py waits --since 30m
+
+import glob
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+
+import metrics
+from utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+STATS_DIR = os.getenv("STATS_DIR", "/patroni/stats")
+SAMPLE_INTERVAL = int(os.getenv("STATS_SAMPLE_INTERVAL", 60))
+SEGMENT_SECONDS = int(os.getenv("STATS_SEGMENT_SECONDS", 3600))
+MAX_SIZE_MB = int(os.getenv("STATS_MAX_SIZE_MB", 64))
+# statements which are stored per sample: union of top by every ORDER_BY key
+TOP_STATEMENTS = int(os.getenv("STATS_TOP_STATEMENTS", 100))
+QUERY_TEXT_LENGTH = 200
+
+STATEMENTS_QUERY = """
+    select queryid, dbid, userid, calls, total_exec_time, rows,
+           shared_blks_hit, shared_blks_read, shared_blks_written, temp_blks_written,
+           left(query, {})
+    from pg_stat_statements where queryid is not null
+""".format(QUERY_TEXT_LENGTH)
+STATEMENT_COUNTERS = ("calls", "time", "rows", "blks_hit", "blks_read", "blks_written", "temp_blks_written")
+
+DATABASE_QUERY = """
+    select datname, xact_commit, xact_rollback, blks_read, blks_hit, tup_returned,
+           tup_fetched, tup_inserted, tup_updated, tup_deleted, temp_bytes, deadlocks
+    from pg_stat_database where datname is not null
+"""
+DATABASE_COUNTERS = ("xact_commit", "xact_rollback", "blks_read", "blks_hit", "tup_returned",
+                     "tup_fetched", "tup_inserted", "tup_updated", "tup_deleted", "temp_bytes", "deadlocks")
+
+WAITS_QUERY = """
+    select coalesce(wait_event_type || ':' || wait_event, 'CPU'), count(*)
+    from pg_stat_activity
+    where state = 'active' and backend_type = 'client backend' and pid <> pg_backend_pid()
+    group by 1
+"""
+
+ORDER_BY = {
+    "time": lambda s: s["time"],
+    "calls": lambda s: s["calls"],
+    "io": lambda s: s["blks_read"] + s["blks_written"] + s["temp_blks_written"],
+}
+
+
+def delta(current, previous, counters):
+    """
+    :return: differences of counters, current values if counters were reset
+    """
+    if previous is None or any(current[c] < previous[c] for c in counters):
+        return dict((c, current[c]) for c in counters)
+    return dict((c, current[c] - previous[c]) for c in counters)
+
+
+def select_top(statements, limit):
+    """
+    Selects union of top statements by every ORDER_BY key, so history can be
+    ranked by any of them.
+    :return: selected statements sorted by time
+    :rtype: list
+    """
+    selected = {}
+    for key in sorted(ORDER_BY):
+        for statement in sorted(statements, key=ORDER_BY[key], reverse=True)[:limit]:
+            selected[statement["id"]] = statement
+    return sorted(selected.values(), key=ORDER_BY["time"], reverse=True)
+
+
+class Sampler(object):
+
+    def __init__(self, stats_dir=STATS_DIR):
+        self.stats_dir = stats_dir
+        self.statements = None
+        self.databases = None
+
+    def read_statements(self, cursor):
+        cursor.execute(STATEMENTS_QUERY)
+        result = {}
+        for row in cursor.fetchall():
+            result["{}:{}:{}".format(*row[:3])] = dict(zip(STATEMENT_COUNTERS, row[3:10]), query=row[10])
+        return result
+
+    def read_databases(self, cursor):
+        cursor.execute(DATABASE_QUERY)
+        return dict((row[0], dict(zip(DATABASE_COUNTERS, row[1:]))) for row in cursor.fetchall())
+
+    def sample(self, cursor):
+        """
+        Reads statistics and returns deltas since previous sample.
+        :return: record or None if node is replica or it is the first sample
+        :rtype: dict
+        """
+        cursor.execute("select pg_is_in_recovery()")
+        if cursor.fetchone()[0]:
+            # counters of replica are not comparable with primary after promotion
+            self.statements = self.databases = None
+            return None
+        try:
+            statements = self.read_statements(cursor)
+        except Exception as e:
+            logger.debug("Cannot read pg_stat_statements: {}".format(e))
+            statements = {}
+        databases = self.read_databases(cursor)
+        cursor.execute(WAITS_QUERY)
+        waits = dict(cursor.fetchall())
+        previous_statements, previous_databases = self.statements, self.databases
+        self.statements, self.databases = statements, databases
+        if previous_databases is None:
+            return None
+
+        statement_deltas = []
+        for key, current in list(statements.items()):
+            d = delta(current, previous_statements.get(key), STATEMENT_COUNTERS)
+            if d["calls"]:
+                d["time"] = round(d["time"], 3)
+                d.update(id=key, query=current["query"])
+                statement_deltas.append(d)
+        database_deltas = {}
+        for name, current in list(databases.items()):
+            d = delta(current, previous_databases.get(name), DATABASE_COUNTERS)
+            if any(d.values()):
+                database_deltas[name] = d
+        return {"ts": int(time.time()), "statements": select_top(statement_deltas, TOP_STATEMENTS),
+                "databases": database_deltas, "waits": waits}
+
+    def segment_file(self, ts):
+        return os.path.join(self.stats_dir, "stats-{}.jsonl.gz".format(ts - ts % SEGMENT_SECONDS))
+
+    def write(self, record):
+        if not os.path.isdir(self.stats_dir):
+            os.makedirs(self.stats_dir)
+        # appended gzip members are read back as single stream
+        with gzip.open(self.segment_file(record["ts"]), "at") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.rotate()
+
+    def rotate(self, max_size=MAX_SIZE_MB * 1024 * 1024):
+        segments = list_segments(self.stats_dir)
+        total = sum(os.path.getsize(path) for _, path in segments)
+        # current segment is never removed
+        for _, path in segments[:-1]:
+            if total <= max_size:
+                break
+            total -= os.path.getsize(path)
+            os.remove(path)
+            logger.info("Segment {} is removed".format(path))
+
+    def run_once(self):
+        from utils_db import get_connection
+        start = time.time()
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                record = self.sample(cursor)
+        except Exception:
+            # connection is opened again on next sample
+            conn.close()
+            raise
+        if record is not None:
+            self.write(record)
+            metrics.inc("stats_samples_total")
+            metrics.observe("stats_sample_seconds", time.time() - start)
+
+    def serve(self, interval=SAMPLE_INTERVAL):
+        logger.info("Start statistics sampler, interval {}s, directory {}".format(interval, self.stats_dir))
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                metrics.inc("stats_sample_failures_total")
+                logger.warning("Cannot take statistics sample: {}".format(e))
+            metrics.flush()
+            time.sleep(interval - time.time() % interval)
+
+
+def list_segments(stats_dir=STATS_DIR):
+    """
+    :return: sorted list of (segment start, path)
+    """
+    result = []
+    for path in glob.glob(os.path.join(stats_dir, "stats-*.jsonl.gz")):
+        try:
+            result.append((int(os.path.basename(path).split("-")[1].split(".")[0]), path))
+        except ValueError:
+            continue
+    return sorted(result)
+
+
+def read_records(since, until, stats_dir=STATS_DIR):
+    """
+    Yields records with since <= ts <= until.
+    """
+    for start, path in list_segments(stats_dir):
+        if start + SEGMENT_SECONDS <= since or start > until:
+            continue
+        try:
+            with gzip.open(path, "rt") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if since <= record["ts"] <= until:
+                        yield record
+        except (IOError, OSError, EOFError) as e:
+            # segment which is being written can end with incomplete member
+            logger.debug("Cannot read segment {}: {}".format(path, e))
+
+
+def top_statements(records, by="time", limit=10):
+    """
+    Aggregates statement deltas over records.
+    :rtype: list
+    """
+    totals = {}
+    for record in records:
+        for statement in record["statements"]:
+            total = totals.setdefault(statement["id"], dict((c, 0) for c in STATEMENT_COUNTERS))
+            for c in STATEMENT_COUNTERS:
+                total[c] += statement[c]
+            total["query"] = statement["query"]
+    return sorted(totals.values(), key=ORDER_BY[by], reverse=True)[:limit]
+
+
+def top_waits(records, limit=10):
+    """
+    :return: list of (wait event, average number of sessions)
+    """
+    totals = {}
+    count = 0
+    for record in records:
+        count += 1
+        for event, sessions in list(record["waits"].items()):
+            totals[event] = totals.get(event, 0) + sessions
+    return sorted(((event, round(float(sessions) / count, 2)) for event, sessions in totals.items()),
+                  key=lambda w: w[1], reverse=True)[:limit]
+
+
+def parse_time(value, now=None):
+    """
+    Parses relative time like 30m, 2h, 1d or ISO timestamp in local time.
+    :rtype: int
+    """
+    now = now or time.time()
+    if value == "now":
+        return int(now)
+    multipliers = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if value[-1:] in multipliers and value[:-1].isdigit():
+        return int(now - int(value[:-1]) * multipliers[value[-1]])
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d"):
+        try:
+            return int(time.mktime(time.strptime(value, fmt)))
+        except ValueError:
+            continue
+    raise ValueError("Cannot parse time {}".format(value))
+
+
+def main():
+    import argparse
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Workload statistics history")
+    parser.add_argument("command", choices=("serve", "top", "waits"))
+    parser.add_argument("--by", choices=sorted(ORDER_BY), default="time")
+    parser.add_argument("--since", default="1h", help="30m, 2h, 1d or timestamp")
+    parser.add_argument("--until", default="now")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    if args.command == "serve":
+        Sampler().serve()
+        return
+    records = read_records(parse_time(args.since), parse_time(args.until))
+    if args.command == "waits":
+        for event, sessions in top_waits(records, args.limit):
+            print("{:>8} {}".format(sessions, event))
+        return
+    print("{:>12} {:>10} {:>10} {:>10}  {}".format("time,ms", "calls", "rows", "io blks", "query"))
+    for s in top_statements(records, args.by, args.limit):
+        print("{:>12.1f} {:>10} {:>10} {:>10}  {}".format(
+            s["time"], s["calls"], s["rows"], s["blks_read"] + s["blks_written"] + s["temp_blks_written"],
+            " ".join(s["query"].split())[:80]))
+
+
+if __name__ == '__main__':
+    main()
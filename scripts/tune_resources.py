@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Calculates memory, parallelism and WAL settings from container limits.
+# PG_TUNING_PROFILE=legacy (default) keeps formulas which were used in setEnv.sh,
+# oltp, olap and mixed profiles calculate full parameter set.
+# Result is merged by prepare_settings_file before PG_CONF_* variables.
+#
+# python3 /tune_resources.py
+
+import logging
+import os
+import re
+import sys
+
+from utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT_MEM = "256Mi"
+# see https://kubernetes.io/docs/concepts/configuration/manage-compute-resources-container/#meaning-of-memory
+MEMORY_MULTIPLIERS_KIB = {"ki": 1, "mi": 1024, "gi": 1048576, "ti": 1073741824,
+                          "k": 1, "m": 1000, "g": 1000000, "t": 1000000000}
+CGROUP_UNLIMITED = 1 << 60
+
+CGROUP_V2_MEMORY = "/sys/fs/cgroup/memory.max"
+CGROUP_V2_CPU = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_MEMORY = "/sys/fs/cgroup/memory/memory.limit_in_bytes"
+CGROUP_V1_CPU_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CPU_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+MEMINFO = "/proc/meminfo"
+
+# estimated memory of single backend and of prepared transaction slot
+CONNECTION_OVERHEAD_KIB = 1024
+PREPARED_TRANSACTION_OVERHEAD_KIB = 32
+
+PROFILES = {
+    # work_mem_divisor - how many sorts/hashes each connection may run at once
+    "oltp": {"shared_buffers": 0.25, "effective_cache_size": 0.75, "work_mem_divisor": 3,
+             "maintenance_work_mem": 0.0625, "max_gather": 2,
+             "min_wal_size": 1048576, "max_wal_size": 4194304},
+    "mixed": {"shared_buffers": 0.25, "effective_cache_size": 0.75, "work_mem_divisor": 2,
+              "maintenance_work_mem": 0.0625, "max_gather": 4,
+              "min_wal_size": 1048576, "max_wal_size": 8388608},
+    "olap": {"shared_buffers": 0.25, "effective_cache_size": 0.75, "work_mem_divisor": 1,
+             "maintenance_work_mem": 0.125, "max_gather": 8,
+             "min_wal_size": 4194304, "max_wal_size": 16777216},
+}
+MAX_MAINTENANCE_WORK_MEM_KIB = 2097152
+
+limit_pattern = re.compile(r"^([0-9]+)([A-Za-z]*)$")
+
+
+def parse_memory_limit(value):
+    """
+    Converts kubernetes memory quantity to KiB the same way as setEnv.sh did.
+    :rtype: int
+    """
+    match = limit_pattern.match(value.strip())
+    if not match:
+        raise ValueError("Cannot parse memory limit value {}".format(value))
+    number, suffix = int(match.group(1)), match.group(2).lower()
+    if not suffix:
+        return number // 1024
+    if suffix not in MEMORY_MULTIPLIERS_KIB:
+        raise ValueError("Unknown memory limit suffix in {}".format(value))
+    return number * MEMORY_MULTIPLIERS_KIB[suffix]
+
+
+def parse_cpu_limit(value):
+    """
+    Converts kubernetes cpu quantity like 500m or 2 to number of cpus.
+    :rtype: float
+    """
+    value = value.strip()
+    if value.endswith("m"):
+        return int(value[:-1]) / 1000.0
+    return float(value)
+
+
+def read_file(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def get_cgroup_memory_limit_kib():
+    value = read_file(CGROUP_V2_MEMORY)
+    if value is None:
+        value = read_file(CGROUP_V1_MEMORY)
+    if not value or value == "max" or int(value) >= CGROUP_UNLIMITED:
+        return None
+    return int(value) // 1024
+
+
+def get_cgroup_cpu_limit():
+    value = read_file(CGROUP_V2_CPU)
+    if value:
+        quota, period = (value.split() + ["100000"])[:2]
+        if quota == "max":
+            return None
+        return int(quota) / float(period)
+    quota, period = read_file(CGROUP_V1_CPU_QUOTA), read_file(CGROUP_V1_CPU_PERIOD)
+    if quota and period and int(quota) > 0:
+        return int(quota) / float(period)
+    return None
+
+
+def get_huge_page_size_kib():
+    """
+    :return: size of huge page if huge pages are reserved on the host, otherwise None
+    """
+    meminfo = read_file(MEMINFO) or ""
+    total, size = 0, None
+    for line in meminfo.splitlines():
+        if line.startswith("HugePages_Total:"):
+            total = int(line.split()[1])
+        elif line.startswith("Hugepagesize:"):
+            size = int(line.split()[1])
+    return size if total > 0 else None
+
+
+def get_resources(use_cgroup_memory=True):
+    """
+    Reads memory and cpu limits from env, cgroup v2 or cgroup v1.
+    :param use_cgroup_memory: if False, DEFAULT_LIMIT_MEM is used when PG_RESOURCES_LIMIT_MEM is not set
+    :return: dict with memory_kib, cpus and huge_page_kib
+    """
+    if os.getenv("PG_RESOURCES_LIMIT_MEM"):
+        memory_kib = parse_memory_limit(os.getenv("PG_RESOURCES_LIMIT_MEM"))
+    elif use_cgroup_memory:
+        memory_kib = get_cgroup_memory_limit_kib() or parse_memory_limit(DEFAULT_LIMIT_MEM)
+    else:
+        memory_kib = parse_memory_limit(DEFAULT_LIMIT_MEM)
+    if os.getenv("PG_RESOURCES_LIMIT_CPU"):
+        cpus = parse_cpu_limit(os.getenv("PG_RESOURCES_LIMIT_CPU"))
+    else:
+        cpus = get_cgroup_cpu_limit() or float(os.cpu_count() or 1)
+    return {"memory_kib": memory_kib, "cpus": cpus, "huge_page_kib": get_huge_page_size_kib()}
+
+
+def get_patroni_overhead_kib(memory_kib):
+    return 102400 if memory_kib > 512000 else 51200
+
+
+def kib(value):
+    return "{}kB".format(int(value))
+
+
+def legacy_parameters(memory_kib, max_connections):
+    """
+    Formulas which were used in setEnv.sh.
+    """
+    available = memory_kib - get_patroni_overhead_kib(memory_kib)
+    shared_buffers = available // 4
+    return {
+        "shared_buffers": kib(shared_buffers),
+        "effective_cache_size": kib(available - shared_buffers),
+        "work_mem": kib(max(shared_buffers // max_connections, 64)),
+        "maintenance_work_mem": kib(shared_buffers // 4),
+    }
+
+
+def profile_parameters(profile, memory_kib, cpus, max_connections,
+                       max_prepared_transactions=0, huge_page_kib=None):
+    """
+    Calculates parameters for oltp, olap or mixed workload.
+    :rtype: dict
+    """
+    settings = PROFILES[profile]
+    available = memory_kib - get_patroni_overhead_kib(memory_kib)
+    overhead = max_connections * CONNECTION_OVERHEAD_KIB + \
+        max_prepared_transactions * PREPARED_TRANSACTION_OVERHEAD_KIB
+    available -= min(overhead, available // 4)
+
+    shared_buffers = int(available * settings["shared_buffers"])
+    if huge_page_kib:
+        shared_buffers = max(shared_buffers - shared_buffers % huge_page_kib, huge_page_kib)
+
+    cpu_count = max(int(cpus), 1)
+    per_gather = min(settings["max_gather"], cpu_count // 2)
+    work_mem = (available - shared_buffers) // \
+        (max_connections * settings["work_mem_divisor"]) // max(per_gather, 1)
+
+    result = {
+        "shared_buffers": kib(shared_buffers),
+        "effective_cache_size": kib(available * settings["effective_cache_size"]),
+        "work_mem": kib(max(work_mem, 64)),
+        "maintenance_work_mem": kib(max(min(available * settings["maintenance_work_mem"],
+                                            MAX_MAINTENANCE_WORK_MEM_KIB), 1024)),
+        "max_worker_processes": str(max(8, cpu_count)),
+        "max_parallel_workers": str(cpu_count),
+        "max_parallel_workers_per_gather": str(per_gather),
+        "max_parallel_maintenance_workers": str(min(4, max(cpu_count // 2, 1))),
+        "min_wal_size": kib(settings["min_wal_size"]),
+        "max_wal_size": kib(settings["max_wal_size"]),
+        "checkpoint_completion_target": "0.9",
+    }
+    if huge_page_kib:
+        result["huge_pages"] = "try"
+    return result
+
+
+def get_tuned_parameters(profile=None, resources=None):
+    """
+    Calculates parameters for current container.
+    :param profile: legacy, oltp, olap or mixed. PG_TUNING_PROFILE is used by default
+    :param resources: result of get_resources, read from container by default
+    :rtype: dict
+    """
+    profile = (profile or os.getenv("PG_TUNING_PROFILE", "legacy")).lower()
+    # legacy profile keeps 256Mi default of setEnv.sh, cgroup limit is used only by new profiles
+    resources = resources or get_resources(use_cgroup_memory=profile != "legacy")
+    max_connections = int(os.getenv("PG_CONF_MAX_CONNECTIONS", os.getenv("PG_MAX_CONNECTIONS", 200)))
+    max_prepared_transactions = int(os.getenv("PG_CONF_MAX_PREPARED_TRANSACTIONS", 200))
+    logger.debug("Tuning for profile %s and resources %s", profile, resources)
+    if profile == "legacy":
+        return legacy_parameters(resources["memory_kib"], max_connections)
+    if profile not in PROFILES:
+        raise ValueError("Unknown tuning profile {}".format(profile))
+    return profile_parameters(profile, resources["memory_kib"], resources["cpus"],
+                              max_connections, max_prepared_transactions,
+                              resources["huge_page_kib"])
+
+
+def main():
+    setup_logging()
+    if len(sys.argv) != 1:
+        sys.exit("Usage: {0}".format(sys.argv[0]))
+    for key, value in list(get_tuned_parameters().items()):
+        print("PG_CONF_{}={}".format(key.upper(), value))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,65 +13,173 @@
 # limitations under the License.
 
 import os
-import socket, struct
 import re
-import subprocess
 
 import logging
 
 import time
 
 comment_pattern = re.compile("\s*#.*")
+int_pattern = re.compile(r"^[-+]?(0|[1-9][0-9]*)$")
+octal_pattern = re.compile(r"^[-+]?0[0-7]+$")
+ipv4_pattern = re.compile(r"^(?:[0-9]{1,3}\.){3}[0-9]{1,3}$")
+float_pattern = re.compile(r"^[-+]?([0-9]+\.[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?$")
 
 
 def read_property_file(filename):
     """
     Reads data from filename and parse it to dictionary.
+    include, include_if_exists and include_dir directives are supported,
+    result of parse is cached, see property_file.
     :param filename:
     :return:
     :rtype: dict
     """
-    result = {}
-    with open(filename) as f:
-        for line in f:
-            if "=" in line and not comment_pattern.match(line):
-                param_name = (line[0:line.find("=")]).strip()
-                param_value = (line[line.find("=")+1:])
-                if param_name != 'log_line_prefix':
-                    param_value = param_value.strip()
-                else:
-                    if param_value[:1] == '%':
-                        param_value = "\{}".format(param_value)
-                    param_value = param_value.lstrip()
-                    param_value = param_value.rstrip('\n')
-                result[param_name] = param_value
+    from property_file import load
+    return load(filename).properties()
+
+
+def to_typed_value(value):
+    """
+    Converts raw value from property file to int, float or str
+    the same way as yaml loader does for plain scalars.
+    :param value: raw value after "="
+    """
+    value = value.strip()
+    if value[:1] in ("'", '"'):
+        quote = value[0]
+        end = value.rfind(quote)
+        if end > 0:
+            value = value[1:end]
+            if quote == "'":
+                return value.replace("''", "'")
+            return value.replace('\\"', '"').replace("\\\\", "\\")
+    comment = value.find(" #")
+    if comment >= 0:
+        value = value[:comment].rstrip()
+    if int_pattern.match(value):
+        return int(value)
+    if octal_pattern.match(value):
+        return int(value, 8)
+    if float_pattern.match(value):
+        return float(value)
+    return value
+
+
+def get_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def write_file_atomically(filename, data):
+    """
+    Writes data to unique temporary file in the same directory and renames
+    it to filename, so readers never see partially written file and
+    concurrent writers do not share temporary file.
+    Mode of existing file is kept, new file is created as open() would do.
+    """
+    import stat
+    import tempfile
+    try:
+        mode = stat.S_IMODE(os.stat(filename).st_mode)
+    except OSError:
+        mode = 0o666 & ~get_umask()
+    fd, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)),
+                                        prefix=".{}.".format(os.path.basename(filename)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode='w') as f:
+            f.write(data)
+        os.chmod(tmp_filename, mode)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
 
-    return result
 
 def is_ipv4(host):
-    p = re.compile("^(?:[0-9]{1,3}\.){3}[0-9]{1,3}$")
-    return p.match(host)
+    return ipv4_pattern.match(host)
+
+
+def get_interface_ip():
+    """
+    Returns IPv4 address of eth0 or of first non loopback interface.
+    """
+    import fcntl
+    import socket
+    import struct
+    names = [name for _, name in socket.if_nameindex() if name != "lo"]
+    if "eth0" in names:
+        names.remove("eth0")
+        names.insert(0, "eth0")
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for name in names:
+            try:
+                return socket.inet_ntoa(fcntl.ioctl(s.fileno(), 0x8915,
+                                                    struct.pack('256s', name.encode()[:15]))[20:24])
+            except OSError:
+                continue
+    finally:
+        s.close()
+    return socket.gethostbyname(socket.gethostname())
+
+
+_host_ip = None
+
 
 def get_host_ip():
-    IP = os.getenv("POD_IP")
-    if not IP:
-        import fcntl
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        return socket.inet_ntoa(fcntl.ioctl(s.fileno(), 0x8915, struct.pack('256s', b"eth0"[:15]))[20:24])
-    else:
-        if is_ipv4(IP):
-            return IP
+    global _host_ip
+    if _host_ip is None:
+        IP = os.getenv("POD_IP")
+        if not IP:
+            _host_ip = get_interface_ip()
+        elif is_ipv4(IP):
+            _host_ip = IP
         else:
-            if IP:
-                return "[{}]".format(IP)
+            _host_ip = "[{}]".format(IP.strip("[]"))
+    return _host_ip
 
 def get_log_level():
-    # todo[anin] change default
-    # loglevel = os.getenv('LOG_LEVEL', 'info')
-    loglevel = os.getenv('LOG_LEVEL', 'debug')
+    loglevel = os.getenv('LOG_LEVEL', 'info')
     return logging.DEBUG if loglevel == "debug" else logging.INFO
 
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        import json
+        data = {"time": self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+                "level": record.levelname, "category": record.name,
+                "message": record.getMessage()}
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data)
+
+
+def setup_logging(level=None):
+    """
+    Configures root logger once for all modules of the process.
+    LOG_FORMAT=json switches to one json object per line.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    handler = logging.StreamHandler()
+    if os.getenv('LOG_FORMAT', 'text') == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            '[%(asctime)s][%(levelname)-5s][category=%(name)s] %(message)s',
+            datefmt='%Y-%m-%dT%H:%M:%S'))
+    root.addHandler(handler)
+    root.setLevel(level or get_log_level())
+
 def execute_shell_command(cmd):
+    import subprocess
     p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
     (output, error) = p.communicate()
     exit_code = p.wait()
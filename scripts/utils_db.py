@@ -12,92 +12,89 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import re
-import subprocess
 import time
 import logging
-import psycopg2
-import requests
 
-from utils import get_log_level, get_host_ip, execute_shell_command
+import metrics
+import settings_diff
+from patroni_client import get_client
 
-logging.basicConfig(
-    level=get_log_level(),
-    format='[%(asctime)s][%(levelname)-5s][category=%(name)s] %(message)s',
-    datefmt='%Y-%m-%dT%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
-
-def get_context_data(setting_name):
-    conn = None
-    cursor = None
-    conn_string = "host='localhost' dbname='postgres' user='postgres' " \
-                  "connect_timeout=3 options='-c statement_timeout=3000'"
-    try:
-        conn = psycopg2.connect(conn_string)
-        cursor = conn.cursor()
-        cursor.execute("select context from pg_settings where name=%(sname)s",
-                       {"sname": setting_name})
-        row = cursor.fetchone()
-        if row:
-            return row[0]
-        else:
-            return None
-    except psycopg2.OperationalError:
-        return None
-    finally:
-        close_connection(cursor, conn)
-    # return map(lambda x: x.strip(), subprocess.check_output(
-    #     "psql -U postgres -t -c \"select setting, unit, category, vartype from pg_settings where name='{}'\"".format(setting_name), shell=True).split("|"))
-
-
-def get_settings_data(setting_name):
-    conn = None
+CONN_STRING = "host='localhost' dbname='postgres' user='postgres' " \
+              "connect_timeout=3 options='-c statement_timeout=3000'"
+
+_connection = None
+
+
+def get_connection():
+    """
+    Returns connection to the local database. Connection is opened once
+    and reused by subsequent calls until it is closed.
+    :rtype: psycopg2.extensions.connection
+    """
+    import psycopg2
+    global _connection
+    if _connection is None or _connection.closed != 0:
+        _connection = psycopg2.connect(CONN_STRING)
+        _connection.autocommit = True
+        metrics.inc("db_connections_total")
+    return _connection
+
+
+def get_settings_snapshot(setting_names):
+    """
+    Reads current state of requested settings from pg_settings with single query.
+    Settings which are unknown to the server are absent in the result.
+    :param setting_names: names of settings to read
+    :return: name -> dict with value, setting, unit, vartype, context and pending_restart
+    :rtype: dict
+    """
+    import psycopg2
+    names = {}
+    for name in setting_names:
+        names.setdefault(name.lower(), []).append(name)
+    if not names:
+        return {}
     cursor = None
-    conn_string = "host='localhost' dbname='postgres' user='postgres' " \
-                  "connect_timeout=3 options='-c statement_timeout=3000'"
+    start = time.time()
     try:
-        conn = psycopg2.connect(conn_string)
-        cursor = conn.cursor()
-        logger.info(setting_name)
-        cursor.execute("select current_setting (%(sname)s, 't')",
-                       {"sname": setting_name})
-        row = cursor.fetchone()
-        if row:
-            return row[0]
-        else:
-            return None
+        cursor = get_connection().cursor()
+        cursor.execute("select name, current_setting(name), setting, unit, vartype, "
+                       "context, pending_restart from pg_settings "
+                       "where name = any(%(names)s)",
+                       {"names": list(names)})
+        result = {}
+        for (name, value, setting, unit, vartype, context, pending_restart) in cursor.fetchall():
+            data = {
+                "value": value,
+                "setting": setting,
+                "unit": unit,
+                "vartype": vartype,
+                "context": context,
+                "pending_restart": pending_restart,
+            }
+            for requested_name in names.get(name, [name]):
+                result[requested_name] = data
+        return result
     except psycopg2.OperationalError:
-        return None
+        logger.exception("Cannot read settings from pg_settings")
+        metrics.inc("db_query_failures_total", query="settings_snapshot")
+        return {}
     finally:
-        close_connection(cursor, conn)
+        metrics.observe("db_query_seconds", time.time() - start, query="settings_snapshot")
+        if cursor and not cursor.closed:
+            cursor.close()
 
 
-def is_restart_pending():
-    conn = None
-    cursor = None
-    conn_string = "host='localhost' dbname='postgres' user='postgres' " \
-                  "connect_timeout=3 options='-c statement_timeout=3000'"
-    try:
-        conn = psycopg2.connect(conn_string)
-        cursor = conn.cursor()
-        cursor.execute("select count(*) from pg_settings where pending_restart = TRUE")
-        row = cursor.fetchone()
-        return int(row[0]) > 0
-    except Exception as e:
-        logger.exception("Cannot get amount of parameters which requires restart")
-        raise e
-    finally:
-        close_connection(cursor, conn)
-
-
-def schedule_restart():
+def schedule_restart(restart_pending=False, schedule=None, mode=None, wait=False):
+    """
+    Restarts postgres through patroni REST API in background, see restart_manager.
+    :rtype: restart_manager.RestartTask
+    """
+    from restart_manager import schedule_restart as start_restart
     logger.debug("Schedule restart")
-    restart_command = "patronictl -c /patroni/pg_node.yml restart $PG_CLUST_NAME $(hostname) --force"
-#    res = execute_shell_command(restart_command)
-#    logger.debug(res)
-    return execute_shell_command(restart_command)
+    return start_restart(restart_pending=restart_pending, schedule=schedule, mode=mode, wait=wait)
 
 
 def close_connection(cursor, conn):
@@ -109,19 +106,65 @@ def close_connection(cursor, conn):
         conn.close()
 
 
-def is_values_diff(value, db_value):
-    logger.debug("Start comparison for value: {}, db_value: {}"
-                 .format(value, db_value))
-    return value != db_value
-
-
-def patroni_restart_state(basic_auth, iterations=5, sleep=3):
-    for i in range(iterations):
-        time.sleep(sleep)
-        r = requests.get("http://{}:8008".format(get_host_ip()),
-                         auth=basic_auth)
-        logger.info("Checking restart state... It is {}".format(r.json().get('pending_restart', False)))
-        restart_required = r.json().get('pending_restart', False)
+def is_values_diff(value, db_value, name=None, unit=None, vartype=None):
+    logger.debug("Start comparison for value: %s, db_value: %s", value, db_value)
+    return settings_diff.is_values_diff(name, value, db_value, unit, vartype)
+
+
+def watch_restart_state(client=None, expected=None, timeout=15, max_interval=3):
+    """
+    Checks restart state immediately and then with growing intervals until
+    expected parameters are applied or are waiting for restart.
+    :param client: patroni_client.PatroniClient, shared client by default
+    :param expected: parameter name -> value which was sent to patroni
+    :type expected: dict
+    :param timeout: max seconds to wait
+    :param max_interval: max seconds between checks
+    :return: (restart_required, seconds spent for convergence)
+    :rtype: tuple
+    """
+    import requests
+    client = client or get_client()
+    start = time.time()
+    interval = 0.2
+    restart_required = False
+    while True:
+        try:
+            restart_required = client.status().get('pending_restart', False)
+            logger.info("Checking restart state... It is {}".format(restart_required))
+        except requests.RequestException as e:
+            logger.warning("Cannot get patroni state: {}".format(e))
         if restart_required:
             break
-    return restart_required
\ No newline at end of file
+        if expected:
+            snapshot = get_settings_snapshot(list(expected.keys()))
+            if not snapshot:
+                logger.info("Settings cannot be read from pg_settings, pending_restart of patroni is used")
+                break
+            if any(setting.get("pending_restart") for setting in list(snapshot.values())):
+                logger.info("Some of parameters are pending restart in pg_settings")
+                restart_required = True
+                break
+            # parameters unknown to the server, like GUCs of not loaded libraries, cannot be checked
+            known = dict((key, value) for key, value in list(expected.items()) if key in snapshot)
+            if not settings_diff.diff_settings(known, snapshot):
+                logger.info("All parameters are applied")
+                break
+        elapsed = time.time() - start
+        if elapsed >= timeout:
+            logger.info("Restart state is not changed in {}s".format(timeout))
+            break
+        time.sleep(min(interval, timeout - elapsed))
+        interval = min(interval * 2, max_interval)
+    elapsed = time.time() - start
+    metrics.observe("restart_wait_seconds", elapsed, restart_required=restart_required)
+    logger.info("Restart state check finished in {:.3f}s, restart required: {}"
+                .format(elapsed, restart_required))
+    return restart_required, elapsed
+
+
+def patroni_restart_state(client=None, iterations=5, sleep=3, expected=None):
+    restart_required, _ = watch_restart_state(client, expected,
+                                              timeout=iterations * sleep,
+                                              max_interval=sleep)
+    return restart_required
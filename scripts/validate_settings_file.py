@@ -12,60 +12,126 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import json
 import sys
 import os
 import argparse
+import time
 
-from utils import read_property_file, get_log_level
-from utils_db import get_settings_data, is_values_diff, is_restart_pending, schedule_restart, patroni_restart_state
+from utils import read_property_file, setup_logging, write_file_atomically
+from settings_diff import diff_settings
+from patroni_client import get_client
+from utils_db import get_settings_snapshot, schedule_restart, patroni_restart_state
 import logging
 
-logging.basicConfig(
-    level=get_log_level(),
-    format='[%(asctime)s][%(levelname)-5s][category=%(name)s] %(message)s',
-    datefmt='%Y-%m-%dT%H:%M:%S'
-)
 logger = logging.getLogger(__name__)
 
+STATE_FILE = os.getenv("SETTINGS_CHECK_STATE_FILE", "/patroni/settings_check_state.json")
 
-def main(conf_file, restart_pg=False):
-    logger.info("Start settings validation {}".format(sys.argv))
-    properties = read_property_file(conf_file)
 
-    # find properties which requires update
-    properties4update = {}
-    for key, value in list(properties.items()):
-        logger.debug("Try to check setting: {} with expected value {}".format(key, value))
-        (current_value) = get_settings_data(key)
-        logger.debug("Value from DB: {}".format(current_value))
-        if is_values_diff(value, current_value):
-            properties4update[key] = value
+def digest(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_state(state_file):
+    try:
+        with open(state_file) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
 
+def save_state(state_file, state):
+    try:
+        write_file_atomically(state_file, json.dumps(state))
+    except (IOError, OSError) as e:
+        logger.warning("Cannot save validation state to {}: {}".format(state_file, e))
+
+
+def validate(properties, snapshot, restart_pg=False):
+    """
+    Compares properties with current settings and checks if restart is required.
+    :return: result with status in_sync, differs, restart_required or restart_scheduled
+    :rtype: dict
+    """
+    properties4update = diff_settings(properties, snapshot)
+    result = {
+        "status": "in_sync",
+        "differences": dict((key, {"expected": value, "actual": snapshot.get(key, {}).get("value")})
+                            for key, value in list(properties4update.items())),
+        "pending_restart": sorted(key for key in properties4update
+                                  if snapshot.get(key, {}).get("pending_restart")),
+    }
     if not properties4update:
         logger.info("No properties to update")
-        return
-    user = os.getenv('PATRONI_REST_API_USER')
-    password = os.getenv('PATRONI_REST_API_PASSWORD')
-    from requests.auth import HTTPBasicAuth
-    basic_auth = HTTPBasicAuth(user, password)
-
-    if patroni_restart_state(basic_auth):
-        logger.info("Schedule restart because some settings requires restart and restart_pg is true")
-        schedule_restart()
-        sys.exit(1)
+        return result
+    if logger.isEnabledFor(logging.DEBUG):
+        for key, value in list(result["differences"].items()):
+            logger.debug("Setting %s differs: expected value %s, value from DB: %s",
+                         key, value["expected"], value["actual"])
+
+    # pending_restart in pg_settings is enough, otherwise wait for patroni
+    if result["pending_restart"] or patroni_restart_state(get_client(), expected=properties4update):
+        if restart_pg:
+            logger.info("Schedule restart because some settings requires restart and restart_pg is true")
+            schedule_restart()
+            result["status"] = "restart_scheduled"
+        else:
+            logger.warning("Some settings require restart, restart_pg is false")
+            result["status"] = "restart_required"
     else:
-        sys.exit(0)
+        result["status"] = "differs"
+    return result
 
 
+def main(conf_file, restart_pg=False, state_file=STATE_FILE):
+    """
+    Validates settings, result is not calculated again if neither settings file
+    nor pg_settings were changed since the previous validation.
+    :return: validation result
+    :rtype: dict
+    """
+    start = time.time()
+    logger.info("Start settings validation {}".format(sys.argv))
+    properties = read_property_file(conf_file)
+    snapshot = get_settings_snapshot(list(properties.keys()))
+    digests = {"file": digest(properties), "settings": digest(snapshot)}
 
-if __name__ == '__main__':
+    state = load_state(state_file)
+    if snapshot and state.get("digests") == digests and \
+            not (restart_pg and state["result"]["status"] == "restart_required"):
+        logger.info("Settings file and pg_settings are not changed since the previous validation")
+        result = dict(state["result"], cached=True)
+    else:
+        result = dict(validate(properties, snapshot, restart_pg), cached=False)
+        save_state(state_file, {"digests": digests, "result": result})
+    result["duration"] = round(time.time() - start, 3)
+    return result
+
+
+def cli():
+    setup_logging()
     parser = argparse.ArgumentParser(description='Validation procedure')
     parser.add_argument('--conf-file', dest='conf_file', default=None, required=True,
                         help='path to file with postgresql settings')
     parser.add_argument('--restart-pg', dest='restart_pg', default='false',
                         help='Restart postgres if there are settings which requires restart')
+    parser.add_argument('--prepare', dest='prepare', action='store_true',
+                        help='Prepare settings file from env and user config before validation')
+    parser.add_argument('--state-file', dest='state_file', default=STATE_FILE,
+                        help='path to file with result of the previous validation')
 
     args = parser.parse_args()
 
-    main(args.conf_file, args.restart_pg == "true")
+    if args.prepare:
+        from prepare_settings_file import prepare_settings
+        prepare_settings(args.conf_file)
+    result = main(args.conf_file, args.restart_pg == "true", args.state_file)
+    print(json.dumps(result, sort_keys=True))
+    if result["status"] in ("restart_required", "restart_scheduled"):
+        sys.exit(1)
+
 
+if __name__ == '__main__':
+    cli()
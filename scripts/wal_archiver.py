@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Resident WAL archiver.
+# Service keeps pooled keep-alive connections to backup daemon and uploads
+# segments which are ready for archiving in parallel. archive_command is thin
+# client which asks service to archive segment and waits for result.
+# Each segment is read once: it is streamed to the daemon in chunks and
+# checksum is updated from the same chunks, sha256 form field follows the
+# file part. Service archives only files in pg_wal under WAL_ARCHIVER_DATA_ROOT.
+#
+# python3 /wal_archiver.py serve
+# python3 /wal_archiver.py push pg_wal/000000010000000000000001 000000010000000000000001
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import socket
+import stat
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = os.getenv("WAL_ARCHIVER_SOCKET", "/patroni/wal_archiver.sock")
+ARCHIVE_URL = os.getenv("WAL_ARCHIVE_URL", "http://postgres-backup-daemon:8082/archive/put")
+PARALLEL = int(os.getenv("WAL_ARCHIVER_PARALLEL", 4))
+PUSH_TIMEOUT = int(os.getenv("WAL_ARCHIVER_PUSH_TIMEOUT", 600))
+# (connect, read) timeouts, same as curl --connect-timeout 5 --speed-time 30
+UPLOAD_TIMEOUT = (5, 30)
+DONE_CACHE_SIZE = 1024
+CHUNK_SIZE = 1024 * 1024
+DATA_ROOT = os.getenv("WAL_ARCHIVER_DATA_ROOT", "/var/lib/pgsql/data")
+
+
+def get_root_password():
+    password = os.getenv("PG_ROOT_PASSWORD")
+    if password:
+        return password
+    # archive_command may be started without env of container
+    with open("/proc/1/environ", "rb") as f:
+        for item in f.read().split(b"\0"):
+            if item.startswith(b"PG_ROOT_PASSWORD="):
+                return item.split(b"=", 1)[1].decode("utf-8")
+    return None
+
+
+def create_session(pool_size=1):
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    session.auth = ("postgres", get_root_password())
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class SegmentBody(object):
+    """
+    multipart/form-data body which reads segment once. File part is sent by
+    chunks which update sha256, sha256 field is sent after the file part.
+    Length is known in advance, so request is not chunked.
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.size = os.path.getsize(path)
+        self.sha256 = None
+        boundary = uuid.uuid4().hex
+        self.content_type = "multipart/form-data; boundary={}".format(boundary)
+        self.head = ('--{}\r\nContent-Disposition: form-data; name="file"; filename="{}"\r\n'
+                     'Content-Type: application/octet-stream\r\n\r\n'
+                     .format(boundary, os.path.basename(path))).encode("utf-8")
+        self.middle = ('\r\n--{}\r\nContent-Disposition: form-data; name="sha256"\r\n\r\n'
+                       .format(boundary)).encode("utf-8")
+        self.tail = "\r\n--{}--\r\n".format(boundary).encode("utf-8")
+
+    def __len__(self):
+        return len(self.head) + self.size + len(self.middle) + hashlib.sha256().digest_size * 2 + len(self.tail)
+
+    def __iter__(self):
+        # body is iterated again if request is retried
+        sha256 = hashlib.sha256()
+        read = 0
+        yield self.head
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                read += len(chunk)
+                sha256.update(chunk)
+                yield chunk
+        if read != self.size:
+            raise IOError("Size of {} changed during upload: {} of {} bytes".format(self.path, read, self.size))
+        self.sha256 = sha256.hexdigest()
+        yield self.middle
+        yield self.sha256.encode("utf-8")
+        yield self.tail
+
+
+def upload_segment(session, path, filename):
+    """
+    Streams segment to backup daemon, sha256 is calculated from the same chunks.
+    :return: sha256 of uploaded segment
+    """
+    body = SegmentBody(path)
+    with metrics.timer("wal_upload"):
+        r = session.post(ARCHIVE_URL, params={"filename": filename}, data=body,
+                         headers={"Content-Type": body.content_type}, timeout=UPLOAD_TIMEOUT)
+        r.raise_for_status()
+    metrics.inc("wal_archived_segments_total")
+    metrics.inc("wal_archived_bytes_total", body.size)
+    logger.info("Segment {} is archived, {} bytes".format(filename, body.size))
+    return body.sha256
+
+
+def check_segment_path(path, filename, data_root=None):
+    """
+    Checks that path is regular file named filename in pg_wal directory
+    under data_root, so local clients cannot upload other files.
+    """
+    data_root = os.path.normpath(data_root or DATA_ROOT)
+    if not os.path.isabs(path) or os.path.normpath(path) != path:
+        raise ValueError("Path {} is not absolute normalized path".format(path))
+    if os.path.basename(path) != filename or os.path.basename(os.path.dirname(path)) != "pg_wal":
+        raise ValueError("Path {} is not {} in pg_wal".format(path, filename))
+    if not path.startswith(data_root + os.sep):
+        raise ValueError("Path {} is outside of {}".format(path, data_root))
+    if not stat.S_ISREG(os.lstat(path).st_mode):
+        raise ValueError("Path {} is not regular file".format(path))
+
+
+class WalArchiver(object):
+
+    def __init__(self, socket_path=SOCKET_PATH, parallel=PARALLEL):
+        self.socket_path = socket_path
+        self.parallel = parallel
+        self.session = create_session(parallel)
+        self.pool = ThreadPoolExecutor(max_workers=parallel)
+        self.lock = threading.RLock()
+        self.in_progress = {}
+        self.done = collections.OrderedDict()
+
+    def schedule(self, path, filename):
+        """
+        Starts upload of segment if it is not archived or in progress yet.
+        Must be called under self.lock.
+        :return: future of upload or None if segment is already archived
+        """
+        if filename in self.done:
+            return None
+        future = self.in_progress.get(filename)
+        if future is None:
+            future = self.pool.submit(upload_segment, self.session, path, filename)
+            self.in_progress[filename] = future
+            future.add_done_callback(lambda f: self.complete(filename, f))
+        return future
+
+    def complete(self, filename, future):
+        with self.lock:
+            self.in_progress.pop(filename, None)
+            if future.exception() is None:
+                self.done[filename] = future.result()
+                while len(self.done) > DONE_CACHE_SIZE:
+                    self.done.popitem(last=False)
+            else:
+                logger.error("Cannot archive segment {}: {}".format(filename, future.exception()))
+
+    def ready_segments(self, wal_dir, filename):
+        """
+        Returns next segments which postgres marked as ready for archiving.
+        """
+        try:
+            ready = sorted(name[:-len(".ready")]
+                           for name in os.listdir(os.path.join(wal_dir, "archive_status"))
+                           if name.endswith(".ready"))
+        except OSError:
+            return []
+        return [name for name in ready if name != filename][:self.parallel - 1]
+
+    def archive(self, path, filename):
+        check_segment_path(path, filename)
+        wal_dir = os.path.dirname(path)
+        with self.lock:
+            future = self.schedule(path, filename)
+            for name in self.ready_segments(wal_dir, filename):
+                self.schedule(os.path.join(wal_dir, name), name)
+        if future is not None:
+            future.result(timeout=PUSH_TIMEOUT)
+
+    def handle(self, conn):
+        with conn:
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                data += chunk
+            request = json.loads(data.decode("utf-8"))
+            try:
+                self.archive(request["path"], request["filename"])
+                conn.sendall(b"ok\n")
+            except Exception as e:
+                logger.exception("Cannot archive segment {}".format(request))
+                conn.sendall("error {}\n".format(e).encode("utf-8"))
+
+    def serve(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        server.listen(16)
+        logger.info("WAL archiver is listening on {}".format(self.socket_path))
+        metrics.start_flusher()
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+
+def push(path, filename):
+    """
+    Asks archiver service to archive segment, uploads it directly if service is not available.
+    :rtype: bool
+    """
+    path = os.path.abspath(path)
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(PUSH_TIMEOUT)
+    try:
+        s.connect(SOCKET_PATH)
+    except OSError as e:
+        s.close()
+        logger.warning("WAL archiver is not available: {}. Upload segment directly".format(e))
+        try:
+            upload_segment(create_session(), path, filename)
+            return True
+        except Exception:
+            logger.exception("Cannot archive segment {}".format(filename))
+            return False
+    with s:
+        s.sendall((json.dumps({"path": path, "filename": filename}) + "\n").encode("utf-8"))
+        response = s.makefile().readline().strip()
+    if response != "ok":
+        logger.error("Cannot archive segment {}: {}".format(filename, response))
+        return False
+    return True
+
+
+def main():
+    setup_logging()
+    if len(sys.argv) == 2 and sys.argv[1] == "serve":
+        WalArchiver().serve()
+    elif len(sys.argv) == 4 and sys.argv[1] == "push":
+        if not push(sys.argv[2], sys.argv[3]):
+            sys.exit(1)
+    else:
+        sys.exit("Usage: {0} serve | push path filename".format(sys.argv[0]))
+
+
+if __name__ == '__main__':
+    main()
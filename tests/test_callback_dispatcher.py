@@ -0,0 +1,178 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import subprocess
+import threading
+import time
+
+import pytest
+
+import callback_dispatcher
+import settings_reconciler
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    for name, filename in (("STATE_FILE", "callback_state.json"), ("STATE_LOCK", "callback_state.lock"),
+                           ("RUN_LOCK", "callback_run.lock"), ("EVENTS_LOG", "callback_events.log")):
+        monkeypatch.setattr(callback_dispatcher, name, str(tmp_path / filename))
+    monkeypatch.setattr(callback_dispatcher, "DEBOUNCE", 0.05)
+    return tmp_path
+
+
+def read_events():
+    with open(callback_dispatcher.EVENTS_LOG) as f:
+        return [json.loads(line) for line in f]
+
+
+def statuses():
+    return dict((event["seq"], event["status"]) for event in read_events() if event["status"] != "received")
+
+
+class Handler(object):
+    """
+    Replaces handler, tracks handled events and concurrency.
+    """
+
+    def __init__(self, monkeypatch):
+        self.handled = []
+        self.running = 0
+        self.max_running = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.lock = threading.Lock()
+        monkeypatch.setattr(callback_dispatcher, "handle", self)
+
+    def __call__(self, event):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        self.release.wait(5)
+        self.handled.append(event["seq"])
+        with self.lock:
+            self.running -= 1
+
+
+def run_in_threads(events):
+    threads = [threading.Thread(target=callback_dispatcher.run, args=(event,)) for event in events]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_burst_of_events_is_coalesced(state_dir, monkeypatch):
+    handler = Handler(monkeypatch)
+    events = [callback_dispatcher.register_event("on_role_change", "replica", "common") for _ in range(5)]
+    for thread in run_in_threads(events):
+        thread.join()
+    assert handler.handled == [5]
+    assert statuses() == {1: "superseded", 2: "superseded", 3: "superseded", 4: "superseded", 5: "done"}
+
+
+def test_role_change_supersedes_event(state_dir, monkeypatch):
+    handler = Handler(monkeypatch)
+    replica = callback_dispatcher.register_event("on_role_change", "replica", "common")
+    master = callback_dispatcher.register_event("on_role_change", "master", "common")
+    for thread in run_in_threads([replica, master]):
+        thread.join()
+    assert handler.handled == [master["seq"]]
+
+
+def test_handlers_do_not_run_concurrently(state_dir, monkeypatch):
+    handler = Handler(monkeypatch)
+    handler.release.clear()
+    first = callback_dispatcher.register_event("on_start", "replica", "common")
+    threads = run_in_threads([first])
+    while not handler.running:
+        time.sleep(0.01)
+    # events which come while handler runs wait for the lock, only the latest is handled
+    events = [callback_dispatcher.register_event("on_restart", "replica", "common") for _ in range(3)]
+    threads += run_in_threads(events)
+    time.sleep(0.3)
+    assert handler.handled == []
+    handler.release.set()
+    for thread in threads:
+        thread.join()
+    assert handler.handled == [1, 4] and handler.max_running == 1
+    assert statuses() == {1: "done", 2: "superseded", 3: "superseded", 4: "done"}
+
+
+def test_failed_handler_is_recorded(state_dir, monkeypatch):
+    def handle(event):
+        raise subprocess.CalledProcessError(1, ["/propagate_settings.sh"])
+    monkeypatch.setattr(callback_dispatcher, "handle", handle)
+    callback_dispatcher.run(callback_dispatcher.register_event("on_start", "master", "common"))
+    assert read_events()[-1]["status"] == "failed"
+
+
+def test_timeout_kills_process_group(tmp_path):
+    pid_file = str(tmp_path / "child.pid")
+    with pytest.raises(subprocess.TimeoutExpired):
+        callback_dispatcher.run_command(["bash", "-c", "sleep 60 & echo $! > {}; wait".format(pid_file)],
+                                        timeout=0.5)
+    with open(pid_file) as f:
+        pid = int(f.read())
+    for _ in range(50):
+        try:
+            with open("/proc/{}/stat".format(pid)) as f:
+                if f.read().split(") ")[1].startswith("Z"):
+                    break
+        except IOError:
+            break
+        time.sleep(0.02)
+    else:
+        pytest.fail("child of timed out command is still running")
+
+
+def test_failed_command_raises():
+    with pytest.raises(subprocess.CalledProcessError):
+        callback_dispatcher.run_command(["bash", "-c", "exit 3"])
+
+
+@pytest.mark.parametrize("result, status", [(True, "done"), (False, "failed"), (RuntimeError("boom"), "failed")])
+def test_reconciler_records_result_of_passed_events(state_dir, monkeypatch, result, status):
+    reconciler = settings_reconciler.SettingsReconciler(debounce=0.2)
+    reconciled = []
+
+    def reconcile(event):
+        reconciled.append(event)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    monkeypatch.setattr(reconciler, "reconcile", reconcile)
+    events = [callback_dispatcher.register_event("on_role_change", "master", "common") for _ in range(3)]
+    for event in events:
+        reconciler.events.put(dict(event))
+    # event of external notify without sequence number is reconciled but not recorded
+    reconciler.events.put({"action": "on_reload", "role": "master", "cluster": "common"})
+    threading.Thread(target=reconciler.worker, daemon=True).start()
+    for _ in range(100):
+        if os.path.exists(callback_dispatcher.EVENTS_LOG) and len(read_events()) == 3:
+            break
+        time.sleep(0.02)
+    assert len(reconciled) == 1
+    records = read_events()
+    assert [record["seq"] for record in records] == [1, 2, 3]
+    assert all(record["status"] == status and record["coalesced"] == 4 for record in records)
+
+
+def test_master_event_is_passed_to_reconciler_with_sequence(state_dir, monkeypatch):
+    notified = []
+    monkeypatch.setattr(settings_reconciler, "notify", lambda *args, **kwargs: notified.append(kwargs) or True)
+    monkeypatch.setattr(callback_dispatcher.subprocess, "Popen", lambda *args, **kwargs: pytest.fail("started"))
+    callback_dispatcher.dispatch("on_role_change", "master", "common")
+    assert notified == [{"seq": 1}]
+    assert [event["status"] for event in read_events()] == ["received", "passed to reconciler"]
@@ -0,0 +1,87 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pwd
+import stat
+import sys
+
+import pytest
+
+import fix_permission
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    (tmp_path / "base" / "1").mkdir(parents=True)
+    for name in ("base/1/100", "base/1/101", "PG_VERSION"):
+        (tmp_path / name).write_text("x")
+        os.chmod(str(tmp_path / name), 0o600)
+    os.chmod(str(tmp_path / "base" / "1"), 0o700)
+    # current user plays postgres, so test does not require root
+    user = pwd.getpwuid(os.getuid())
+    monkeypatch.setattr(fix_permission.pwd, "getpwnam", lambda name: user)
+    monkeypatch.setattr(fix_permission, "GROUP_ID", os.getgid())
+    return tmp_path
+
+
+def run_main(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["fix_permission.py"] + list(args))
+    fix_permission.main()
+
+
+def test_fix(tree):
+    stats = fix_permission.PermissionFixer(os.getuid(), os.getgid(), workers=2).run(str(tree))
+    assert stats["scanned"] == 6 and stats["errors"] == 0
+    assert stat.S_IMODE(os.stat(str(tree / "base/1/100")).st_mode) == 0o660
+    assert stat.S_IMODE(os.stat(str(tree / "base/1")).st_mode) == 0o770
+    stats = fix_permission.PermissionFixer(os.getuid(), os.getgid(), workers=2).run(str(tree))
+    assert stats["mode_changed"] == 0 and stats["owner_changed"] == 0
+
+
+def break_entry(monkeypatch, path):
+    chmod = os.chmod
+
+    def failing_chmod(target, mode):
+        if target == path:
+            raise PermissionError(1, "Operation not permitted", target)
+        chmod(target, mode)
+    monkeypatch.setattr(fix_permission.os, "chmod", failing_chmod)
+
+
+def test_entry_errors_do_not_fail(tree, monkeypatch):
+    break_entry(monkeypatch, str(tree / "base/1/100"))
+    run_main(monkeypatch, str(tree))
+    assert stat.S_IMODE(os.stat(str(tree / "base/1/101")).st_mode) == 0o660
+
+
+def test_content_of_broken_directory_is_fixed(tree, monkeypatch):
+    break_entry(monkeypatch, str(tree / "base/1"))
+    stats = fix_permission.PermissionFixer(os.getuid(), os.getgid(), workers=2).run(str(tree))
+    assert stats["scanned"] == 6 and stats["errors"] == 1
+    assert stat.S_IMODE(os.stat(str(tree / "base/1")).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(str(tree / "base/1/100")).st_mode) == 0o660
+
+
+def test_entry_errors_fail_in_strict_mode(tree, monkeypatch):
+    break_entry(monkeypatch, str(tree / "base/1/100"))
+    with pytest.raises(SystemExit) as e:
+        run_main(monkeypatch, "--strict", str(tree))
+    assert e.value.code == 1
+
+
+def test_missing_root_fails(tree, monkeypatch):
+    with pytest.raises(SystemExit) as e:
+        run_main(monkeypatch, str(tree / "missing"))
+    assert "Cannot fix permissions" in str(e.value.code)
@@ -0,0 +1,151 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import pytest
+
+import fixtures
+from fleet_rollout import CONVERGED, FAILED, IN_SYNC, NOT_CONVERGED, SKIPPED, FleetRollout
+
+PROPERTIES = {"work_mem": "8MB", "max_connections": "300"}
+UNREACHABLE = "http://127.0.0.1:1/patroni"
+
+
+@pytest.fixture
+def clusters():
+    stubs = []
+
+    def create(count):
+        for _ in range(count):
+            stub = fixtures.StubPatroni(fixtures.FakeDb([]))
+            stub.parameters = {"work_mem": "4MB", "max_connections": 200}
+            stubs.append(stub)
+        return stubs
+    yield create
+    for stub in stubs:
+        stub.shutdown()
+
+
+def rollout(stubs, **kwargs):
+    kwargs.setdefault("apply_timeout", 2)
+    reports = FleetRollout(PROPERTIES, [stub.url for stub in stubs], **kwargs).execute()
+    return [report["status"] for report in reports], reports
+
+
+def test_waves():
+    fleet = FleetRollout(PROPERTIES, [], canary=1, growth=2)
+    assert [len(wave) for wave in fleet.waves(list(range(10)))] == [1, 2, 4, 3]
+    fleet = FleetRollout(PROPERTIES, [], canary=3, growth=4)
+    assert [len(wave) for wave in fleet.waves(list(range(20)))] == [3, 12, 5]
+
+
+def test_all_converged(clusters):
+    stubs = clusters(4)
+    statuses, reports = rollout(stubs, canary=1, growth=2)
+    assert statuses == [CONVERGED] * 4
+    assert all(stub.parameters["work_mem"] == "8MB" for stub in stubs)
+    assert sorted(reports[0]["members"]) == ["member-0", "member-1", "member-2"]
+    assert reports[0]["changed"] == ["max_connections", "work_mem"]
+
+
+def test_in_sync_is_not_patched(clusters):
+    stubs = clusters(2)
+    stubs[0].parameters = dict(PROPERTIES)
+    statuses, _ = rollout(stubs)
+    assert statuses == [IN_SYNC, CONVERGED]
+    assert [stub.patches for stub in stubs] == [0, 1]
+
+
+def test_failed_canary_stops_rollout(clusters):
+    stubs = clusters(3)
+    stubs[0].patch_status = 500
+    statuses, reports = rollout(stubs, canary=1, growth=2)
+    assert statuses == [FAILED, SKIPPED, SKIPPED]
+    assert "500" in reports[0]["error"]
+    assert [stub.patches for stub in stubs] == [0, 0, 0]
+
+
+def test_not_converged_wave_stops_rollout(clusters):
+    stubs = clusters(4)
+    stubs[1].apply_patch = False
+    statuses, _ = rollout(stubs, canary=1, growth=2, apply_timeout=0.5)
+    assert statuses == [CONVERGED, NOT_CONVERGED, CONVERGED, SKIPPED]
+    assert stubs[3].patches == 0
+
+
+def test_skewed_member_clock(clusters):
+    stubs = clusters(1)
+    stubs[0].dcs_last_seen = int(time.time()) - 3600
+    statuses, _ = rollout(stubs)
+    assert statuses == [CONVERGED]
+
+
+def test_member_url_rewrite(clusters):
+    stubs = clusters(2)
+    for stub in stubs:
+        stub.api_url = UNREACHABLE
+    statuses, _ = rollout(stubs, apply_timeout=0.5)
+    assert statuses == [NOT_CONVERGED, SKIPPED]
+    for stub in stubs:
+        stub.parameters = {"work_mem": "4MB"}
+    statuses, _ = rollout(stubs, member_url="{endpoint}/patroni")
+    assert statuses == [CONVERGED, CONVERGED]
+
+
+def test_dry_run(clusters):
+    stubs = clusters(2)
+    stubs[1].parameters = dict(PROPERTIES)
+    statuses, _ = rollout(stubs, dry_run=True)
+    assert statuses == ["differs", IN_SYNC]
+    assert [stub.patches for stub in stubs] == [0, 0]
+
+
+def test_unreachable_cluster(clusters):
+    stubs = clusters(1)
+    reports = FleetRollout(PROPERTIES, ["http://127.0.0.1:1", stubs[0].url], apply_timeout=2).execute()
+    assert [report["status"] for report in reports] == [FAILED, CONVERGED]
+    assert reports[0]["error"].startswith("cannot read config")
+
+
+def test_restart_parameter_is_pending_restart(clusters):
+    stubs = clusters(1)
+    stubs[0].pending_restart = True
+    statuses, reports = rollout(stubs, restart_params=["max_connections"])
+    assert statuses == [CONVERGED]
+    assert all(member["pending_restart"] and "restart_not_pending" not in member
+               for member in reports[0]["members"].values())
+
+
+def test_running_value_already_matches_restart_parameter(clusters):
+    stubs = clusters(2)
+    stop = threading.Event()
+
+    def read_dcs():
+        # members read DCS every HA loop, patroni does not report pending restart
+        # because running max_connections is already 300
+        while not stop.wait(0.2):
+            for stub in stubs:
+                stub.dcs_last_seen += 1
+    threading.Thread(target=read_dcs, daemon=True).start()
+    try:
+        start = time.time()
+        statuses, reports = rollout(stubs, restart_params=["max_connections"], apply_timeout=10)
+    finally:
+        stop.set()
+    assert statuses == [CONVERGED, CONVERGED]
+    assert time.time() - start < 10
+    for member in reports[0]["members"].values():
+        assert member["restart_not_pending"] == ["max_connections"] and not member["pending_restart"]
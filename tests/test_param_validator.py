@@ -0,0 +1,100 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+
+import param_validator
+import utils_db
+
+LIVE_ROWS = [("work_mem", "integer", "kB", "64", "2147483647", None, "user"),
+             ("max_connections", "integer", None, "1", "262143", None, "postmaster")]
+STALE_CATALOG = {"work_mem": {"vartype": "integer", "unit": "kB", "min_val": "64", "max_val": "1024",
+                              "enumvals": None, "context": "user"}}
+
+
+class FakeCursor(object):
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = []
+
+    def execute(self, query):
+        self.result = [("160004",)] if "server_version_num" in query else self.rows
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def catalog_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(param_validator, "_catalog", None)
+    monkeypatch.setattr(param_validator, "CATALOG_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(param_validator, "SHIPPED_CATALOG_DIR", str(tmp_path / "shipped"))
+    monkeypatch.setenv("POSTGRESQL_VERSION", "16")
+    for directory in ("cache", "shipped"):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "pg_settings_16.json").write_text(json.dumps(STALE_CATALOG))
+    return tmp_path
+
+
+def database(monkeypatch, available):
+    connects = []
+
+    class Connection(object):
+        def cursor(self):
+            return FakeCursor(LIVE_ROWS)
+
+    def get_connection():
+        connects.append(1)
+        if not available:
+            raise Exception("connection refused")
+        return Connection()
+    monkeypatch.setattr(utils_db, "get_connection", get_connection)
+    return connects
+
+
+def test_live_catalog_is_preferred_and_refreshes_cache(catalog_dirs, monkeypatch):
+    database(monkeypatch, available=True)
+    catalog = param_validator.load_catalog()
+    assert catalog["work_mem"]["max_val"] == "2147483647"
+    with open(str(catalog_dirs / "cache" / "pg_settings_16.json")) as f:
+        assert json.load(f) == catalog
+    result = param_validator.validate({"work_mem": "1GB", "max_connections": "300"}, mode="reject")
+    assert result.errors == {} and result.restart_required == ["max_connections"]
+
+
+def test_offline_catalog_is_fallback(catalog_dirs, monkeypatch):
+    connects = database(monkeypatch, available=False)
+    assert param_validator.load_catalog() == STALE_CATALOG
+    (catalog_dirs / "cache" / "pg_settings_16.json").unlink()
+    assert param_validator.load_catalog() == STALE_CATALOG
+    # database is asked again while offline catalog is used
+    assert len(connects) == 2
+    database(monkeypatch, available=True)
+    assert param_validator.load_catalog()["work_mem"]["max_val"] == "2147483647"
+
+
+def test_catalog_is_not_available(catalog_dirs, monkeypatch):
+    database(monkeypatch, available=False)
+    monkeypatch.delenv("POSTGRESQL_VERSION")
+    assert param_validator.load_catalog() is None
+    assert param_validator.validate({"work_mem": "1TB"}, mode="reject").properties == {"work_mem": "1TB"}
@@ -0,0 +1,195 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import sys
+import time
+
+import pytest
+
+import fixtures
+import propagate_settings_file as propagate
+from patroni_client import PatroniClient
+
+SETTINGS = [
+    ("work_mem", "4MB", "kB", "integer", "user"),
+    ("checkpoint_completion_target", "0.9", None, "real", "sighup"),
+    ("max_connections", "200", None, "integer", "postmaster"),
+]
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    db = fixtures.FakeDb(SETTINGS)
+    monkeypatch.delitem(sys.modules, "psycopg2", raising=False)
+    fixtures.install_fake_psycopg2(db)
+    import property_file
+    import utils_db
+    monkeypatch.setattr(utils_db, "_connection", None)
+    monkeypatch.setattr(property_file, "CACHE_DIR", str(tmp_path / "property_cache"))
+    monkeypatch.setenv("CHANGE_SETTINGS_RETRIES", "1")
+    monkeypatch.setenv("CHANGE_SETTINGS_INTERVAL", "1")
+    monkeypatch.setenv("CHANGE_SETTINGS_APPLY_TIMEOUT", "2")
+    return db
+
+
+@pytest.fixture
+def stub(db):
+    stub = fixtures.StubPatroni(db)
+    stub.reset(SETTINGS)
+    yield stub
+    stub.shutdown()
+
+
+@pytest.fixture
+def client(stub):
+    client = PatroniClient(stub.url)
+    yield client
+    client.close()
+
+
+@pytest.mark.parametrize("status,reference,restart_expected,check,applied", [
+    ({"dcs_last_seen": 100}, 100, (), None, False),
+    ({"dcs_last_seen": 101}, 100, (), None, True),
+    ({}, 100, (), None, False),
+    ({"dcs_last_seen": 101}, 100, (), lambda: False, False),
+    ({"dcs_last_seen": 101}, 100, (), lambda: True, True),
+    ({"dcs_last_seen": 101, "pending_restart": True,
+      "pending_restart_reason": {"max_connections": {"old_value": "200", "new_value": "300"}}},
+     100, ["max_connections"], None, True),
+    ({"dcs_last_seen": 101, "pending_restart": True, "pending_restart_reason": {"shared_buffers": {}}},
+     100, ["max_connections"], None, False),
+    ({"dcs_last_seen": 101, "pending_restart": True}, 100, ["max_connections"], None, True),
+    ({"dcs_last_seen": 101, "pending_restart": False}, 100, ["max_connections"], None, False),
+])
+def test_is_member_applied(status, reference, restart_expected, check, applied):
+    assert propagate.is_member_applied(status, reference, restart_expected, check) is applied
+
+
+def test_parse_http_date():
+    assert propagate.parse_http_date("Sun, 06 Nov 1994 08:49:37 GMT") == 784111777
+    assert propagate.parse_http_date("garbage") is None
+    assert propagate.parse_http_date(None) is None
+
+
+def patch(client, parameters):
+    r = client.patch("/config", data=json.dumps({"postgresql": {"parameters": parameters}}))
+    assert r.ok
+    return r
+
+
+def test_members_applied_with_skewed_clock(stub, client):
+    # member clock is hour behind, local time would never be reached
+    stub.dcs_last_seen = int(time.time()) - 3600
+    members = client.cluster()["members"]
+    references = propagate.get_reference_times(client, members)
+    assert sorted(references) == ["member-0", "member-1", "member-2"]
+    patch_time = time.time()
+    patch(client, {"work_mem": "8MB"})
+    result = propagate.verify_members(client, members, references, patch_time, 2)
+    assert all(state["seconds"] is not None for state in result.values())
+
+
+def test_member_did_not_read_dcs(stub, client):
+    stub.apply_patch = False
+    members = client.cluster()["members"]
+    references = propagate.get_reference_times(client, members)
+    patch(client, {"work_mem": "8MB"})
+    name, seconds, _ = propagate.wait_member_applied(client, members[0], references["member-0"],
+                                                     time.time(), 0.5)
+    assert (name, seconds) == ("member-0", None)
+
+
+def test_unreachable_member_uses_date_of_patch(stub, client):
+    members = [{"name": "gone", "api_url": "http://127.0.0.1:1/patroni"}]
+    references = propagate.get_reference_times(client, members)
+    assert references == {"gone": None}
+    r = patch(client, {"work_mem": "8MB"})
+    references = propagate.fill_reference_times(references, members, r)
+    assert abs(references["gone"] - time.time()) < 5
+
+
+def test_local_values(db):
+    expected = {"work_mem": "8MB", "unknown.param": "1"}
+    assert propagate.check_local_values(expected) is False
+    db.apply({"work_mem": "8192kB"})
+    assert propagate.check_local_values(expected) is True
+
+
+def test_restart_expected(db):
+    from utils_db import get_settings_snapshot
+    snapshot = get_settings_snapshot(["work_mem", "max_connections"])
+    assert propagate.get_restart_expected({"work_mem": "8MB", "max_connections": "300"}, snapshot) == \
+        ["max_connections"]
+    assert propagate.get_restart_expected({"max_connections": "200"}, snapshot) == []
+
+
+def test_local_member(stub, client):
+    members = client.cluster()["members"]
+    assert propagate.get_local_member_name(client, members) == "member-0"
+    assert propagate.get_local_member_name(PatroniClient("http://10.0.0.1:8008"), members) is None
+
+
+def test_propagate_settings(stub, client, tmp_path):
+    settings_file = tmp_path / "settings.conf"
+    settings_file.write_text("work_mem = 16MB\ncheckpoint_completion_target = 0.9\n")
+    result = propagate.propagate_settings(str(settings_file), client)
+    assert sorted(result) == ["member-0", "member-1", "member-2"]
+    assert all(seconds is not None for seconds in result.values())
+    assert stub.parameters["work_mem"] == "16MB"
+    assert propagate.propagate_settings(str(settings_file), client) == {}
+
+
+def watch_restart(monkeypatch):
+    calls = []
+    monkeypatch.setattr(propagate, "patroni_restart_state", lambda *args, **kwargs: calls.append(kwargs) and False)
+    return calls
+
+
+def test_unknown_parameter_stored_in_dcs_is_not_waited(stub, client, tmp_path, monkeypatch):
+    calls = watch_restart(monkeypatch)
+    stub.parameters["pg_stat_statements.max"] = "5000"
+    settings_file = tmp_path / "settings.conf"
+    settings_file.write_text("work_mem = 4MB\npg_stat_statements.max = 5000\n")
+    assert propagate.propagate_settings(str(settings_file), client) == {}
+    assert calls == []
+
+
+def test_settings_are_not_compared_without_snapshot(stub, client, tmp_path, monkeypatch):
+    import psycopg2
+
+    def refuse(*args, **kwargs):
+        raise psycopg2.OperationalError("connection refused")
+    monkeypatch.setattr(psycopg2, "connect", refuse)
+    calls = watch_restart(monkeypatch)
+    settings_file = tmp_path / "settings.conf"
+    settings_file.write_text("work_mem = 4MB\nmax_connections = 200\n")
+    assert propagate.propagate_settings(str(settings_file), client) == {}
+    assert stub.patches == 0 and calls == []
+
+
+def test_clamped_value_is_expected(stub, client, tmp_path, monkeypatch):
+    import param_validator
+    monkeypatch.setattr(param_validator, "VALIDATION_MODE", "clamp")
+    monkeypatch.setattr(param_validator, "_catalog", {
+        "work_mem": {"vartype": "integer", "unit": "kB", "min_val": "64", "max_val": "2097151",
+                     "enumvals": None, "context": "user"}})
+    calls = watch_restart(monkeypatch)
+    settings_file = tmp_path / "settings.conf"
+    settings_file.write_text("work_mem = 4TB\n")
+    result = propagate.propagate_settings(str(settings_file), client)
+    assert stub.parameters["work_mem"] == "2097151"
+    # local member is verified against clamped value which was sent
+    assert result["member-0"] is not None
+    assert calls == [{"expected": {"work_mem": "2097151"}}]
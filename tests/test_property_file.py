@@ -0,0 +1,121 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import pytest
+
+import property_file
+
+
+@pytest.fixture
+def conf(tmp_path, monkeypatch):
+    monkeypatch.setattr(property_file, "CACHE_DIR", str(tmp_path / "cache"))
+    conf = tmp_path / "postgresql.conf"
+    conf.write_text("work_mem = 4MB\nmax_connections = 200\n")
+    return conf
+
+
+def rewrite(path, text, mtime_shift=10):
+    """
+    Writes file and moves its mtime, so change is visible with coarse timestamps.
+    """
+    st = os.stat(str(path))
+    path.write_text(text)
+    os.utime(str(path), ns=(st.st_atime_ns, st.st_mtime_ns + mtime_shift * 10 ** 9))
+
+
+def test_first_parse_and_cache_hit(conf):
+    first = property_file.load(str(conf))
+    assert not first.cached and first.changed
+    assert dict(first.diff.added) == {"work_mem": " 4MB", "max_connections": " 200"}
+    second = property_file.load(str(conf))
+    assert second.cached and not second.changed
+    assert second.properties() == first.properties() == {"work_mem": "4MB", "max_connections": "200"}
+
+
+def test_content_change_with_the_same_size(conf):
+    property_file.load(str(conf))
+    rewrite(conf, "work_mem = 8MB\nmax_connections = 200\n")
+    result = property_file.load(str(conf))
+    assert not result.cached
+    assert result.diff.changed == {"work_mem": (" 4MB", " 8MB")}
+    assert not result.diff.added and not result.diff.removed
+
+
+def test_size_change(conf):
+    property_file.load(str(conf))
+    st = os.stat(str(conf))
+    conf.write_text("work_mem = 4MB\n")
+    os.utime(str(conf), ns=(st.st_atime_ns, st.st_mtime_ns))
+    result = property_file.load(str(conf))
+    assert not result.cached
+    assert result.diff.removed == {"max_connections": " 200"} and not result.diff.changed
+
+
+def test_touched_file_keeps_cache(conf):
+    property_file.load(str(conf))
+    rewrite(conf, conf.read_text())
+    result = property_file.load(str(conf))
+    assert result.cached and not result.changed
+    # new stat is stored, so the next load does not hash file again
+    with open(property_file.cache_file(str(conf), None)) as f:
+        assert json.load(f)["files"][0][1] == os.stat(str(conf)).st_mtime_ns
+
+
+def test_included_files_invalidate_cache(conf, tmp_path):
+    (tmp_path / "conf.d").mkdir()
+    (tmp_path / "common.conf").write_text("shared_buffers = 128MB\n")
+    rewrite(conf, "include 'common.conf'\ninclude_dir 'conf.d'\ninclude_if_exists 'local.conf'\n"
+                  "work_mem = 4MB\n")
+    assert property_file.load(str(conf)).raw == {"shared_buffers": " 128MB", "work_mem": " 4MB"}
+
+    rewrite(tmp_path / "common.conf", "shared_buffers = 256MB\n")
+    result = property_file.load(str(conf))
+    assert not result.cached and result.diff.changed == {"shared_buffers": (" 128MB", " 256MB")}
+
+    (tmp_path / "conf.d" / "10-tuning.conf").write_text("effective_cache_size = 1GB\n")
+    os.utime(str(tmp_path / "conf.d"), ns=(0, os.stat(str(tmp_path / "conf.d")).st_mtime_ns + 10 ** 10))
+    result = property_file.load(str(conf))
+    assert not result.cached and result.diff.added == {"effective_cache_size": " 1GB"}
+
+    # included before work_mem, so the value of main file wins
+    (tmp_path / "local.conf").write_text("work_mem = 64MB\nlock_timeout = 1s\n")
+    result = property_file.load(str(conf))
+    assert not result.cached and result.diff.added == {"lock_timeout": " 1s"} and not result.diff.changed
+    assert property_file.load(str(conf)).cached
+
+
+def test_diff_is_kept_per_consumer(conf):
+    property_file.load(str(conf), key="patroni")
+    rewrite(conf, "work_mem = 8MB\n")
+    assert property_file.load(str(conf), key="patroni").diff.changed == {"work_mem": (" 4MB", " 8MB")}
+    other = property_file.load(str(conf), key="validator")
+    assert not other.cached and other.diff.added == {"work_mem": " 8MB"}
+
+
+def test_without_cache(conf):
+    property_file.load(str(conf), use_cache=False)
+    assert not os.path.exists(property_file.CACHE_DIR)
+    assert not property_file.load(str(conf), use_cache=False).cached
+
+
+def test_value_formats(conf):
+    rewrite(conf, "log_line_prefix=%m [%p] \nshared_buffers =  128MB \nmax_connections = 200\n")
+    result = property_file.load(str(conf))
+    # trailing spaces of log_line_prefix are kept, % right after "=" is escaped
+    assert result.properties()["log_line_prefix"] == "\\%m [%p] "
+    assert result.properties()["shared_buffers"] == "128MB"
+    assert result.typed()["max_connections"] == 200
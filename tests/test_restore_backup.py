@@ -0,0 +1,234 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import io
+import json
+import os
+import shutil
+import subprocess
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import restore_backup
+
+FILES = 12
+FILE_SIZE = 300 * 1024
+
+
+class StubDaemon(object):
+    """
+    Stand-in of backup daemon /get with range requests and dropped connections.
+    """
+
+    def __init__(self):
+        self.archive = b""
+        self.content_type = "application/gzip"
+        self.etag = '"v1"'
+        self.allow_range = True
+        self.drops = 0
+        self.ranges = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                data = stub.archive
+                start = 0
+                stub.ranges.append(self.headers.get("Range"))
+                if self.headers.get("Range") and stub.allow_range:
+                    start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+                    self.send_response(206)
+                    self.send_header("Content-Range", "bytes {}-{}/{}".format(start, len(data) - 1, len(data)))
+                else:
+                    self.send_response(200)
+                body = data[start:]
+                if stub.etag:
+                    self.send_header("ETag", stub.etag)
+                self.send_header("Content-Type", stub.content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if stub.drops > 0:
+                    stub.drops -= 1
+                    self.wfile.write(body[:len(body) // 3])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:{}/get".format(self.server.server_address[1])
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def make_archive(members, encoding="gzip"):
+    """
+    :param members: list of (name, data) for files or (name, "symlink"/"hardlink", target) for links
+    """
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for member in members:
+            info = tarfile.TarInfo(member[0])
+            info.mtime = 1700000000
+            if len(member) == 3:
+                info.type = tarfile.SYMTYPE if member[1] == "symlink" else tarfile.LNKTYPE
+                info.linkname = member[2]
+                tar.addfile(info)
+            else:
+                info.size = len(member[1])
+                info.mode = 0o600
+                tar.addfile(info, io.BytesIO(member[1]))
+    if encoding == "zstd":
+        return subprocess.run(["zstd", "-c"], input=buf.getvalue(), stdout=subprocess.PIPE, check=True).stdout
+    return gzip.compress(buf.getvalue(), compresslevel=1)
+
+
+def data_files():
+    return [("base/1/{}".format(i), os.urandom(FILE_SIZE)) for i in range(FILES)]
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    monkeypatch.setattr(restore_backup.time, "sleep", lambda seconds: None)
+    monkeypatch.setenv("PG_ROOT_PASSWORD", "password")
+    daemon = StubDaemon()
+    yield daemon
+    daemon.server.shutdown()
+
+
+def restore(daemon, tmp_path, restore_version=None):
+    restore_backup.restore(str(tmp_path / "data"), restore_version,
+                           checkpoint_dir=str(tmp_path / "checkpoint"), url=daemon.url)
+
+
+def read_checkpoint(tmp_path):
+    with open(str(tmp_path / "checkpoint" / "checkpoint.json")) as f:
+        return json.load(f)
+
+
+def assert_restored(tmp_path, files):
+    for name, data in files:
+        with open(str(tmp_path / "data" / name), "rb") as f:
+            assert f.read() == data, name
+    assert not os.path.exists(str(tmp_path / "checkpoint" / "checkpoint.json"))
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_dropped_connection_is_continued_with_range(daemon, tmp_path, encoding):
+    if encoding == "zstd" and not shutil.which("zstd"):
+        pytest.skip("zstd is not installed")
+    files = data_files()
+    daemon.archive = make_archive(files, encoding)
+    daemon.content_type = "application/{}".format(encoding)
+    daemon.drops = 2
+    restore(daemon, tmp_path)
+    assert_restored(tmp_path, files)
+    assert daemon.ranges[0] is None
+    assert all(value.startswith("bytes=") for value in daemon.ranges[1:]) and len(daemon.ranges) == 3
+
+
+def test_dropped_connection_without_etag_is_continued(daemon, tmp_path):
+    files = data_files()
+    daemon.archive = make_archive(files)
+    daemon.etag = None
+    daemon.drops = 1
+    restore(daemon, tmp_path)
+    assert_restored(tmp_path, files)
+
+
+def fail_first_attempt(daemon, tmp_path):
+    daemon.allow_range = False
+    daemon.drops = 1
+    with pytest.raises(Exception):
+        restore(daemon, tmp_path)
+    daemon.allow_range = True
+    checkpoint = read_checkpoint(tmp_path)
+    assert 0 < checkpoint["members"] < FILES
+    return checkpoint
+
+
+def test_restart_skips_written_members(daemon, tmp_path):
+    files = data_files()
+    daemon.archive = make_archive(files)
+    checkpoint = fail_first_attempt(daemon, tmp_path)
+    assert checkpoint["backup"] == {"etag": '"v1"', "size": len(daemon.archive)}
+    # written members are not written again
+    written = str(tmp_path / "data" / checkpoint["last_member"])
+    with open(written, "wb") as f:
+        f.write(b"kept")
+    restore(daemon, tmp_path)
+    with open(written, "rb") as f:
+        assert f.read() == b"kept"
+    assert_restored(tmp_path, files[checkpoint["members"]:])
+
+
+@pytest.mark.parametrize("etag, change", [
+    ('"v1"', lambda daemon: setattr(daemon, "etag", '"v2"')),
+    (None, lambda daemon: setattr(daemon, "archive", daemon.archive + b"\0")),
+])
+def test_restart_is_refused_if_backup_is_changed(daemon, tmp_path, etag, change):
+    daemon.archive = make_archive(data_files())
+    daemon.etag = etag
+    fail_first_attempt(daemon, tmp_path)
+    change(daemon)
+    with pytest.raises(RuntimeError, match="changed"):
+        restore(daemon, tmp_path)
+
+
+def test_restart_is_refused_if_backup_is_unknown(daemon, tmp_path):
+    daemon.archive = make_archive(data_files())
+    os.makedirs(str(tmp_path / "checkpoint"))
+    with open(str(tmp_path / "checkpoint" / "checkpoint.json"), "w") as f:
+        # checkpoint of latest backup without identity
+        json.dump({"restore_version": None, "etag": None, "members": 2,
+                   "last_member": "base/1/1", "bytes": 1000}, f)
+    with pytest.raises(RuntimeError, match="cannot be identified"):
+        restore(daemon, tmp_path)
+
+
+def test_tablespace_links(daemon, tmp_path):
+    files = [("PG_VERSION", b"16\n"), ("base/1/100", b"data")]
+    daemon.archive = make_archive(files + [
+        ("pg_tblspc/16385", "symlink", "/var/lib/pgsql/tablespaces/ts1"),
+        ("pg_wal_link", "symlink", "base/1"),
+        ("base/1/101", "hardlink", "base/1/100"),
+    ])
+    restore(daemon, tmp_path)
+    assert_restored(tmp_path, files)
+    assert os.readlink(str(tmp_path / "data" / "pg_tblspc" / "16385")) == "/var/lib/pgsql/tablespaces/ts1"
+    assert os.readlink(str(tmp_path / "data" / "pg_wal_link")) == "base/1"
+    assert os.path.samefile(str(tmp_path / "data" / "base/1/101"), str(tmp_path / "data" / "base/1/100"))
+
+
+@pytest.mark.parametrize("link", [
+    ("escape", "symlink", "../../etc"),
+    ("base/escape", "symlink", "../../outside"),
+    ("base/passwd", "symlink", "/etc/passwd"),
+    ("pg_tblspc/16385", "symlink", "/var/lib/../../etc"),
+    ("pg_tblspc/1/2", "symlink", "/etc"),
+    ("hard", "hardlink", "../outside"),
+])
+def test_bad_links_are_rejected(daemon, tmp_path, link):
+    daemon.archive = make_archive([("PG_VERSION", b"16\n"), link])
+    with pytest.raises(ValueError):
+        restore(daemon, tmp_path)
+    assert not os.path.lexists(str(tmp_path / "data" / link[0]))
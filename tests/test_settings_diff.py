@@ -0,0 +1,123 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import fixtures
+from settings_diff import diff_dcs_settings, diff_settings, is_values_diff, normalize_value
+
+# name, value, other value, unit, vartype, equal
+CASES = [
+    # memory units
+    ("shared_buffers", "128MB", "131072kB", "8kB", "integer", True),
+    ("shared_buffers", "128MB", "16384", "8kB", "integer", True),
+    ("work_mem", "1GB", "1048576", "kB", "integer", True),
+    ("work_mem", "4MB", "4 MB", "kB", "integer", True),
+    ("work_mem", "1.5MB", "1536kB", "kB", "integer", True),
+    ("work_mem", "1000B", "1kB", "kB", "integer", True),
+    ("work_mem", "4MB", "4097kB", "kB", "integer", False),
+    ("work_mem", "4MB", "4mb", "kB", "integer", False),
+    ("max_wal_size", "1TB", "1048576MB", "MB", "integer", True),
+    # time units
+    ("autovacuum_naptime", "1min", "60s", "s", "integer", True),
+    ("autovacuum_naptime", "1min", "60", "s", "integer", True),
+    ("log_min_duration_statement", "1s", "1000", "ms", "integer", True),
+    ("log_min_duration_statement", "1h", "3600000ms", "ms", "integer", True),
+    ("log_min_duration_statement", "1d", "24h", "ms", "integer", True),
+    ("log_min_duration_statement", "-1", "-1", "ms", "integer", True),
+    ("log_min_duration_statement", "1s", "1001ms", "ms", "integer", False),
+    ("vacuum_cost_delay", "1.1s", "1100ms", "ms", "real", True),
+    ("vacuum_cost_delay", "2ms", "2000us", "ms", "real", True),
+    # booleans
+    ("track_io_timing", "on", "true", None, "bool", True),
+    ("track_io_timing", "ON", "yes", None, "bool", True),
+    ("track_io_timing", "1", "t", None, "bool", True),
+    ("track_io_timing", "off", "of", None, "bool", True),
+    ("track_io_timing", "'false'", "no", None, "bool", True),
+    ("track_io_timing", "on", "off", None, "bool", False),
+    ("track_io_timing", "0", "fals", None, "bool", True),
+    # enums
+    ("synchronous_commit", "on", "true", None, "enum", True),
+    ("synchronous_commit", "off", "0", None, "enum", True),
+    ("synchronous_commit", "Local", "local", None, "enum", True),
+    ("synchronous_commit", "local", "remote_write", None, "enum", False),
+    ("huge_pages", "try", "'try'", None, "enum", True),
+    # lists
+    ("shared_preload_libraries", "'pg_stat_statements, auto_explain'", "pg_stat_statements,auto_explain",
+     None, "string", True),
+    ("shared_preload_libraries", "pg_stat_statements,auto_explain", "auto_explain,pg_stat_statements",
+     None, "string", False),
+    ("search_path", '"$user", public', "$user,public", None, "string", True),
+    ("shared_preload_libraries", "", "''", None, "string", True),
+    # quotes
+    ("log_line_prefix", "'%t [%p]: '", "%t [%p]: ", None, "string", True),
+    ("log_line_prefix", "'%t [%p]: '", "%t [%p]:", None, "string", False),
+    ("application_name", "'it''s'", "it's", None, "string", True),
+    ("work_mem", "'64MB'", "65536", "kB", "integer", True),
+    # exponents
+    ("random_page_cost", "1.1", "1.10", None, "real", True),
+    ("random_page_cost", "11e-1", "1.1", None, "real", True),
+    ("random_page_cost", "1.1E0", "0.11e1", None, "real", True),
+    ("random_page_cost", "1.1", "1.2", None, "real", False),
+    ("cpu_tuple_cost", ".01", "1e-2", None, "real", True),
+    ("work_mem", "1e3", "1000", "kB", "integer", True),
+    # hex and octal
+    ("work_mem", "0x400", "1024", "kB", "integer", True),
+    ("work_mem", "0X1f", "31kB", "kB", "integer", True),
+    ("work_mem", "010", "8", "kB", "integer", True),
+    ("random_page_cost", "010", "10", None, "real", True),
+    ("random_page_cost", "0x10", "16", None, "real", True),
+    # unknown unit and type, as in DCS diff without snapshot
+    ("work_mem", "128MB", "131072kB", None, None, True),
+    ("autovacuum_naptime", "1min", "60s", None, None, True),
+    ("custom.flag", "on", "true", None, None, True),
+    ("custom.text", "abc", "abd", None, None, False),
+]
+
+
+@pytest.mark.parametrize("name,value,other,unit,vartype,equal", CASES)
+def test_values(name, value, other, unit, vartype, equal):
+    assert is_values_diff(name, value, other, unit, vartype) is not equal
+    assert is_values_diff(name, other, value, unit, vartype) is not equal
+
+
+def test_generated_pairs():
+    pairs = fixtures.generate_value_pairs(5000)
+    assert sum(1 for p in pairs if p[5]) > 1000
+    wrong = [p for p in pairs if is_values_diff(*p[:5]) is p[5]]
+    assert wrong == []
+
+
+def test_not_numeric():
+    assert normalize_value("work_mem", "lots", "kB", "integer") == "lots"
+    assert normalize_value("work_mem", "4XB", "kB", "integer") == "4XB"
+    assert normalize_value("track_io_timing", "o", None, "bool") == "o"
+
+
+def test_diff_settings():
+    snapshot = {
+        "work_mem": {"value": "4MB", "unit": "kB", "vartype": "integer"},
+        "track_io_timing": {"value": "off", "unit": None, "vartype": "bool"},
+        "log_line_prefix": {"value": "%t [%p]: ", "unit": None, "vartype": "string"},
+    }
+    properties = {"work_mem": "4096kB", "track_io_timing": "on", "log_line_prefix": "'%t [%p]: '",
+                  "unknown.param": "1"}
+    assert diff_settings(properties, snapshot) == {"track_io_timing": "on", "unknown.param": "1"}
+
+
+def test_diff_dcs_settings():
+    dcs = {"work_mem": "4MB", "autovacuum_naptime": "1min", "track_io_timing": "off"}
+    properties = {"work_mem": "4096kB", "autovacuum_naptime": "60s", "track_io_timing": "on",
+                  "max_connections": 200}
+    assert diff_dcs_settings(properties, dcs) == {"track_io_timing": "on", "max_connections": 200}
@@ -0,0 +1,90 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import sys
+import types
+
+import setup_endpoint_callback
+
+
+class FakeBackends(object):
+    """
+    pg_stat_activity of backends, stubborn backends ignore pg_terminate_backend.
+    """
+
+    def __init__(self, pids, stubborn=(), refuse=False):
+        self.pids = list(pids)
+        self.stubborn = set(stubborn)
+        self.refuse = refuse
+        self.closed = False
+
+    def install(self, monkeypatch):
+        backends = self
+        module = types.ModuleType("psycopg2")
+        module.Error = type("Error", (Exception,), {})
+
+        class Cursor(object):
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def execute(self, query, params=None):
+                if "pg_terminate_backend" in query:
+                    backends.pids = [pid for pid in backends.pids
+                                     if pid not in params["pids"] or pid in backends.stubborn]
+                    self.result = []
+                elif "any(%(pids)s" in query:
+                    self.result = [(pid,) for pid in backends.pids if pid in params["pids"]]
+                else:
+                    self.result = [(pid,) for pid in backends.pids]
+
+            def fetchall(self):
+                return self.result
+
+        class Connection(object):
+            autocommit = False
+
+            def cursor(self):
+                return Cursor()
+
+            def close(self):
+                backends.closed = True
+
+        def connect(**kwargs):
+            if backends.refuse:
+                raise module.Error("connection refused")
+            return Connection()
+
+        module.connect = connect
+        monkeypatch.setitem(sys.modules, "psycopg2", module)
+
+
+def test_drain_reports_survivors_of_all_batches(monkeypatch, caplog):
+    backends = FakeBackends(range(1, 11), stubborn=(2, 8))
+    backends.install(monkeypatch)
+    with caplog.at_level(logging.INFO):
+        setup_endpoint_callback.drain_connections(batch_size=5, grace_period=0, timeout=0.3)
+    assert backends.pids == [2, 8] and backends.closed
+    assert "terminated: 8, still alive: 2" in caplog.text
+
+
+def test_drain_does_not_fail_without_connection(monkeypatch, caplog):
+    FakeBackends([1], refuse=True).install(monkeypatch)
+    with caplog.at_level(logging.INFO):
+        setup_endpoint_callback.drain_connections(timeout=0.3)
+    assert "still alive: unknown" in caplog.text
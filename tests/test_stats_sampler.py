@@ -0,0 +1,81 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import stats_sampler
+
+
+def statement(number, calls, time, blks_read):
+    return {"id": "{}:1:10".format(number), "calls": calls, "time": time, "rows": calls,
+            "blks_hit": 0, "blks_read": blks_read, "blks_written": 0, "temp_blks_written": 0,
+            "query": "select {}".format(number)}
+
+
+def test_select_top_keeps_every_order():
+    statements = [statement(i, calls=1, time=1000 - i, blks_read=0) for i in range(10)]
+    statements.append(statement(100, calls=10 ** 6, time=0.1, blks_read=0))
+    statements.append(statement(101, calls=1, time=0.1, blks_read=10 ** 6))
+    selected = stats_sampler.select_top(statements, 3)
+    assert [s["id"] for s in selected] == ["0:1:10", "1:1:10", "2:1:10", "100:1:10", "101:1:10"]
+
+
+def test_top_statements_by_calls_and_io():
+    records = []
+    for ts in range(5):
+        statements = [statement(i, calls=1, time=1000 - i, blks_read=0) for i in range(10)]
+        statements.append(statement(100, calls=1000, time=0.1, blks_read=0))
+        statements.append(statement(101, calls=1, time=0.1, blks_read=5000))
+        records.append({"ts": ts, "statements": stats_sampler.select_top(statements, 3)})
+    assert stats_sampler.top_statements(records, "calls", 1)[0]["calls"] == 5000
+    assert stats_sampler.top_statements(records, "io", 1)[0]["blks_read"] == 25000
+    assert stats_sampler.top_statements(records, "time", 1)[0]["query"] == "select 0"
+
+
+class Cursor(object):
+    """
+    Answers queries of Sampler.sample from lists of rows.
+    """
+
+    def __init__(self, statements):
+        self.statements = statements
+        self.result = []
+
+    def execute(self, query):
+        if "pg_is_in_recovery" in query:
+            self.result = [(False,)]
+        elif "pg_stat_statements" in query:
+            self.result = self.statements
+        elif "pg_stat_database" in query:
+            self.result = [("postgres",) + (1,) * len(stats_sampler.DATABASE_COUNTERS)]
+        else:
+            self.result = [("CPU", 2)]
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+
+def test_sample_stores_top_by_every_key(monkeypatch):
+    monkeypatch.setattr(stats_sampler, "TOP_STATEMENTS", 2)
+    sampler = stats_sampler.Sampler()
+    rows = [(i, 1, 10, 0, 0.0, 0, 0, 0, 0, 0, "q{}".format(i)) for i in range(6)]
+    assert sampler.sample(Cursor(rows)) is None
+    # 0 and 1 are slow, 2 is frequent, 3 reads a lot, 4 is third by time only
+    rows = [(0, 1, 10, 1, 500.0, 1, 0, 0, 0, 0, "q0"), (1, 1, 10, 1, 400.0, 1, 0, 0, 0, 0, "q1"),
+            (2, 1, 10, 900, 1.0, 900, 0, 0, 0, 0, "q2"), (3, 1, 10, 1, 1.0, 1, 0, 700, 0, 0, "q3"),
+            (4, 1, 10, 1, 2.0, 1, 0, 0, 0, 0, "q4"), (5, 1, 10, 0, 0.0, 0, 0, 0, 0, 0, "q5")]
+    record = sampler.sample(Cursor(rows))
+    assert [s["query"] for s in record["statements"]] == ["q0", "q1", "q2", "q3"]
+    assert record["waits"] == {"CPU": 2}
@@ -0,0 +1,113 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import tune_resources
+
+CGROUP_FILES = ("CGROUP_V2_MEMORY", "CGROUP_V2_CPU", "CGROUP_V1_MEMORY",
+                "CGROUP_V1_CPU_QUOTA", "CGROUP_V1_CPU_PERIOD", "MEMINFO")
+V1_UNLIMITED = "9223372036854771712"
+
+# id, env, files of cgroup and meminfo, profile, max_connections, expected parameters
+CASES = [
+    ("legacy-default-ignores-cgroup", {}, {"CGROUP_V2_MEMORY": "4294967296"}, "legacy", 200,
+     {"shared_buffers": "52736kB", "effective_cache_size": "158208kB", "work_mem": "263kB",
+      "maintenance_work_mem": "13184kB"}),
+    ("legacy-env-gi", {"PG_RESOURCES_LIMIT_MEM": "1Gi"}, {}, "legacy", 100,
+     {"shared_buffers": "236544kB", "effective_cache_size": "709632kB", "work_mem": "2365kB",
+      "maintenance_work_mem": "59136kB"}),
+    ("legacy-env-bytes", {"PG_RESOURCES_LIMIT_MEM": "536870912"}, {}, "legacy", 200,
+     {"shared_buffers": "105472kB", "effective_cache_size": "316416kB", "work_mem": "527kB",
+      "maintenance_work_mem": "26368kB"}),
+    ("legacy-small-work-mem", {"PG_RESOURCES_LIMIT_MEM": "256Mi"}, {}, "legacy", 1000,
+     {"shared_buffers": "52736kB", "work_mem": "64kB"}),
+    ("oltp-cgroup-v2", {}, {"CGROUP_V2_MEMORY": "4294967296", "CGROUP_V2_CPU": "200000 100000"}, "oltp", 200,
+     {"shared_buffers": "970176kB", "effective_cache_size": "2910528kB", "work_mem": "4850kB",
+      "maintenance_work_mem": "242544kB", "max_worker_processes": "8", "max_parallel_workers": "2",
+      "max_parallel_workers_per_gather": "1", "max_parallel_maintenance_workers": "1",
+      "min_wal_size": "1048576kB", "max_wal_size": "4194304kB"}),
+    ("oltp-cgroup-v1", {}, {"CGROUP_V1_MEMORY": "2147483648", "CGROUP_V1_CPU_QUOTA": "400000",
+                            "CGROUP_V1_CPU_PERIOD": "100000"}, "oltp", 100,
+     {"shared_buffers": "471488kB", "effective_cache_size": "1414464kB", "work_mem": "2357kB",
+      "max_parallel_workers": "4", "max_parallel_workers_per_gather": "2"}),
+    ("mixed-cgroup-v2-unlimited", {}, {"CGROUP_V2_MEMORY": "max", "CGROUP_V2_CPU": "max 100000"}, "mixed", 50,
+     {"shared_buffers": "39552kB", "effective_cache_size": "118656kB", "work_mem": "296kB",
+      "max_worker_processes": "8", "max_parallel_workers": "8", "max_parallel_workers_per_gather": "4"}),
+    ("olap-cgroup-v1-unlimited-env", {"PG_RESOURCES_LIMIT_MEM": "8Gi", "PG_RESOURCES_LIMIT_CPU": "16"},
+     {"CGROUP_V1_MEMORY": V1_UNLIMITED, "CGROUP_V1_CPU_QUOTA": "-1", "CGROUP_V1_CPU_PERIOD": "100000"},
+     "olap", 50,
+     {"shared_buffers": "2057152kB", "effective_cache_size": "6171456kB", "work_mem": "15428kB",
+      "maintenance_work_mem": "1028576kB", "max_worker_processes": "16", "max_parallel_workers": "16",
+      "max_parallel_workers_per_gather": "8", "max_parallel_maintenance_workers": "4",
+      "min_wal_size": "4194304kB", "max_wal_size": "16777216kB"}),
+    ("olap-cpu-millicores", {"PG_RESOURCES_LIMIT_MEM": "2G", "PG_RESOURCES_LIMIT_CPU": "1500m"}, {}, "olap", 100,
+     {"max_worker_processes": "8", "max_parallel_workers": "1", "max_parallel_workers_per_gather": "0",
+      "max_parallel_maintenance_workers": "1"}),
+    ("oltp-huge-pages", {}, {"CGROUP_V2_MEMORY": "4294967296", "CGROUP_V2_CPU": "200000 100000",
+                             "MEMINFO": "HugePages_Total:     512\nHugepagesize:       2048 kB\n"}, "oltp", 200,
+     {"shared_buffers": "968704kB", "huge_pages": "try"}),
+]
+
+
+@pytest.fixture
+def container(tmp_path, monkeypatch):
+    """
+    Points cgroup and meminfo paths to files in tmp_path, absent by default.
+    """
+    for name in CGROUP_FILES:
+        monkeypatch.setattr(tune_resources, name, str(tmp_path / name.lower()))
+    for name in ("PG_RESOURCES_LIMIT_MEM", "PG_RESOURCES_LIMIT_CPU", "PG_TUNING_PROFILE",
+                 "PG_CONF_MAX_CONNECTIONS", "PG_MAX_CONNECTIONS", "PG_CONF_MAX_PREPARED_TRANSACTIONS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(tune_resources.os, "cpu_count", lambda: 8)
+
+    def setup(env, files):
+        for name, value in files.items():
+            (tmp_path / name.lower()).write_text(value)
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+    return setup
+
+
+@pytest.mark.parametrize("env,files,profile,max_connections,expected",
+                         [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_tuned_parameters(container, monkeypatch, env, files, profile, max_connections, expected):
+    container(env, files)
+    monkeypatch.setenv("PG_TUNING_PROFILE", profile)
+    monkeypatch.setenv("PG_CONF_MAX_CONNECTIONS", str(max_connections))
+    parameters = tune_resources.get_tuned_parameters()
+    assert dict((key, parameters.get(key)) for key in expected) == expected
+    if profile == "legacy":
+        assert sorted(parameters) == ["effective_cache_size", "maintenance_work_mem", "shared_buffers", "work_mem"]
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("256Mi", 262144), ("1Gi", 1048576), ("1ti", 1073741824), ("1000k", 1000), ("2G", 2000000),
+    ("1048576", 1024), (" 512Mi ", 524288),
+])
+def test_parse_memory_limit(value, expected):
+    assert tune_resources.parse_memory_limit(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "1.5Gi", "256Xi", "-1Gi"])
+def test_parse_memory_limit_invalid(value):
+    with pytest.raises(ValueError):
+        tune_resources.parse_memory_limit(value)
+
+
+def test_unknown_profile(container):
+    container({}, {})
+    with pytest.raises(ValueError):
+        tune_resources.get_tuned_parameters("fast")
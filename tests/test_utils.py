@@ -0,0 +1,59 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import stat
+import threading
+
+from utils import write_file_atomically
+
+
+def test_concurrent_writers(tmp_path):
+    target = str(tmp_path / "pg_node.yml")
+    contents = ["{}\n".format(i) * 20000 for i in range(8)]
+    errors = []
+
+    def write(data):
+        try:
+            for _ in range(20):
+                write_file_atomically(target, data)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=write, args=(data,)) for data in contents]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with open(target) as f:
+        assert f.read() in contents
+    assert os.listdir(str(tmp_path)) == ["pg_node.yml"]
+
+
+def test_mode_is_kept(tmp_path):
+    target = tmp_path / "settings.conf"
+    target.write_text("old")
+    os.chmod(str(target), 0o660)
+    write_file_atomically(str(target), "new")
+    assert target.read_text() == "new"
+    assert stat.S_IMODE(os.stat(str(target)).st_mode) == 0o660
+
+
+def test_new_file_mode_follows_umask(tmp_path):
+    mask = os.umask(0o027)
+    try:
+        write_file_atomically(str(tmp_path / "new.conf"), "data")
+    finally:
+        os.umask(mask)
+    assert stat.S_IMODE(os.stat(str(tmp_path / "new.conf")).st_mode) == 0o640
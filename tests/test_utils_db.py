@@ -0,0 +1,70 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+import pytest
+
+import fixtures
+import utils_db
+from patroni_client import PatroniClient
+
+SETTINGS = [
+    ("work_mem", "4MB", "kB", "integer", "user"),
+    ("max_connections", "200", None, "integer", "postmaster"),
+]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = fixtures.FakeDb(SETTINGS)
+    monkeypatch.delitem(sys.modules, "psycopg2", raising=False)
+    fixtures.install_fake_psycopg2(db)
+    monkeypatch.setattr(utils_db, "_connection", None)
+    return db
+
+
+@pytest.fixture
+def client(db):
+    stub = fixtures.StubPatroni(db)
+    client = PatroniClient(stub.url)
+    yield client
+    client.close()
+    stub.shutdown()
+
+
+def test_applied(client):
+    restart_required, elapsed = utils_db.watch_restart_state(client, {"work_mem": "4096kB"}, timeout=2)
+    assert restart_required is False and elapsed < 1
+
+
+def test_not_applied_waits_timeout(client):
+    restart_required, elapsed = utils_db.watch_restart_state(client, {"work_mem": "8MB"}, timeout=0.5)
+    assert restart_required is False and elapsed >= 0.5
+
+
+def test_unknown_parameters_are_not_waited(client):
+    expected = {"work_mem": "4MB", "pg_stat_kcache.track": "all"}
+    restart_required, elapsed = utils_db.watch_restart_state(client, expected, timeout=2)
+    assert restart_required is False and elapsed < 1
+
+
+def test_empty_snapshot_uses_patroni_flag(client, monkeypatch):
+    psycopg2 = sys.modules["psycopg2"]
+
+    def refuse(*args, **kwargs):
+        raise psycopg2.OperationalError("connection refused")
+    monkeypatch.setattr(psycopg2, "connect", refuse)
+    restart_required, elapsed = utils_db.watch_restart_state(client, {"work_mem": "8MB"}, timeout=2)
+    assert restart_required is False and elapsed < 1
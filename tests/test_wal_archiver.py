@@ -0,0 +1,187 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import wal_archiver
+
+SEGMENT_SIZE = 3 * wal_archiver.CHUNK_SIZE + 123
+
+
+class StubDaemon(object):
+    """
+    Stand-in of backup daemon /archive/put which parses multipart body.
+    """
+
+    def __init__(self):
+        self.uploads = []
+        self.headers = []
+        self.status = 200
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                boundary = self.headers["Content-Type"].split("boundary=")[1].encode("utf-8")
+                fields = {}
+                for part in body.split(b"--" + boundary)[1:-1]:
+                    head, _, value = part[2:-2].partition(b"\r\n\r\n")
+                    fields[head.split(b'name="')[1].split(b'"')[0].decode("utf-8")] = value
+                stub.headers.append(dict(self.headers))
+                stub.uploads.append({"filename": parse_qs(urlparse(self.path).query)["filename"][0],
+                                     "data": fields["file"], "sha256": fields["sha256"].decode("utf-8")})
+                self.send_response(stub.status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}/archive/put".format(self.server.server_address[1])
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def filenames(self):
+        return sorted(upload["filename"] for upload in self.uploads)
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    daemon = StubDaemon()
+    monkeypatch.setattr(wal_archiver, "ARCHIVE_URL", daemon.url)
+    monkeypatch.setenv("PG_ROOT_PASSWORD", "password")
+    yield daemon
+    daemon.server.shutdown()
+
+
+@pytest.fixture
+def wal_dir(monkeypatch):
+    # unix socket path must be short
+    root = tempfile.mkdtemp(prefix="wal-", dir="/tmp")
+    wal_dir = os.path.join(root, "data", "postgresql_node1", "pg_wal")
+    os.makedirs(os.path.join(wal_dir, "archive_status"))
+    monkeypatch.setattr(wal_archiver, "DATA_ROOT", os.path.join(root, "data"))
+    monkeypatch.setattr(wal_archiver, "SOCKET_PATH", os.path.join(root, "archiver.sock"))
+    yield wal_dir
+    shutil.rmtree(root, ignore_errors=True)
+
+
+def segment(wal_dir, number, ready=False):
+    name = "0000000100000000000000{:02X}".format(number)
+    path = os.path.join(wal_dir, name)
+    with open(path, "wb") as f:
+        f.write(os.urandom(SEGMENT_SIZE))
+    if ready:
+        open(os.path.join(wal_dir, "archive_status", name + ".ready"), "w").close()
+    return path, name
+
+
+@pytest.fixture
+def archiver(daemon, wal_dir):
+    archiver = wal_archiver.WalArchiver(wal_archiver.SOCKET_PATH, parallel=3)
+    threading.Thread(target=archiver.serve, daemon=True).start()
+    for _ in range(100):
+        if os.path.exists(wal_archiver.SOCKET_PATH):
+            break
+        time.sleep(0.02)
+    return archiver
+
+
+def test_upload_streams_and_hashes(daemon, wal_dir):
+    path, name = segment(wal_dir, 1)
+    sha256 = wal_archiver.upload_segment(wal_archiver.create_session(), path, name)
+    with open(path, "rb") as f:
+        data = f.read()
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    assert daemon.uploads == [{"filename": name, "data": data, "sha256": sha256}]
+    assert "Transfer-Encoding" not in daemon.headers[0]
+
+
+def test_push_through_daemon(archiver, daemon, wal_dir):
+    path, name = segment(wal_dir, 1, ready=True)
+    assert wal_archiver.push(path, name) is True
+    assert daemon.filenames() == [name]
+    assert name in archiver.done
+
+
+def test_read_ahead_of_ready_segments(archiver, daemon, wal_dir):
+    segments = [segment(wal_dir, i, ready=True) for i in range(1, 5)]
+    assert wal_archiver.push(*segments[0]) is True
+    for _ in range(100):
+        if len(daemon.uploads) == 3:
+            break
+        time.sleep(0.02)
+    # parallel - 1 next ready segments are uploaded in advance
+    assert daemon.filenames() == [name for _, name in segments[:3]]
+    assert wal_archiver.push(*segments[1]) is True
+    assert wal_archiver.push(*segments[3]) is True
+    assert daemon.filenames() == sorted(name for _, name in segments)
+
+
+def test_done_cache(archiver, daemon, wal_dir, monkeypatch):
+    path, name = segment(wal_dir, 1)
+    assert wal_archiver.push(path, name) is True
+    assert wal_archiver.push(path, name) is True
+    assert len(daemon.uploads) == 1
+    monkeypatch.setattr(wal_archiver, "DONE_CACHE_SIZE", 2)
+    for i in range(2, 5):
+        assert wal_archiver.push(*segment(wal_dir, i))
+    assert len(archiver.done) == 2
+    assert name not in archiver.done
+
+
+def test_failed_upload_is_reported(archiver, daemon, wal_dir):
+    daemon.status = 500
+    path, name = segment(wal_dir, 1)
+    assert wal_archiver.push(path, name) is False
+    assert name not in archiver.done
+    daemon.status = 200
+    assert wal_archiver.push(path, name) is True
+
+
+def test_direct_fallback(daemon, wal_dir):
+    path, name = segment(wal_dir, 1)
+    assert not os.path.exists(wal_archiver.SOCKET_PATH)
+    assert wal_archiver.push(path, name) is True
+    assert daemon.filenames() == [name]
+
+
+@pytest.mark.parametrize("make_path", [
+    lambda wal_dir: ("/etc/passwd", "passwd"),
+    lambda wal_dir: (os.path.join(wal_dir, "..", "global", "pg_control"), "pg_control"),
+    lambda wal_dir: (os.path.join(os.path.dirname(os.path.dirname(wal_dir)), "pg_wal", "x"), "x"),
+    lambda wal_dir: (os.path.join(wal_dir, "000000010000000000000001"), "000000010000000000000002"),
+])
+def test_paths_outside_of_pg_wal_are_rejected(archiver, daemon, wal_dir, make_path):
+    segment(wal_dir, 1)
+    path, name = make_path(wal_dir)
+    assert wal_archiver.push(path, name) is False
+    assert daemon.uploads == []
+
+
+def test_symlink_in_pg_wal_is_rejected(archiver, daemon, wal_dir):
+    os.symlink("/etc/passwd", os.path.join(wal_dir, "000000010000000000000009"))
+    assert wal_archiver.push(os.path.join(wal_dir, "000000010000000000000009"), "000000010000000000000009") is False
+    assert daemon.uploads == []